@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import datetime
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +27,15 @@ SECRET_KEY = 'django-insecure-6z^h(@&s3%%n=i7^y$686etb5)jt2&biau6086w^*&o#+d9myx
 DEBUG = True
 
 ALLOWED_HOSTS = []
+
+# Swagger/OpenAPI-документация. При API_DOCS_ENABLED=0 drf_yasg не импортируется вовсе,
+# что заметно ускоряет старт воркеров.
+API_DOCS_ENABLED = os.environ.get('API_DOCS_ENABLED', '1') == '1'
+
+# Прогрев URL-резолвера и кэшей сериализаторов в master-процессе перед fork
+# (см. gunicorn.conf.py и CourseApp/warmup.py).
+PRELOAD_WARMUP = os.environ.get('PRELOAD_WARMUP', '0') == '1'
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -37,19 +47,24 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
-    'drf_yasg',
+    *(['drf_yasg'] if API_DOCS_ENABLED else []),
     'CourseApp',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'CourseApp.metrics.MetricsMiddleware',
+    'CourseApp.deadline.DeadlineMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'CourseApp.compress.CompressionMiddleware',
+    'CourseApp.querylog.QueryLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'CourseApp.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'CourseAPI.urls'
@@ -83,6 +98,23 @@ DATABASES = {
     }
 }
 
+# Шардирование курсов и филиалов по учебным центрам (CourseApp/sharding.py), по умолчанию выключено.
+# Каждый шард мигрируется отдельно: manage.py migrate --database=shard0, затем manage.py rebalance_shards --init
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '0'))
+SHARD_DATABASES = [f'shard{number}' for number in range(SHARD_COUNT)]
+for _alias in SHARD_DATABASES:
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{_alias}.sqlite3',
+    }
+if SHARD_DATABASES:
+    DATABASE_ROUTERS = ['CourseApp.sharding.ShardRouter']
+SHARD_ID_BLOCK = 1000
+SHARD_ASSIGNMENT_TTL = 5.0  # как долго процесс кэширует таблицу переносов центров, с
+# Агрегаты, похожие курсы, карточки и снимок строятся по базе default: с шардами они по умолчанию выключены,
+# а явное включение вместе с SHARD_COUNT останавливает запуск (CourseApp/sharding.py: check_features)
+_UNSHARDED_DEFAULT = '0' if SHARD_DATABASES else '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,7 +156,7 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
+        'CourseApp.ordering.CollationOrderingFilter',
     ]
 }
 
@@ -133,12 +165,228 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=365 * 100),  # 100 лет
 }
 
+# Префиксный индекс /autocomplete/: период фоновой перестройки в секундах (0 — только сигналы)
+AUTOCOMPLETE_REBUILD_INTERVAL = 300
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Агрегаты категорий и учебных центров (CourseApp/stats.py, /categories/stats/, /education-centres/{id}/stats/)
+STATS_ENABLED = os.environ.get('STATS_ENABLED', _UNSHARDED_DEFAULT) == '1'
+
+# Похожие курсы (/courses/{id}/similar/): сколько соседей хранить и веса признаков.
+# После миграции 0007 и после изменения весов или диапазонов нужен manage.py rebuild_similar_courses
+SIMILAR_COURSES_ENABLED = os.environ.get('SIMILAR_COURSES_ENABLED', _UNSHARDED_DEFAULT) == '1'
+SIMILAR_COURSES_TOP_K = 20
+SIMILAR_COURSES_WEIGHTS = {
+    'skills': 0.6,
+    'category': 0.2,
+    'price_band': 0.1,
+    'education_type': 0.1,
+}
+# Границы ценовых диапазонов по price_month
+SIMILAR_COURSES_PRICE_BANDS = [200000, 500000, 1000000, 2000000]
+
+# POST /batch/: максимум подзапросов в одном пакете
+BATCH_MAX_REQUESTS = 20
+
+# Админка: предел точного подсчёта строк в списках и размер пачки массовых UPDATE
+ADMIN_COUNT_LIMIT = 10000
+ADMIN_BULK_BATCH_SIZE = 1000
+
+# Очередь фоновых задач (CourseApp/tasks.py, manage.py run_tasks)
+TASK_BATCH_SIZE = 50
+TASK_MAX_ATTEMPTS = 5
+TASK_BACKOFF_BASE = 5  # секунд, растёт как base * 2^(попытка - 1)
+TASK_BACKOFF_MAX = 3600
+TASK_LEASE = 300  # через сколько секунд зависшая задача снова доступна другим воркерам
+TASK_POLL_INTERVAL = 1.0
+
+# Отправка SMS. FakeSMSProvider ничего не отправляет, а сохраняет сообщения локально
+SMS_PROVIDER = 'CourseApp.sms.FakeSMSProvider'
+SMS_FAKE_OUTBOX_FILE = os.environ.get('SMS_FAKE_OUTBOX_FILE')
+SMS_FAKE_OUTBOX_SIZE = 1000  # последних сообщений в памяти (FakeSMSProvider.outbox)
+
+# Лента изменений /changes/
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+# Сжатие ответов (CourseApp/compress.py). br и zstd включаются, если установлены brotli / zstandard
+COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']  # порядок предпочтения при равных q
+COMPRESSION_MIN_SIZE = 512  # байт
+COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+# Ответы на запросы с Authorization или Cookie: только gzip с 1..N случайными байтами в заголовке (защита от BREACH)
+COMPRESSION_RANDOM_BYTES = 100
+# Уровни для ответов из кэша каталога (CATALOG_CACHE_ENABLED): сжимаются один раз, поэтому сильнее
+COMPRESSION_CACHED_LEVELS = {'gzip': 9, 'br': 9, 'zstd': 12}
+COMPRESSION_CACHE = 'default'
+COMPRESSION_CACHE_TIMEOUT = 600
+
+# Колоночный снимок курсов в memory-mapped файлах (CourseApp/snapshot.py, manage.py build_catalog_snapshot)
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', '0') == '1'
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'catalog_snapshot'))
+CATALOG_SNAPSHOT_CHECK_INTERVAL = 1.0  # как часто воркер проверяет, не появилось ли новое поколение, с
+CATALOG_SNAPSHOT_AUTO_REBUILD = True
+CATALOG_SNAPSHOT_REBUILD_DELAY = 1.0
+CATALOG_SNAPSHOT_REBUILD_ATTEMPTS = 30
+CATALOG_SNAPSHOT_ID_BATCH = 1000  # размер IN (...) при выборке курсов по id из снимка
+
+# Журнал SQL-запросов (CourseApp/querylog.py, /querylog/, manage.py querylog)
+QUERYLOG_ENABLED = os.environ.get('QUERYLOG_ENABLED', '1') == '1'
+QUERYLOG_SLOW_MS = 100  # начиная с этой длительности запрос сохраняется вместе с планом
+QUERYLOG_EXPLAIN = True
+QUERYLOG_MAX_ENTRIES = 2000  # пар (эндпоинт, отпечаток) в памяти процесса
+QUERYLOG_SLOW_KEEP = 200
+
+# Метрики Prometheus на /metrics (CourseApp/metrics.py); для нескольких воркеров — PROMETHEUS_MULTIPROC_DIR
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Запрос к /metrics должен передать Authorization: Bearer <токен>; без токена метрики отдаются только при DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Тот же PBKDF2, но с замером времени для метрики password_hash_duration_seconds
+PASSWORD_HASHERS = [
+    'CourseApp.metrics.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Кэш списков курсов и учебных центров с single-flight и stale-while-revalidate (CourseApp/catalog_cache.py).
+# Нужен общий для воркеров кэш (Redis, Memcached): с LocMemCache инвалидация в одном процессе не видна другим,
+# поэтому на LocMemCache кэш не включается и при CATALOG_CACHE_ENABLED=1.
+CATALOG_CACHE_ENABLED = os.environ.get('CATALOG_CACHE_ENABLED', '0') == '1'
+CATALOG_CACHE = 'default'
+CATALOG_CACHE_TTL = 60
+CATALOG_CACHE_STALE_TTL = 300  # сколько после TTL можно отдавать устаревшее значение, пока считается новое
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+CATALOG_CACHE_WAIT = 2.0  # ожидание чужого пересчёта при пустом кэше, с
+CATALOG_CACHE_BETA = 1.0  # >1 — пересчитывать раньше срока чаще
+
+# Быстрый список карточек курсов /courses/cards/ (CourseApp/documents.py)
+COURSE_CARDS_ENABLED = os.environ.get('COURSE_CARDS_ENABLED', _UNSHARDED_DEFAULT) == '1'
+COURSE_CARDS_DEFAULT_LIMIT = 50
+COURSE_CARDS_MAX_LIMIT = 500
+
+# Почти-дубликаты курсов: MinHash + LSH (CourseApp/duplicates.py, manage.py find_duplicates).
+# После миграции 0016 и после изменения NUM_PERM, BANDS или SHINGLE нужен manage.py find_duplicates --rebuild
+DUPLICATES_ENABLED = os.environ.get('DUPLICATES_ENABLED', '1') == '1'
+DUPLICATES_MODE = os.environ.get('DUPLICATES_MODE', 'flag')  # 'flag' — сохранить отметку, 'reject' — ответ 400
+DUPLICATES_NUM_PERM = 128
+DUPLICATES_BANDS = 16  # 16 полос по 8 строк: кандидатами становятся пары со схожестью примерно от 0.7
+DUPLICATES_SHINGLE = 5  # символов
+DUPLICATES_THRESHOLD = 0.8  # оценка коэффициента Жаккара шинглов
+DUPLICATES_MAX_BUCKET = 1000  # корзины крупнее (шаблонные тексты) не используются
+
+# Структурные логи JSON Lines через очередь и фоновый поток (CourseApp/jsonlog.py)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_STREAM = os.environ.get('LOG_STREAM', 'stdout')  # stdout, stderr или путь к файлу
+LOG_QUEUE_SIZE = 10000  # при переполнении записи отбрасываются, а не блокируют запрос
+LOG_BATCH_SIZE = 256
+LOG_SAMPLING = {  # доля сохраняемых записей ниже WARNING по префиксу логгера
+    'CourseApp': 1.0,
+}
+LOG_REDACT_KEYS = ('password', 'code', 'token', 'secret', 'authorization', 'refresh', 'access', 'passport')
+LOG_MASK_KEYS = ('phone', 'username')
+# Поля, которые совпадают с шаблонами выше, но секретов не содержат (status_code пишет django.request)
+LOG_SAFE_KEYS = ('status_code',)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {'()': 'CourseApp.jsonlog.SamplingFilter', 'rates': LOG_SAMPLING},
+    },
+    'handlers': {
+        'json': {
+            '()': 'CourseApp.jsonlog.AsyncQueueHandler',
+            'stream': LOG_STREAM,
+            'queue_size': LOG_QUEUE_SIZE,
+            'batch_size': LOG_BATCH_SIZE,
+            'filters': ['sampling'],
+        },
+    },
+    'loggers': {
+        'CourseApp': {'handlers': ['json'], 'level': LOG_LEVEL, 'propagate': False},
+        'django.request': {'handlers': ['json'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Срок выполнения запроса и сброс нагрузки (CourseApp/deadline.py)
+REQUEST_DEADLINE_ENABLED = os.environ.get('REQUEST_DEADLINE_ENABLED', '1') == '1'
+REQUEST_DEFAULT_TIMEOUT = float(os.environ.get('REQUEST_DEFAULT_TIMEOUT', '30'))  # как timeout gunicorn
+# Срок из X-Request-Deadline/X-Request-Timeout не дальше этого числа секунд от приёма запроса
+REQUEST_MAX_TIMEOUT = float(os.environ.get('REQUEST_MAX_TIMEOUT', '30'))
+REQUEST_SHED_RETRY_AFTER = 5
+# Пороги по классам: время в очереди перед воркером (X-Request-Start), запросов в обработке
+# в процессе (включая текущий), минимальный остаток срока, с которым запрос имеет смысл начинать
+REQUEST_PRIORITY_CLASSES = {
+    'critical': {'max_queue_time': None, 'max_in_flight': None, 'min_remaining': 0},
+    'normal': {'max_queue_time': 10.0, 'max_in_flight': None, 'min_remaining': 0.05},
+    'low': {'max_queue_time': 1.0, 'max_in_flight': 2, 'min_remaining': 5.0},
+}
+REQUEST_DEFAULT_PRIORITY = 'normal'
+REQUEST_PRIORITIES = {  # имя маршрута -> класс
+    'metrics': 'critical',
+    'schema-json': 'low',
+    'schema-swagger-ui': 'low',
+    'querylog': 'low',
+}
+
+# Списки через скомпилированные сериализаторы по values_list() (CourseApp/compiled.py)
+COMPILED_SERIALIZERS_ENABLED = os.environ.get('COMPILED_SERIALIZERS_ENABLED', '1') == '1'
+COMPILED_SERIALIZERS_IN_BATCH = 500  # размер IN (...) при выборке M2M
+
+# Регламентные задачи (CourseApp/maintenance.py, manage.py run_maintenance --loop)
+MAINTENANCE_LOCK_FILE = os.environ.get('MAINTENANCE_LOCK_FILE', str(BASE_DIR / 'var' / 'maintenance.lock'))
+MAINTENANCE_POLL_INTERVAL = 60.0
+MAINTENANCE_LEASE = 3600  # через сколько секунд упавший прогон задачи может подхватить другой узел
+MAINTENANCE_BATCH_SIZE = 1000
+MAINTENANCE_INTERVALS = {  # секунд между запусками
+    'purge_phone_verifications': 3600,
+    'purge_password_reset_codes': 3600,
+    'purge_done_tasks': 24 * 3600,
+    'compact_changes': 24 * 3600,
+    'optimize': 6 * 3600,
+    'incremental_vacuum': 24 * 3600,
+    'orphaned_media': 24 * 3600,
+    'purge_idempotency_keys': 3600,
+}
+MAINTENANCE_PHONE_VERIFICATION_RETENTION_HOURS = 24
+MAINTENANCE_TASK_RETENTION_DAYS = 7
+MAINTENANCE_TOMBSTONE_DAYS = None  # None — tombstone-записи журнала изменений не удаляются
+MAINTENANCE_VACUUM_PAGES = 2000  # страниц за один прогон incremental_vacuum
+# Перевод существующей базы SQLite в auto_vacuum=INCREMENTAL требует одного полного VACUUM (блокирует запись)
+MAINTENANCE_ALLOW_FULL_VACUUM = os.environ.get('MAINTENANCE_ALLOW_FULL_VACUUM', '0') == '1'
+MAINTENANCE_MEDIA_GRACE_HOURS = 24
+
+# Повторы пишущих запросов с заголовком Idempotency-Key (CourseApp/idempotency.py)
+IDEMPOTENCY_ENABLED = os.environ.get('IDEMPOTENCY_ENABLED', '1') == '1'
+IDEMPOTENCY_ROUTES = {  # имена маршрутов
+    'register',
+    'verify',
+    'forgot_password',
+    'categories-list',
+    'skills-list',
+    'education-centres-list',
+    'branches-list',
+    'courses-list',
+}
+IDEMPOTENCY_TTL = 24 * 3600  # сколько секунд хранится ответ
+IDEMPOTENCY_LEASE = 60  # через сколько секунд аренда незавершённого запроса считается брошенной
+IDEMPOTENCY_WAIT = 10  # сколько секунд повтор ждёт ответа выполняющегося запроса
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
+# Раздача MEDIA_ROOT (CourseApp/media.py): '' — FileResponse/sendfile из воркера,
+# 'nginx' — X-Accel-Redirect на internal-location MEDIA_ACCEL_PREFIX, 'sendfile' — X-Sendfile
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_MAX_AGE = 3600
+# Имена с хэшем содержимого (logo.3f9a1c2b7d.png) кэшируются как immutable
+MEDIA_IMMUTABLE_PATTERN = r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$'
 STATIC_ROOT = BASE_DIR / 'static'
 
 # Default primary key field type
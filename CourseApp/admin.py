@@ -1,6 +1,201 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
 
+from CourseApp import catalog_cache, changes, documents, sharding, similarity, snapshot, stats
 from CourseApp.models import *
 
-admin.site.register([CustomUser, PhoneVerification, PasswordResetCode, EducationCentres, Branches, Courses, Category,
-                     Skills])
\ No newline at end of file
+
+class CappedCountPaginator(Paginator):
+    """
+    Paginator без полного COUNT(*): на PostgreSQL для таблицы без фильтров берётся оценка
+    из pg_class, иначе строки считаются не дальше ADMIN_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_COUNT_LIMIT:
+                return row[0]
+        return queryset[:settings.ADMIN_COUNT_LIMIT].count()
+
+
+def batched_update(queryset, on_batch=None, **values):
+    """
+    UPDATE выбранных строк пачками по первичному ключу, чтобы не держать долгую блокировку.
+    on_batch(pks) вызывается после каждой пачки в той же транзакции.
+    """
+    model = queryset.model
+    batch_size = settings.ADMIN_BULK_BATCH_SIZE
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    updated = 0
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        # В той же базе, что и выборка: с шардированием это шард из ShardListFilter
+        with transaction.atomic(using=queryset.db):
+            updated += model.objects.using(queryset.db).filter(pk__in=batch).update(**values)
+            if on_batch is not None:
+                on_batch(batch)
+    return updated
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = CappedCountPaginator
+    # Не выполнять второй COUNT(*) по всей таблице для «N из M»
+    show_full_result_count = False
+    list_per_page = 50
+    # Сортировка по первичному ключу идёт по индексу и нужна стабильной пагинации автокомплита
+    ordering = ('-pk',)
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    С шардированием список курсов или филиалов показывает один шард (по умолчанию первый): выборка
+    без подсказки ушла бы в default, где курсов нет.
+    """
+    title = "шард"
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def _alias(self):
+        return self.value() if self.value() in sharding.shards() else sharding.shards()[0]
+
+    def choices(self, changelist):
+        # Без пункта «Все»: список не сливается из шардов
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == self._alias(),
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset.using(self._alias())
+
+
+class ShardedAdminMixin:
+    """Для курсов и филиалов: список по шарду из ShardListFilter, объект — из шарда, в котором он лежит."""
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return (ShardListFilter,) + tuple(list_filter) if sharding.enabled() else list_filter
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding.enabled() or not object_id.isdigit():
+            return super().get_object(request, object_id, from_field)
+        alias = sharding.locate(self.model, int(object_id))
+        return self.get_queryset(request).using(alias).filter(pk=object_id).first() if alias else None
+
+
+@admin.register(CustomUser)
+class CustomUserAdmin(LargeTableAdmin):
+    list_display = ('id', 'username', 'first_name', 'last_name', 'is_active', 'is_staff')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('^username',)
+
+
+@admin.register(PhoneVerification)
+class PhoneVerificationAdmin(LargeTableAdmin):
+    list_display = ('id', 'phone_number', 'is_verified', 'created_at')
+    search_fields = ('^phone_number',)
+
+
+@admin.register(PasswordResetCode)
+class PasswordResetCodeAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'is_used', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    list_filter = ('is_used',)
+    actions = ['mark_used']
+
+    @admin.action(description="Пометить выбранные коды как использованные")
+    def mark_used(self, request, queryset):
+        updated = batched_update(queryset, is_used=True)
+        self.message_user(request, f"Обновлено кодов: {updated}", messages.SUCCESS)
+
+
+@admin.register(Category)
+class CategoryAdmin(LargeTableAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('^name',)
+
+
+@admin.register(Skills)
+class SkillsAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'category')
+    list_select_related = ('category',)
+    autocomplete_fields = ('category',)
+    list_filter = ('category',)
+    search_fields = ('^name',)
+
+
+@admin.register(EducationCentres)
+class EducationCentresAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'category', 'rate', 'rate_count')
+    list_select_related = ('category',)
+    autocomplete_fields = ('category', 'skills')
+    list_filter = ('category',)
+    search_fields = ('^name',)
+
+
+@admin.register(Branches)
+class BranchesAdmin(ShardedAdminMixin, LargeTableAdmin):
+    list_display = ('id', 'name', 'address', 'education_centre')
+    list_select_related = ('education_centre',)
+    autocomplete_fields = ('education_centre',)
+    search_fields = ('^name', '^address')
+
+
+@admin.register(Courses)
+class CoursesAdmin(ShardedAdminMixin, LargeTableAdmin):
+    list_display = ('id', 'name', 'category', 'education_centre', 'education_type', 'price_month', 'discount',
+                    'price_month_effective')
+    list_select_related = ('category', 'education_centre')
+    autocomplete_fields = ('category', 'education_centre', 'skills')
+    # Оба фильтра идут по индексированным столбцам
+    list_filter = ('education_type', 'category')
+    search_fields = ('^name',)
+    actions = ['reset_discount', 'set_online', 'set_offline', 'set_hybrid']
+
+    def _update(self, request, queryset, **values):
+        keys = set(queryset.order_by().values_list('category_id', 'education_centre_id').distinct())
+
+        def on_batch(pks):
+            changes.record(Courses, pks)
+            documents.enqueue_rebuild(pks)
+            similarity.schedule_update(pks)
+
+        # Массовый UPDATE минует сигналы: ленту изменений, карточки, похожие курсы и агрегаты затронутых
+        # категорий и центров ведём явно
+        updated = batched_update(queryset, on_batch=on_batch, **values)
+        for category_id, education_centre_id in keys:
+            stats.schedule_refresh('category', category_id)
+            stats.schedule_refresh('education_centre', education_centre_id)
+        snapshot.schedule_stale()
+        catalog_cache.schedule_invalidate('courses')
+        self.message_user(request, f"Обновлено курсов: {updated}", messages.SUCCESS)
+
+    @admin.action(description="Сбросить скидку")
+    def reset_discount(self, request, queryset):
+        self._update(request, queryset, discount=0)
+
+    @admin.action(description="Формат обучения: Online")
+    def set_online(self, request, queryset):
+        self._update(request, queryset, education_type='online')
+
+    @admin.action(description="Формат обучения: Offline")
+    def set_offline(self, request, queryset):
+        self._update(request, queryset, education_type='offline')
+
+    @admin.action(description="Формат обучения: Hybrid")
+    def set_hybrid(self, request, queryset):
+        self._update(request, queryset, education_type='hybrid')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CourseappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'CourseApp'
+
+    def ready(self):
+        from CourseApp import sharding, signals  # noqa: F401
+
+        sharding.check_features()
@@ -0,0 +1,171 @@
+"""
+Префиксный индекс для поиска по мере ввода (/autocomplete/?q=).
+
+Все названия навыков, категорий, курсов и учебных центров хранятся в памяти процесса
+в отсортированном списке нормализованных ключей. Поиск — bisect до первого ключа
+с нужным префиксом и короткий проход вперёд, т.е. O(log n + limit) без обращения к БД.
+Индекс строится лениво при первом запросе и обновляется сигналами моделей.
+
+add/remove меняют список ключей на месте (insort, del), поэтому поиск проходит по нему под той же
+блокировкой: иначе сдвиг списка посреди прохода пропускает или повторяет ключи, а удаление
+хвоста даёт IndexError. Блокировка держится O(log n + limit) — столько же, сколько сам поиск.
+Замер: manage.py bench_autocomplete.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+
+from CourseApp import sharding
+from CourseApp.models import Category, Courses, EducationCentres, Skills
+from CourseApp.text import normalize_search_text
+
+# Тип результата -> модель
+AUTOCOMPLETE_MODELS = {
+    'skill': Skills,
+    'category': Category,
+    'course': Courses,
+    'education_centre': EducationCentres,
+}
+
+# Разделитель между нормализованным текстом и идентификатором записи внутри ключа;
+# меньше любого символа нормализованного текста, поэтому не ломает порядок префиксов.
+SEP = '\x00'
+
+
+def _index_terms(name):
+    """Ключи для названия: полная строка и все её «хвосты» с начала каждого слова."""
+    words = normalize_search_text(name).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._names = {}  # (kind, pk) -> исходное название
+        self._lock = threading.Lock()
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._names)
+
+    def build(self):
+        """Полностью перестраивает индекс по данным БД."""
+        names = {}
+        for kind, model in AUTOCOMPLETE_MODELS.items():
+            for pk, name in sharding.fetch(model.objects.values_list('pk', 'name')):
+                names[(kind, pk)] = name
+        self.load(names)
+
+    def load(self, names):
+        """Заменяет содержимое индекса: names — {(kind, pk): название}."""
+        keys = [
+            f"{term}{SEP}{kind}{SEP}{pk}"
+            for (kind, pk), name in names.items()
+            for term in _index_terms(name)
+        ]
+        keys.sort()
+        with self._lock:
+            self._keys, self._names = keys, names
+            self.built_at = time.monotonic()
+
+    def _remove_locked(self, kind, pk):
+        name = self._names.pop((kind, pk), None)
+        if name is None:
+            return
+        for term in _index_terms(name):
+            key = f"{term}{SEP}{kind}{SEP}{pk}"
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def add(self, kind, pk, name):
+        """Добавляет или обновляет запись (инкрементально, без перестройки)."""
+        with self._lock:
+            self._remove_locked(kind, pk)
+            self._names[(kind, pk)] = name
+            for term in _index_terms(name):
+                insort(self._keys, f"{term}{SEP}{kind}{SEP}{pk}")
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._remove_locked(kind, pk)
+
+    def search(self, query, limit=10, kinds=None):
+        prefix = normalize_search_text(query)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            keys, names = self._keys, self._names
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(results) < limit:
+                key = keys[i]
+                if not key.startswith(prefix):
+                    break
+                i += 1
+                _, kind, pk = key.split(SEP)
+                if kinds and kind not in kinds:
+                    continue
+                pk = int(pk)
+                name = names.get((kind, pk))
+                if name is None or (kind, pk) in seen:
+                    continue
+                seen.add((kind, pk))
+                results.append({'type': kind, 'id': pk, 'name': name})
+        return results
+
+
+_index = PrefixIndex()
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """Возвращает индекс процесса, при необходимости строя его."""
+    if _index.built_at is None:
+        with _build_lock:
+            if _index.built_at is None:
+                _index.build()
+    else:
+        # Сигналы обновляют только индекс своего процесса; изменения, сделанные другими
+        # воркерами, подхватываем периодической фоновой перестройкой.
+        interval = settings.AUTOCOMPLETE_REBUILD_INTERVAL
+        if interval and time.monotonic() - _index.built_at > interval and _build_lock.acquire(blocking=False):
+            _index.built_at = time.monotonic()
+            threading.Thread(target=_rebuild_in_background, daemon=True).start()
+    return _index
+
+
+def _rebuild_in_background():
+    from django.db import connection
+
+    try:
+        _index.build()
+    finally:
+        connection.close()
+        _build_lock.release()
+
+
+def kind_for_model(model):
+    for kind, indexed_model in AUTOCOMPLETE_MODELS.items():
+        if model is indexed_model:
+            return kind
+    return None
+
+
+def index_saved(instance):
+    kind = kind_for_model(type(instance))
+    if kind and _index.built_at is not None:
+        pk, name = instance.pk, instance.name
+        transaction.on_commit(lambda: _index.add(kind, pk, name))
+
+
+def index_deleted(instance):
+    kind = kind_for_model(type(instance))
+    if kind and _index.built_at is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: _index.remove(kind, pk))
@@ -0,0 +1,129 @@
+"""
+Пакетные запросы: POST /batch/ выполняет несколько GET-запросов к API за один HTTP-вызов.
+
+Подзапросы исполняются в этом же процессе и потоке: без middleware, с уже проверенным
+пользователем родительского запроса, на одном соединении с БД внутри одной транзакции
+(согласованный снимок данных) и с общей identity map, чтобы одна и та же строка
+не загружалась дважды.
+
+Раз middleware пропускаются, подзапрос может обращаться только к API (/api/v1/, кроме
+документации): админка и прочие страницы проекта недоступны. Ошибка одного подзапроса
+становится его статусом и откатывается до его точки сохранения, остальные выполняются.
+"""
+import copy
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import Http404, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from CourseApp.serializers import BatchRequestSerializer
+
+logger = logging.getLogger(__name__)
+
+# Маршруты, доступные подзапросам: только API приложения, без документации
+API_ROUTE_PREFIX = 'api/v1/'
+EXCLUDED_URL_NAMES = {'schema-json', 'schema-swagger-ui'}
+NOT_FOUND = {'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Не найдено.'}}
+
+
+class IdentityMapMixin:
+    """
+    Для ViewSet: в рамках пакетного запроса get_object() берёт объект из общей identity map,
+    если он уже был загружен другим подзапросом.
+    """
+
+    def get_object(self):
+        identity_map = getattr(self.request, 'identity_map', None)
+        # С параметрами фильтрации объект может не попасть в выборку — идём обычным путём
+        if identity_map is None or self.request.query_params:
+            return super().get_object()
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        key = (self.get_queryset().model, str(self.kwargs[lookup_url_kwarg]))
+        obj = identity_map.get(key)
+        if obj is None:
+            obj = super().get_object()
+            identity_map[key] = obj
+        else:
+            self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def _build_subrequest(request, match, path, query_string, identity_map):
+    parent = request._request
+    # Копия исходного запроса сохраняет хост, схему и заголовки (нужны, например, для абсолютных URL картинок)
+    subrequest = copy.copy(parent)
+    subrequest.method = 'GET'
+    subrequest.path = subrequest.path_info = path
+    subrequest.resolver_match = match
+    subrequest.META = {
+        **parent.META,
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'CONTENT_LENGTH': '0',
+    }
+    subrequest.META.pop('CONTENT_TYPE', None)
+    subrequest.GET = QueryDict(query_string)
+    # Пользователь уже аутентифицирован родительским запросом: DRF возьмёт его без повторной проверки JWT
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    subrequest.identity_map = identity_map
+    return subrequest
+
+
+class BatchView(APIView):
+    """
+    Пакет подзапросов: {"requests": [{"method": "GET", "path": "/api/v1/courses/1/"}, ...]}.
+    Ответ — список {"status", "body"} в том же порядке.
+    """
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        identity_map = {}
+        responses = []
+        with transaction.atomic():
+            for item in serializer.validated_data['requests']:
+                responses.append(self._dispatch(request, item['path'], identity_map))
+        return Response(responses, status=status.HTTP_200_OK)
+
+    def _dispatch(self, request, url, identity_map):
+        parts = urlsplit(url)
+        try:
+            match = resolve(parts.path)
+        except Resolver404:
+            return NOT_FOUND
+        if not match.route.startswith(API_ROUTE_PREFIX) or match.url_name in EXCLUDED_URL_NAMES:
+            return NOT_FOUND
+        if getattr(match.func, 'view_class', None) is BatchView:
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'detail': 'Вложенные пакеты не поддерживаются.'}}
+
+        subrequest = _build_subrequest(request, match, parts.path, parts.query, identity_map)
+        try:
+            # Точка сохранения: ошибка БД в подзапросе не ломает транзакцию остальных
+            with transaction.atomic():
+                response = match.func(subrequest, *match.args, **match.kwargs)
+        except Http404:
+            return NOT_FOUND
+        except PermissionDenied:
+            return {'status': status.HTTP_403_FORBIDDEN, 'body': {'detail': 'Доступ запрещён.'}}
+        except Exception:
+            logger.exception("Ошибка подзапроса пакета %s", url)
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {'detail': 'Внутренняя ошибка сервера.'}}
+        if isinstance(response, Response):
+            # Данные DRF-ответа уже в виде Python-структур: рендерим один раз, весь пакет целиком
+            body = response.data
+        elif response.get('Content-Type', '').split(';')[0].strip() == 'application/json':
+            # Готовый JSON (например, /courses/cards/) вставляем структурой, а не строкой с экранированием
+            body = json.loads(response.content.decode(response.charset or 'utf-8'))
+        else:
+            body = response.content.decode(response.charset or 'utf-8')
+        return {'status': response.status_code, 'body': body}
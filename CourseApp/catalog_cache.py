@@ -0,0 +1,195 @@
+"""
+Кэш списков каталога (курсы, учебные центры) с защитой от «набегов» на промахе.
+
+- Внутри процесса на один ключ считается только одно вычисление, остальные потоки ждут его результат.
+- Между процессами пересчёт захватывает блокировку в кэше (cache.add), остальные процессы
+  отдают устаревшее значение или ждут появления нового до CATALOG_CACHE_WAIT секунд.
+- Запись в каталог не удаляет ключи, а увеличивает версию пространства имён: старые значения
+  становятся устаревшими, но отдаются (stale-while-revalidate), пока один запрос считает новое.
+- Кэш работает только с общим для всех воркеров бэкендом (Redis, Memcached): с LocMemCache
+  увеличение версии в одном процессе не видно остальным, и они отдавали бы старый список
+  после записи. С LocMemCache кэш выключен, даже если CATALOG_CACHE_ENABLED=1.
+- Незадолго до истечения TTL значение с некоторой вероятностью пересчитывается заранее
+  (XFetch: чем дороже вычисление и ближе срок, тем выше вероятность), поэтому свежие ключи
+  не истекают одновременно.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.http import urlencode
+
+from CourseApp import metrics
+
+_MISSING = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key, compute, fallback=_MISSING):
+    """
+    Выполняет compute() один раз на ключ в процессе. Пока вычисление идёт, другие потоки
+    получают fallback (если он задан) или ждут результат ведущего потока.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if fallback is not _MISSING:
+            return fallback
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = compute()
+        return flight.value
+    except BaseException as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _cache():
+    return caches[settings.CATALOG_CACHE]
+
+
+def enabled():
+    return settings.CATALOG_CACHE_ENABLED and not isinstance(_cache(), LocMemCache)
+
+
+def mark_cached(response):
+    """Помечает ответ, тело которого берётся из кэша каталога: compress.py кэширует и его сжатую форму."""
+    response.catalog_cached = enabled()
+    return response
+
+
+def _version_key(namespace):
+    return f"catalog:version:{namespace}"
+
+
+def _version(cache, namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # После вытеснения ключа версия начинается с текущего времени, чтобы не совпасть со старыми
+        cache.add(_version_key(namespace), int(time.time() * 1000), None)
+        version = cache.get(_version_key(namespace))
+    return version
+
+
+def invalidate(*namespaces):
+    cache = _cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.add(_version_key(namespace), int(time.time() * 1000), None)
+
+
+def schedule_invalidate(*namespaces):
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def request_key(namespace, request):
+    # Хост и схема входят в ключ: сериализаторы строят абсолютные URL картинок
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    return f"catalog:{namespace}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _should_refresh_early(entry, now):
+    # XFetch: -delta * beta * log(U) — случайный сдвиг «текущего времени» вперёд
+    shift = -entry['delta'] * settings.CATALOG_CACHE_BETA * math.log(random.random() or 1e-12)
+    return now + shift >= entry['expires']
+
+
+def _store(cache, key, version, compute):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    entry = {'value': value, 'version': version, 'expires': time.time() + settings.CATALOG_CACHE_TTL,
+             'delta': delta}
+    cache.set(key, entry, settings.CATALOG_CACHE_TTL + settings.CATALOG_CACHE_STALE_TTL)
+    return value
+
+
+def _store_locked(cache, key, version, compute):
+    """Пересчёт под межпроцессной блокировкой; _MISSING, если пересчитывает другой процесс."""
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, settings.CATALOG_CACHE_LOCK_TIMEOUT):
+        return _MISSING
+    try:
+        return _store(cache, key, version, compute)
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _wait_for_fresh(cache, key, version):
+    deadline = time.monotonic() + settings.CATALOG_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['value']
+    return _MISSING
+
+
+def get_or_compute(namespace, request, compute):
+    """Значение для запроса из кэша; compute() вызывается не чаще одного раза на ключ одновременно."""
+    if not enabled():
+        return compute()
+
+    cache = _cache()
+    key = request_key(namespace, request)
+    version = _version(cache, namespace)
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None and entry['version'] == version and not _should_refresh_early(entry, now):
+        metrics.record_cache('catalog', True)
+        return entry['value']
+    metrics.record_cache('catalog', False)
+
+    if entry is not None:
+        # Устаревшее значение есть: пересчитывает один запрос, остальные сразу получают старое
+        def refresh():
+            value = _store_locked(cache, key, version, compute)
+            return entry['value'] if value is _MISSING else value
+
+        return _single_flight(key, refresh, fallback=entry['value'])
+
+    def fill():
+        value = _store_locked(cache, key, version, compute)
+        if value is _MISSING:
+            value = _wait_for_fresh(cache, key, version)
+        if value is _MISSING:
+            # Другой процесс не успел: считаем сами, чтобы не держать запрос дольше
+            value = _store(cache, key, version, compute)
+        return value
+
+    return _single_flight(key, fill)
@@ -0,0 +1,105 @@
+"""
+Лента изменений каталога для офлайн-синхронизации мобильного приложения.
+
+Сигналы пишут в ChangeLog в той же транзакции, что и сами данные: upsert при сохранении
+и изменении M2M-навыков, tombstone при удалении. Клиент запрашивает
+GET /changes/?since=<курсор>&limit= и получает только изменившиеся объекты.
+compact() удаляет записи, перекрытые более поздними по тому же объекту.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from CourseApp import sharding
+from CourseApp.models import Branches, Category, ChangeFeedState, ChangeLog, Courses, EducationCentres, Skills
+from CourseApp.serializers import BranchesSerializer, CategorySerializer, CoursesSerializer, \
+    EducationCentresSerializer, SkillSerializer
+
+# Имя модели в ленте -> (модель, сериализатор)
+FEED_MODELS = {
+    'category': (Category, CategorySerializer),
+    'skill': (Skills, SkillSerializer),
+    'education_centre': (EducationCentres, EducationCentresSerializer),
+    'branch': (Branches, BranchesSerializer),
+    'course': (Courses, CoursesSerializer),
+}
+FEED_NAMES = {model: name for name, (model, serializer) in FEED_MODELS.items()}
+
+
+def record(model, object_ids, op=ChangeLog.UPSERT):
+    name = FEED_NAMES[model]
+    ChangeLog.objects.bulk_create(ChangeLog(model=name, object_id=pk, op=op) for pk in object_ids)
+
+
+def purged_through():
+    state = ChangeFeedState.objects.filter(pk=1).values_list('purged_through', flat=True).first()
+    return state or 0
+
+
+def read(since, limit, context=None):
+    """
+    Страница ленты после курсора since. Если объект встречается на странице несколько раз,
+    отдаётся только последнее состояние; данные upsert берутся одной выборкой на модель.
+    """
+    entries = list(ChangeLog.objects.filter(pk__gt=since).order_by('pk')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for entry in entries:
+        latest[(entry.model, entry.object_id)] = entry
+
+    wanted = {}
+    for (name, object_id), entry in latest.items():
+        if entry.op == ChangeLog.UPSERT:
+            wanted.setdefault(name, []).append(object_id)
+    objects = {}
+    for name, ids in wanted.items():
+        model, serializer_class = FEED_MODELS[name]
+        for obj in sharding.fetch(model.objects.filter(pk__in=ids)):
+            objects[(name, obj.pk)] = serializer_class(obj, context=context).data
+
+    changes = []
+    for entry in sorted(latest.values(), key=lambda e: e.pk):
+        key = (entry.model, entry.object_id)
+        if entry.op == ChangeLog.UPSERT and key in objects:
+            changes.append({'cursor': entry.pk, 'model': entry.model, 'id': entry.object_id,
+                            'op': ChangeLog.UPSERT, 'data': objects[key]})
+        else:
+            # Объект удалён позже, чем записан этот upsert: сразу отдаём удаление
+            changes.append({'cursor': entry.pk, 'model': entry.model, 'id': entry.object_id,
+                            'op': ChangeLog.DELETE})
+
+    return {
+        'cursor': entries[-1].pk if entries else since,
+        'has_more': has_more,
+        'changes': changes,
+    }
+
+
+def compact(tombstone_days=None, batch_size=1000):
+    """
+    Удаляет перекрытые записи (по каждому объекту остаётся последняя) и, если задано,
+    tombstone-записи старше tombstone_days. Возвращает количество удалённых строк.
+    """
+    latest_ids = ChangeLog.objects.values('model', 'object_id').annotate(last=Max('pk')).values('last')
+    deleted = 0
+    while True:
+        ids = list(ChangeLog.objects.exclude(pk__in=latest_ids).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += ChangeLog.objects.filter(pk__in=ids).delete()[0]
+
+    if tombstone_days is not None:
+        threshold = timezone.now() - timedelta(days=tombstone_days)
+        with transaction.atomic():
+            tombstones = ChangeLog.objects.filter(op=ChangeLog.DELETE, created_at__lt=threshold)
+            last_id = tombstones.aggregate(last=Max('pk'))['last']
+            if last_id is not None:
+                deleted += tombstones.filter(pk__lte=last_id).delete()[0]
+                state, _ = ChangeFeedState.objects.get_or_create(pk=1)
+                state.purged_through = max(state.purged_through, last_id)
+                state.save()
+    return deleted
@@ -0,0 +1,219 @@
+"""
+Быстрая сериализация списков без ModelSerializer.
+
+DRF на каждый объект строит модель и для каждого поля вызывает get_attribute/to_representation.
+Здесь поля сериализатора один раз «компилируются» в плоскую функцию (исходный код генерируется
+и собирается через exec), которая работает прямо по кортежам .values_list(): без создания моделей
+и без обхода дерева полей. Значения M2M (список pk) подтягиваются одним запросом к промежуточной
+таблице на всю страницу вместо запроса на каждый объект.
+
+Результат совпадает с ModelSerializer байт в байт (CourseApp/tests.py). Сериализаторы, которые
+нельзя скомпилировать (вложенные, SerializerMethodField, source через точку, свой to_representation),
+обслуживаются обычным путём: compile_serializer() возвращает None.
+
+Замер: manage.py bench_serializers.
+"""
+import functools
+
+from django.conf import settings
+from django.db import models
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Модельные поля, значения которых DRF отдаёт без преобразования (int(int), str(str), float(float))
+_PASSTHROUGH = {
+    drf_fields.IntegerField: (models.IntegerField, models.AutoField),
+    drf_fields.CharField: (models.CharField, models.TextField),
+    drf_fields.FloatField: (models.FloatField,),
+}
+
+
+class CompiledSerializer:
+    """Плоский экстрактор для сериализатора: columns — что выбрать через values_list()."""
+
+    def __init__(self, model, columns, extract, m2m, per_call):
+        self.model = model
+        self.columns = columns
+        self._extract = extract
+        # [(поле M2M модели)] в порядке параметров related экстрактора
+        self._m2m = m2m
+        # [(вид, поле сериализатора, поле модели)] для преобразователей, собираемых на каждый вызов
+        self._per_call = per_call
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def _related(self, rows, using):
+        if not self._m2m:
+            return ()
+        pks = [row[-1] for row in rows]
+        related = []
+        for model_field in self._m2m:
+            through = model_field.remote_field.through
+            source = model_field.m2m_column_name()
+            target = model_field.m2m_reverse_name()
+            mapping = {}
+            for start in range(0, len(pks), settings.COMPILED_SERIALIZERS_IN_BATCH):
+                pairs = through._default_manager.using(using) \
+                    .filter(**{f'{source}__in': pks[start:start + settings.COMPILED_SERIALIZERS_IN_BATCH]}) \
+                    .order_by(source, target).values_list(source, target)
+                for owner, value in pairs:
+                    mapping.setdefault(owner, []).append(value)
+            related.append(mapping)
+        return related
+
+    def _call_converters(self, context):
+        """Преобразователи, зависящие от запроса: абсолютные URL файлов и активный часовой пояс."""
+        request = context.get('request')
+        converters = []
+        for kind, field, model_field in self._per_call:
+            if kind == 'datetime':
+                converters.append(_datetime_converter(field))
+            elif not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                converters.append(str)
+            elif request is not None:
+                converters.append(lambda name, url=model_field.storage.url: request.build_absolute_uri(url(name)))
+            else:
+                converters.append(model_field.storage.url)
+        return converters
+
+    def serialize_rows(self, rows, context=None, using='default'):
+        """rows — кортежи из rows(queryset); using — база, из которой они получены (для M2M)."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        related = self._related(rows, using)
+        converters = self._call_converters(context or {})
+        extract = self._extract
+        return [extract(row, related, converters) for row in rows]
+
+    def serialize(self, queryset, context=None):
+        return self.serialize_rows(list(self.rows(queryset)), context, using=queryset.db)
+
+
+def _iso_8601(value):
+    # Как DateTimeField.to_representation в DRF
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _datetime_converter(field):
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        return _iso_8601(value.astimezone(field_timezone))
+    return convert
+
+
+def _plan_field(field, opts):
+    """(вид, модельное поле) для поля сериализатора; None — поле не компилируется."""
+    if field.source == '*' or '.' in field.source or field.write_only:
+        return None
+    try:
+        model_field = opts.get_field(field.source)
+    except Exception:
+        return None
+
+    if isinstance(field, relations.ManyRelatedField):
+        child = field.child_relation
+        if type(child) is not relations.PrimaryKeyRelatedField or child.pk_field is not None:
+            return None
+        if not model_field.many_to_many or not model_field.concrete:
+            return None
+        # Порядок pk в ответе DRF задаёт related_model.objects.all(): с Meta.ordering не повторяем его
+        if model_field.related_model._meta.ordering or model_field.remote_field.through._meta.ordering:
+            return None
+        return 'm2m', model_field
+
+    if not model_field.concrete or model_field.many_to_many or isinstance(field, serializers.BaseSerializer):
+        return None
+    if isinstance(field, relations.RelatedField):
+        if type(field) is not relations.PrimaryKeyRelatedField or field.pk_field is not None:
+            return None
+        return 'raw', model_field
+    # Значение берётся из столбца, поэтому поле не должно переопределять чтение атрибута
+    if type(field).get_attribute is not drf_fields.Field.get_attribute:
+        return None
+    if isinstance(field, drf_fields.FileField):
+        return 'file', model_field
+    if type(field) is drf_fields.DateTimeField and isinstance(model_field, models.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is not None and output_format.lower() == drf_fields.ISO_8601:
+            return 'datetime', model_field
+    if isinstance(model_field, _PASSTHROUGH.get(type(field), ())):
+        return 'raw', model_field
+    return 'convert', model_field
+
+
+@functools.lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """CompiledSerializer для ModelSerializer-класса или None, если нужен обычный путь."""
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return None
+    if serializer_class.to_representation is not serializers.Serializer.to_representation:
+        return None
+
+    model = serializer_class.Meta.model
+    opts = model._meta
+    columns, lines, namespace = [], [], {}
+    m2m, per_call = [], []
+
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        plan = _plan_field(field, opts)
+        if plan is None:
+            return None
+        kind, model_field = plan
+        key = repr(name)
+        if kind == 'm2m':
+            lines.append(f"{key}: related[{len(m2m)}].get(row[-1], [])")
+            m2m.append(model_field)
+            continue
+
+        index = len(columns)
+        columns.append(model_field.attname)
+        value = f"row[{index}]"
+        if kind == 'raw':
+            lines.append(f"{key}: {value}")
+        elif kind == 'file':
+            # DRF: пустое имя файла -> None
+            lines.append(f"{key}: call[{len(per_call)}]({value}) if {value} else None")
+            per_call.append((kind, field, model_field))
+        elif kind == 'datetime':
+            lines.append(f"{key}: None if {value} is None else call[{len(per_call)}]({value})")
+            per_call.append((kind, field, model_field))
+        else:
+            converter = f"c{index}"
+            namespace[converter] = field.to_representation
+            lines.append(f"{key}: None if {value} is None else {converter}({value})")
+
+    # pk всегда последний столбец: по нему раскладываются значения M2M
+    columns.append(opts.pk.attname)
+    source = "def extract(row, related, call):\n    return {\n" + \
+        "".join(f"        {line},\n" for line in lines) + "    }\n"
+    exec(compile(source, f"<compiled {serializer_class.__name__}>", 'exec'), namespace)
+    return CompiledSerializer(model, columns, namespace['extract'], m2m, per_call)
+
+
+class CompiledListMixin:
+    """Для ModelViewSet: list() через скомпилированный сериализатор, если он доступен."""
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class()) if settings.COMPILED_SERIALIZERS_ENABLED else None
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = compiled.rows(queryset)
+        page = self.paginate_queryset(rows)
+        data = compiled.serialize_rows(rows if page is None else page, self.get_serializer_context(), using=queryset.db)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,229 @@
+"""
+Сжатие ответов: gzip всегда, brotli и zstd — если установлены пакеты brotli / zstandard.
+
+Кодировка выбирается по Accept-Encoding (q-значения, при равенстве — порядок COMPRESSION_ENCODINGS).
+Для ответов из кэша каталога (CourseApp/catalog_cache.py) сжатое тело кладётся в кэш по хэшу
+исходного тела: одинаковый ответ сжимается один раз (и сильнее), а дальше отдаётся из кэша;
+sha256 на порядок дешевле сжатия. Остальные тела почти никогда не повторяются байт в байт —
+для них кэш только тратил бы память и время на сильное сжатие, они сжимаются обычным уровнем.
+Потоковые ответы сжимаются на лету: каждый фрагмент тела сбрасывается в вывод (sync flush),
+чтобы клиент получал его сразу, а не когда наберётся блок сжатия.
+
+Защита от BREACH: ответ на запрос с Authorization или Cookie может содержать секрет пользователя
+рядом с отражёнными данными запроса, и длина сжатого тела выдала бы его. Такие ответы сжимаются
+только gzip со случайным числом байтов в поле имени файла заголовка (как GZipMiddleware Django 4.2);
+у brotli и zstd такого поля нет.
+"""
+import gzip
+import hashlib
+import re
+import secrets
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+from CourseApp import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|javascript|xml|.*\+json|.*\+xml)|image/svg\+xml)')
+
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _gzip_stream(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 — формат gzip
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _pad_gzip(data, padding):
+    """Вставляет в заголовок gzip (первые 10 байт) поле FNAME из padding байтов: длина ответа случайна."""
+    header = bytearray(data[:10])
+    header[3] |= gzip.FNAME
+    return bytes(header) + b'a' * padding + b'\x00' + data[10:]
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _brotli_stream(level):
+    compressor = brotli.Compressor(quality=level)
+    return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _zstd_stream(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush)
+
+
+# кодировка -> (сжатие целиком, потоковое сжатие: (фрагмент со сбросом, завершение))
+CODECS = {'gzip': (_gzip, _gzip_stream)}
+if brotli is not None:
+    CODECS['br'] = (_brotli, _brotli_stream)
+if zstandard is not None:
+    CODECS['zstd'] = (_zstd, _zstd_stream)
+
+
+def available_encodings():
+    return [encoding for encoding in settings.COMPRESSION_ENCODINGS if encoding in CODECS]
+
+
+def choose_encoding(accept_encoding, allowed=None):
+    """Лучшая доступная (и входящая в allowed, если задан) кодировка по заголовку Accept-Encoding или None."""
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match[1])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best = None
+    for encoding in available_encodings():
+        if allowed is not None and encoding not in allowed:
+            continue
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, encoding)
+    return best[1] if best else None
+
+
+def _is_cacheable(request, response):
+    cache_control = response.get('Cache-Control', '').lower()
+    return (
+        getattr(response, 'catalog_cached', False)
+        and request.method in ('GET', 'HEAD')
+        and response.status_code == 200
+        and 'no-store' not in cache_control
+        and 'private' not in cache_control
+    )
+
+
+def _has_credentials(request):
+    return 'HTTP_AUTHORIZATION' in request.META or 'HTTP_COOKIE' in request.META
+
+
+def compress_body(body, encoding, cacheable, padding=0):
+    """
+    Сжимает тело; для кэшируемых ответов берёт/кладёт результат в кэш по хэшу тела.
+    padding (только gzip) — длина случайного поля заголовка для ответов с секретами.
+    """
+    compress, _ = CODECS[encoding]
+    if not cacheable:
+        compressed = compress(body, settings.COMPRESSION_LEVELS[encoding])
+        return _pad_gzip(compressed, padding) if padding else compressed
+
+    cache = caches[settings.COMPRESSION_CACHE]
+    key = f"compressed:{encoding}:{hashlib.sha256(body).hexdigest()}"
+    compressed = cache.get(key)
+    metrics.record_cache('compression', compressed is not None)
+    if compressed is None:
+        # Сжимается один раз на много ответов, поэтому можно позволить более высокий уровень
+        compressed = compress(body, settings.COMPRESSION_CACHED_LEVELS[encoding])
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def _stream_compressor(encoding, padding):
+    """(сжатие фрагмента, завершение); заголовок gzip с padding дополняется в первом непустом выводе."""
+    _, stream = CODECS[encoding]
+    compress, flush = stream(settings.COMPRESSION_LEVELS[encoding])
+    if not padding:
+        return compress, flush
+    started = False
+
+    def pad(data):
+        nonlocal started
+        if data and not started:
+            started = True
+            return _pad_gzip(data, padding)
+        return data
+
+    return lambda chunk: pad(compress(chunk)), lambda: pad(flush())
+
+
+def _compress_stream(chunks, encoding, padding=0):
+    compress, flush = _stream_compressor(encoding, padding)
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+async def _compress_async_stream(chunks, encoding, padding=0):
+    compress, flush = _stream_compressor(encoding, padding)
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+class CompressionMiddleware:
+    """Замена django.middleware.gzip.GZipMiddleware с brotli/zstd, порогом размера и кэшем сжатых тел."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        cacheable = not response.streaming and _is_cacheable(request, response)
+        # Ответ на запрос с учётными данными — только gzip со случайной длиной (BREACH)
+        private = _has_credentials(request) and not cacheable
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), ('gzip',) if private else None)
+        if encoding is None:
+            return response
+        padding = secrets.randbelow(settings.COMPRESSION_RANDOM_BYTES) + 1 if private else 0
+
+        if response.streaming:
+            compress_stream = _compress_async_stream if response.is_async else _compress_stream
+            response.streaming_content = compress_stream(response.streaming_content, encoding, padding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_body(response.content, encoding, cacheable, padding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Сжатое представление отличается по байтам — сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
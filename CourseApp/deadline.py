@@ -0,0 +1,223 @@
+"""
+Срок выполнения запроса и сброс нагрузки.
+
+Срок (deadline) берётся из заголовков клиента или прокси:
+- X-Request-Deadline: абсолютное время (unix, секунды/мс/мкс), после которого ответ никому не нужен;
+- X-Request-Timeout: бюджет в секундах от момента приёма запроса прокси;
+- X-Request-Start: когда прокси принял запрос (nginx: proxy_set_header X-Request-Start "t=${msec}";).
+  Разница с текущим временем — время в очереди перед воркером.
+Без заголовков срок — REQUEST_DEFAULT_TIMEOUT от начала обработки. Часы прокси и приложения
+должны быть синхронизированы (NTP).
+
+До вызова view (после разбора URL) запрос отклоняется:
+- 504, если срок уже истёк — клиент или прокси ответа не дождутся;
+- 503 с Retry-After, если его класс приоритета (REQUEST_PRIORITIES по имени маршрута) не допускает
+  текущего времени в очереди, числа запросов в обработке или слишком малого остатка срока.
+  Пороги у низкого приоритета (swagger, querylog) строже, поэтому при перегрузке он отсекается первым.
+
+На время запроса остаток срока становится бюджетом SQL для чтения: SELECT после истечения срока
+не отправляется, на SQLite долгий запрос прерывается progress handler'ом, на PostgreSQL
+выставляется statement_timeout. Прерванный по сроку запрос завершается ответом 504.
+Первая пишущая команда снимает бюджет до конца запроса: запись, сигналы, журнал изменений,
+очередь задач и on_commit-хуки выполняются до конца, иначе клиент получил бы 504 на уже
+созданный объект. Срок из заголовков клиента не может быть дальше REQUEST_MAX_TIMEOUT.
+"""
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+
+from CourseApp import metrics
+
+# Через сколько инструкций виртуальной машины SQLite проверять срок
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def _parse_timestamp(value):
+    """Unix-время из заголовка: 't=1712345678.123', секунды, миллисекунды или микросекунды."""
+    value = value.strip()
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        timestamp = float(value)
+    except ValueError:
+        return None
+    if timestamp > 1e14:
+        return timestamp / 1e6
+    if timestamp > 1e11:
+        return timestamp / 1e3
+    return timestamp
+
+
+def request_timing(request, now=None):
+    """(время в очереди в секундах или None, срок в шкале time.monotonic())."""
+    now = time.time() if now is None else now
+    monotonic = time.monotonic()
+    meta = request.META
+
+    started = _parse_timestamp(meta['HTTP_X_REQUEST_START']) if 'HTTP_X_REQUEST_START' in meta else None
+    queue_time = max(now - started, 0.0) if started is not None else None
+
+    deadline = None
+    if 'HTTP_X_REQUEST_DEADLINE' in meta:
+        deadline = _parse_timestamp(meta['HTTP_X_REQUEST_DEADLINE'])
+    if deadline is None and 'HTTP_X_REQUEST_TIMEOUT' in meta:
+        try:
+            deadline = (started or now) + float(meta['HTTP_X_REQUEST_TIMEOUT'])
+        except ValueError:
+            deadline = None
+    if deadline is None:
+        deadline = (started or now) + settings.REQUEST_DEFAULT_TIMEOUT
+    # Клиент может сократить срок, но не продлить его сверх REQUEST_MAX_TIMEOUT
+    deadline = min(deadline, (started or now) + settings.REQUEST_MAX_TIMEOUT)
+    return queue_time, monotonic + (deadline - now)
+
+
+def remaining(request):
+    """Сколько секунд осталось до срока запроса (inf, если срок не задан)."""
+    deadline = getattr(request, 'deadline', None)
+    return float('inf') if deadline is None else deadline - time.monotonic()
+
+
+def priority(request):
+    match = getattr(request, 'resolver_match', None)
+    name = match.view_name if match is not None else None
+    return settings.REQUEST_PRIORITIES.get(name, settings.REQUEST_DEFAULT_PRIORITY)
+
+
+_WRITE_WORDS = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+def _is_read(sql):
+    """SELECT, а также EXPLAIN (журнал запросов строит план медленного SELECT) и WITH … SELECT без записи."""
+    head = sql.lstrip()[:7].upper()
+    if head.startswith('SELECT'):
+        return True
+    if head.startswith(('EXPLAIN', 'WITH')):
+        return not _WRITE_WORDS.search(sql)
+    return False
+
+
+class _StatementBudget:
+    """
+    execute_wrapper: не отправляет чтение после срока и ограничивает время его выполнения остатком
+    срока. С первой не читающей командой (в том числе SAVEPOINT) бюджет снимается до конца запроса.
+    """
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.installed = {}
+        self.armed = True
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.armed:
+            return execute(sql, params, many, context)
+        if many or not _is_read(sql):
+            self.armed = False
+            self.uninstall()
+            return execute(sql, params, many, context)
+        left = self.deadline - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded
+        connection = context['connection']
+        if connection.alias not in self.installed:
+            self._install(connection, left)
+        return execute(sql, params, many, context)
+
+    def _install(self, connection, left):
+        deadline = self.deadline
+        if connection.vendor == 'sqlite':
+            # Ненулевой результат обработчика прерывает запрос (OperationalError: interrupted)
+            connection.connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        elif connection.vendor == 'postgresql':
+            with connection.connection.cursor() as cursor:
+                cursor.execute("SET statement_timeout = %s", [max(int(left * 1000), 1)])
+        else:
+            return
+        self.installed[connection.alias] = connection
+
+    def uninstall(self):
+        installed, self.installed = self.installed, {}
+        for connection in installed.values():
+            try:
+                if connection.vendor == 'sqlite':
+                    connection.connection.set_progress_handler(None, 0)
+                else:
+                    with connection.connection.cursor() as cursor:
+                        cursor.execute("SET statement_timeout TO DEFAULT")
+            except Exception:
+                # Соединение с неизвестным таймаутом не должно достаться следующему запросу
+                connection.close()
+
+
+class DeadlineMiddleware:
+    """Ставится сразу после MetricsMiddleware."""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_DEADLINE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        request.queue_time, request.deadline = request_timing(request)
+        budget = request.deadline_budget = _StatementBudget(request.deadline)
+        with self.lock:
+            self.in_flight += 1
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(budget))
+                return self.get_response(request)
+        finally:
+            budget.uninstall()
+            with self.lock:
+                self.in_flight -= 1
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = metrics.route_name(request)
+        left = remaining(request)
+        if left <= 0:
+            metrics.record_shed(route, 'expired')
+            return self._expired()
+
+        limits = settings.REQUEST_PRIORITY_CLASSES[priority(request)]
+        reason = None
+        if limits.get('max_queue_time') is not None and (request.queue_time or 0) > limits['max_queue_time']:
+            reason = 'queue_time'
+        elif limits.get('max_in_flight') is not None and self.in_flight > limits['max_in_flight']:
+            reason = 'in_flight'
+        elif left < limits.get('min_remaining', 0):
+            reason = 'deadline'
+        if reason is None:
+            return None
+
+        metrics.record_shed(route, reason)
+        response = JsonResponse({'error': "Сервер перегружен, повторите запрос позже."}, status=503,
+                                json_dumps_params={'ensure_ascii': False})
+        response['Retry-After'] = str(settings.REQUEST_SHED_RETRY_AFTER)
+        return response
+
+    def process_exception(self, request, exception):
+        # После начала записи ошибка БД — настоящая ошибка, а не прерванное по сроку чтение
+        budget = getattr(request, 'deadline_budget', None)
+        interrupted = isinstance(exception, DatabaseError) and budget is not None and budget.armed \
+            and remaining(request) <= 0
+        if isinstance(exception, DeadlineExceeded) or interrupted:
+            metrics.record_shed(metrics.route_name(request), 'expired')
+            return self._expired()
+        return None
+
+    def _expired(self):
+        return JsonResponse({'error': "Истёк срок выполнения запроса."}, status=504,
+                            json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,58 @@
+"""
+Ленивая и отключаемая Swagger-документация.
+
+drf_yasg тянет за собой uritemplate, inflection, PyYAML и генераторы схем, поэтому
+schema_view собирается только при первом обращении к /swagger/, а при
+API_DOCS_ENABLED = False декораторы превращаются в заглушки и drf_yasg не импортируется.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+if settings.API_DOCS_ENABLED:
+    from drf_yasg import openapi
+    from drf_yasg.utils import swagger_auto_schema
+else:
+    class openapi:
+        """Заглушка drf_yasg.openapi на случай отключённой документации."""
+
+        @staticmethod
+        def Response(description, schema=None, **kwargs):
+            return description
+
+    def swagger_auto_schema(*args, **kwargs):
+        def decorator(view_method):
+            return view_method
+        return decorator
+
+
+@lru_cache(maxsize=None)
+def get_docs_schema_view():
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    return get_schema_view(
+        openapi.Info(
+            title="Project API",
+            default_version="v1",
+            description="Example API",
+        ),
+        public=True,
+        permission_classes=([permissions.AllowAny,]),
+    )
+
+
+@lru_cache(maxsize=None)
+def _docs_view(renderer=None):
+    schema_view = get_docs_schema_view()
+    if renderer is None:
+        return schema_view.without_ui(cache_timeout=0)
+    return schema_view.with_ui(renderer, cache_timeout=0)
+
+
+def schema_json(request, *args, **kwargs):
+    return _docs_view()(request, *args, **kwargs)
+
+
+def schema_swagger_ui(request, *args, **kwargs):
+    return _docs_view("swagger")(request, *args, **kwargs)
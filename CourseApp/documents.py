@@ -0,0 +1,153 @@
+"""
+Денормализованные карточки курсов (CourseDocument) для быстрого списка /courses/cards/.
+
+Карточка — JSON с полями курса, названием категории, названием/логотипом/рейтингом
+учебного центра и названиями навыков. Список отдаётся одной выборкой готовых JSON-строк
+по индексу (category, course) / (education_centre, course), без JOIN и без построения моделей.
+
+Сигналы помечают изменённый курс, после коммита его карточка пересобирается сразу.
+Переименование категории, центра или навыка и массовые изменения в админке затрагивают
+много курсов: их карточки пересобирает воркер очереди задач (CourseApp/tasks.py, manage.py run_tasks).
+Полная пересборка — manage.py rebuild_course_documents.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from CourseApp import tasks
+from CourseApp.models import CourseDocument, Courses
+
+BATCH_SIZE = 500
+
+# Поля связанных моделей, попадающие в карточку: их изменение пересобирает карточки курсов
+CATEGORY_CARD_FIELDS = ('name',)
+EDUCATION_CENTRE_CARD_FIELDS = ('name', 'logo', 'rate')
+SKILL_CARD_FIELDS = ('name',)
+
+
+def enabled():
+    return settings.COURSE_CARDS_ENABLED
+
+
+def _url(file):
+    # Относительный URL: карточка общая для всех хостов
+    return file.url if file else None
+
+
+def build_card(course):
+    """Карточка курса; course — с select_related('category', 'education_centre') и prefetch skills."""
+    centre = course.education_centre
+    return {
+        'id': course.pk,
+        'name': course.name,
+        'image': _url(course.image_one),
+        'duration': course.duration,
+        'rate': course.rate,
+        'price_month': course.price_month,
+        'full_price': course.full_price,
+        'discount': course.discount,
+        'price_month_effective': course.price_month_effective,
+        'full_price_effective': course.full_price_effective,
+        'education_type': course.education_type,
+        'category': {'id': course.category_id, 'name': course.category.name},
+        'education_centre': {'id': centre.pk, 'name': centre.name, 'logo': _url(centre.logo), 'rate': centre.rate},
+        'skills': [skill.name for skill in sorted(course.skills.all(), key=lambda skill: skill.pk)],
+    }
+
+
+def card_json(course):
+    return json.dumps(build_card(course), cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def rebuild(course_ids, batch_size=BATCH_SIZE):
+    """Пересобирает карточки указанных курсов. Возвращает число записанных карточек."""
+    course_ids = sorted(set(course_ids))
+    written = 0
+    for start in range(0, len(course_ids), batch_size):
+        batch = course_ids[start:start + batch_size]
+        courses = Courses.objects.filter(pk__in=batch) \
+            .select_related('category', 'education_centre').prefetch_related('skills')
+        documents = [
+            CourseDocument(course_id=course.pk, category_id=course.category_id,
+                           education_centre_id=course.education_centre_id, body=card_json(course))
+            for course in courses
+        ]
+        CourseDocument.objects.bulk_create(
+            documents, update_conflicts=True, unique_fields=['course'],
+            update_fields=['category', 'education_centre', 'body', 'updated_at'],
+        )
+        written += len(documents)
+    return written
+
+
+def rebuild_all(batch_size=BATCH_SIZE):
+    course_ids = list(Courses.objects.values_list('pk', flat=True))
+    with transaction.atomic():
+        CourseDocument.objects.exclude(course_id__in=Courses.objects.values('pk')).delete()
+        return rebuild(course_ids, batch_size=batch_size)
+
+
+def find_missing():
+    """id курсов без карточки."""
+    return list(Courses.objects.filter(document__isnull=True).values_list('pk', flat=True))
+
+
+def _flush_pending():
+    connection = transaction.get_connection()
+    pending, connection.documents_pending = getattr(connection, 'documents_pending', set()), set()
+    rebuild(pending)
+
+
+def schedule_rebuild(course_ids):
+    """
+    Помечает карточки для пересборки после коммита; пометки в одной транзакции схлопываются:
+    callback ставится на каждую пометку (его может отменить откат точки сохранения),
+    всё накопленное пересобирает первый из них (как stats.schedule_refresh).
+    """
+    if not enabled():
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        rebuild(course_ids)
+        return
+
+    if not hasattr(connection, 'documents_pending'):
+        connection.documents_pending = set()
+    connection.documents_pending.update(course_ids)
+    transaction.on_commit(_flush_pending)
+
+
+@tasks.task('rebuild_course_documents', batch=True)
+def run_rebuilds(payloads):
+    rebuild(course_id for payload in payloads for course_id in payload['course_ids'])
+
+
+def enqueue_rebuild(course_ids):
+    """Пересборка карточек многих курсов в фоне: задача на каждые BATCH_SIZE курсов."""
+    if not enabled():
+        return
+    course_ids = sorted(set(course_ids))
+    for start in range(0, len(course_ids), BATCH_SIZE):
+        tasks.enqueue('rebuild_course_documents', course_ids=course_ids[start:start + BATCH_SIZE])
+
+
+def schedule_rebuild_for(related_filter):
+    """
+    Пересборка карточек всех курсов по фильтру, например {'category_id': 5}. id выбираются сразу:
+    после clear() или удаления навыка связей уже не найти.
+    """
+    if not enabled():
+        return
+    enqueue_rebuild(Courses.objects.filter(**related_filter).values_list('pk', flat=True))
+
+
+def card_fields_changed(instance, fields):
+    """Изменились ли у существующего объекта поля, попадающие в карточку (сравнение с БД до save)."""
+    if instance._state.adding or instance.pk is None:
+        return False
+    old = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None:
+        return False
+    return any(old[field] != getattr(instance, field) for field in fields)
@@ -0,0 +1,225 @@
+"""
+Почти-дубликаты курсов: MinHash по шинглам текста и LSH-индекс по полосам подписи.
+
+Текст курса (name + description) нормализуется как для поиска (CourseApp/text.py) и режется
+на символьные шинглы длины DUPLICATES_SHINGLE. Подпись — DUPLICATES_NUM_PERM минимумов
+хэшей шинглов под разными перестановками; доля совпавших позиций двух подписей — оценка
+коэффициента Жаккара их шинглов. Подпись делится на DUPLICATES_BANDS полос, хэш каждой полосы —
+корзина в CourseLSHBucket. Курсы, совпавшие хотя бы в одной корзине, — кандидаты: их подписи
+сравниваются, остальной каталог не просматривается. Порог попадания в кандидаты ≈ (1/bands)^(1/rows).
+
+При создании курса через API (CoursesViewSet.create) найденные дубликаты либо отклоняют запрос,
+либо сохраняются в CourseDuplicate (DUPLICATES_MODE). Индекс обновляется сигналами после коммита,
+кластеры по всему каталогу — manage.py find_duplicates.
+
+Миграция не заполняет индекс для уже существующих курсов (нужен numpy и текущие настройки):
+после неё, как и после смены NUM_PERM, BANDS или SHINGLE, выполните manage.py find_duplicates --rebuild.
+До этого существующие курсы не находятся как дубликаты.
+
+С шардированием индекс лежит в шарде курса, поэтому при создании сравнение идёт с курсами того же шарда.
+"""
+import functools
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from CourseApp import sharding
+from CourseApp.models import CourseDuplicate, CourseLSHBucket, CourseMinHash, Courses
+from CourseApp.text import normalize_search_text
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Простое число Мерсенна 2^31 - 1: a * x + b в uint64 не переполняется
+PRIME = (1 << 31) - 1
+# Перестановки должны совпадать у всех процессов и между запусками
+PERMUTATION_SEED = 20240601
+BATCH_SIZE = 500
+
+
+def enabled():
+    return np is not None and settings.DUPLICATES_ENABLED
+
+
+@functools.lru_cache(maxsize=None)
+def _permutations(num_perm):
+    rng = np.random.default_rng(PERMUTATION_SEED)
+    a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def course_text(name, description):
+    return f"{name} {description}"
+
+
+def shingles(text):
+    text = normalize_search_text(text)
+    size = settings.DUPLICATES_SHINGLE
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(text):
+    """MinHash-подпись: массив uint32 длины DUPLICATES_NUM_PERM."""
+    a, b = _permutations(settings.DUPLICATES_NUM_PERM)
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode()) % PRIME for shingle in shingles(text)), dtype=np.uint64
+    )
+    values = (np.outer(hashes, a) + b) % PRIME
+    return values.min(axis=0).astype(np.uint32)
+
+
+def bands(sig):
+    """[(номер полосы, корзина)]; корзина — 64-битный хэш значений полосы."""
+    rows = len(sig) // settings.DUPLICATES_BANDS
+    result = []
+    for band in range(settings.DUPLICATES_BANDS):
+        digest = hashlib.blake2b(sig[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        result.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return result
+
+
+def similarity(sig_a, sig_b):
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+def _from_bytes(value):
+    return np.frombuffer(bytes(value), dtype=np.uint32)
+
+
+def index(course_ids, using='default'):
+    """Пересчитывает подписи и корзины указанных курсов. Возвращает число проиндексированных."""
+    course_ids = sorted(set(course_ids))
+    written = 0
+    for start in range(0, len(course_ids), BATCH_SIZE):
+        batch = course_ids[start:start + BATCH_SIZE]
+        rows = Courses.objects.using(using).filter(pk__in=batch).values_list('pk', 'name', 'description')
+        signatures = {pk: signature(course_text(name, description)) for pk, name, description in rows}
+        with transaction.atomic(using=using):
+            CourseMinHash.objects.using(using).bulk_create(
+                [CourseMinHash(course_id=pk, signature=sig.tobytes()) for pk, sig in signatures.items()],
+                update_conflicts=True, unique_fields=['course'], update_fields=['signature', 'updated_at'],
+            )
+            CourseLSHBucket.objects.using(using).filter(course_id__in=batch).delete()
+            CourseLSHBucket.objects.using(using).bulk_create([
+                CourseLSHBucket(course_id=pk, band=band, bucket=bucket)
+                for pk, sig in signatures.items() for band, bucket in bands(sig)
+            ])
+        written += len(signatures)
+    return written
+
+
+def find(name, description, using='default', exclude=None, threshold=None, limit=10):
+    """[(id курса, оценка схожести)] для текста, по убыванию схожести; просматриваются только кандидаты LSH."""
+    threshold = settings.DUPLICATES_THRESHOLD if threshold is None else threshold
+    sig = signature(course_text(name, description))
+    candidates = set()
+    for band, bucket in bands(sig):
+        candidates.update(
+            CourseLSHBucket.objects.using(using).filter(band=band, bucket=bucket)
+            .values_list('course_id', flat=True)[:settings.DUPLICATES_MAX_BUCKET]
+        )
+    candidates.discard(exclude)
+    if not candidates:
+        return []
+    found = []
+    for pk, stored in CourseMinHash.objects.using(using).filter(course_id__in=candidates) \
+            .values_list('course_id', 'signature'):
+        score = similarity(sig, _from_bytes(stored))
+        if score >= threshold:
+            found.append((pk, score))
+    found.sort(key=lambda item: (-item[1], item[0]))
+    return found[:limit]
+
+
+def database_for_centre(centre_id):
+    return sharding.shard_for_centre(centre_id) if sharding.enabled() else 'default'
+
+
+def flag(course, found):
+    CourseDuplicate.objects.using(course._state.db).bulk_create(
+        [CourseDuplicate(course=course, duplicate_of_id=pk, similarity=score) for pk, score in found],
+        ignore_conflicts=True,
+    )
+
+
+def _flush_pending(using):
+    connection = transaction.get_connection(using)
+    pending, connection.duplicates_pending = getattr(connection, 'duplicates_pending', set()), set()
+    index(pending, using)
+
+
+def schedule_index(course_ids, using='default'):
+    """Переиндексация после коммита; пометки в одной транзакции схлопываются (как stats.schedule_refresh)."""
+    if not enabled():
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        index(course_ids, using)
+        return
+
+    if not hasattr(connection, 'duplicates_pending'):
+        connection.duplicates_pending = set()
+    connection.duplicates_pending.update(course_ids)
+    transaction.on_commit(functools.partial(_flush_pending, using), using=using)
+
+
+def clusters(using='default', threshold=None):
+    """
+    Группы почти-дубликатов по всему индексу базы: пары-кандидаты из общих корзин проверяются
+    по подписям и объединяются (union-find). Корзины больше DUPLICATES_MAX_BUCKET пропускаются.
+    """
+    threshold = settings.DUPLICATES_THRESHOLD if threshold is None else threshold
+    signatures = {
+        pk: _from_bytes(stored)
+        for pk, stored in CourseMinHash.objects.using(using).values_list('course_id', 'signature').iterator(chunk_size=2000)
+    }
+    parent = {}
+
+    def root(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    scores = {}
+    checked = set()
+
+    def process(members):
+        if len(members) < 2 or len(members) > settings.DUPLICATES_MAX_BUCKET:
+            return
+        members.sort()
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                if first not in signatures or second not in signatures:
+                    continue
+                score = similarity(signatures[first], signatures[second])
+                if score >= threshold:
+                    scores[(first, second)] = score
+                    parent[root(second)] = root(first)
+
+    rows = CourseLSHBucket.objects.using(using).order_by('band', 'bucket', 'course_id') \
+        .values_list('band', 'bucket', 'course_id').iterator(chunk_size=5000)
+    current, members = None, []
+    for band, bucket, pk in rows:
+        if (band, bucket) != current:
+            process(members)
+            current, members = (band, bucket), []
+        members.append(pk)
+    process(members)
+
+    groups = {}
+    for pair in scores:
+        for pk in pair:
+            groups.setdefault(root(pk), set()).add(pk)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: group[0]), scores
@@ -0,0 +1,147 @@
+"""
+Заголовок Idempotency-Key для пишущих запросов.
+
+Мобильные клиенты на плохой сети повторяют регистрацию, проверку кода, сброс пароля и создание
+записей каталога; каждый повтор заново хэширует пароль, генерирует код и пишет в БД. Для маршрутов
+из IDEMPOTENCY_ROUTES запрос с заголовком Idempotency-Key выполняется один раз:
+
+- ключ записи — sha256 от клиента (заголовок Authorization, без него — IP), метода, пути, значения
+  заголовка и тела запроса, поэтому тот же ключ с другим телом — другой запрос;
+- первый запрос вставляет запись-аренду (IdempotencyKey без ответа) и выполняет view, ответ
+  сохраняется на IDEMPOTENCY_TTL секунд;
+- повтор во время выполнения ждёт ответа первого (до IDEMPOTENCY_WAIT секунд и не дольше срока
+  запроса), затем получает 409 с Retry-After;
+- повтор после выполнения получает сохранённый ответ с заголовком Idempotent-Replayed, view
+  не вызывается.
+
+Ответы 5xx, 409 и 429 не сохраняются — такой запрос можно повторить. Если воркер упал посреди
+запроса, аренда истекает через IDEMPOTENCY_LEASE секунд и ключ перехватывает следующий повтор.
+Запросы с телом больше DATA_UPLOAD_MAX_MEMORY_SIZE обрабатываются как обычно. Просроченные записи
+удаляет задача purge_idempotency_keys (run_maintenance).
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from CourseApp import deadline
+from CourseApp.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Такие ответы означают «не выполнено, повторите» — их не запоминаем
+RETRYABLE_STATUSES = (409, 429)
+SKIPPED_HEADERS = ('content-length',)
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def request_key(request):
+    """Ключ записи для запроса; None — запрос обрабатывается без идемпотентности."""
+    value = request.headers.get(HEADER)
+    match = getattr(request, 'resolver_match', None)
+    if not value or request.method not in UNSAFE_METHODS or match is None \
+            or match.view_name not in settings.IDEMPOTENCY_ROUTES:
+        return None
+    if int(request.META.get('CONTENT_LENGTH') or 0) > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+        return None
+
+    client = request.headers.get('Authorization') or request.META.get('REMOTE_ADDR', '')
+    digest = hashlib.sha256()
+    for part in (client, request.method, request.path, value, request.content_type):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _acquire(key):
+    """Берёт аренду на выполнение запроса. False — запись занята или уже содержит ответ."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+    expires = now + timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key, locked_until=lease, expires_at=expires)
+        return True
+    except IntegrityError:
+        pass
+    # Запись с истёкшим сроком хранения или брошенная аренда упавшего воркера
+    stale = Q(expires_at__lte=now) | Q(status_code__isnull=True, locked_until__lt=now)
+    return bool(IdempotencyKey.objects.filter(stale, key=key).update(
+        locked_until=lease, expires_at=expires, created_at=now, status_code=None, headers={}, content=None,
+    ))
+
+
+def _stored_response(key):
+    record = IdempotencyKey.objects.filter(
+        key=key, status_code__isnull=False, expires_at__gt=timezone.now(),
+    ).values_list('status_code', 'headers', 'content').first()
+    if record is None:
+        return None
+    status_code, headers, content = record
+    response = HttpResponse(bytes(content), status=status_code)
+    for name, value in headers.items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(key, response):
+    if response.streaming or response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        IdempotencyKey.objects.filter(key=key).delete()
+        return
+    IdempotencyKey.objects.filter(key=key).update(
+        locked_until=None,
+        status_code=response.status_code,
+        headers={name: value for name, value in response.items() if name.lower() not in SKIPPED_HEADERS},
+        content=response.content,
+    )
+
+
+class IdempotencyMiddleware:
+    """Ставится последним: ключ берётся только у запросов, дошедших до view."""
+
+    def __init__(self, get_response):
+        if not settings.IDEMPOTENCY_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'idempotency_key', None)
+        if key is not None:
+            _store(key, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if len(request.headers.get(HEADER, '')) > MAX_KEY_LENGTH:
+            return _error(f"Заголовок {HEADER} длиннее {MAX_KEY_LENGTH} символов.", 400)
+        key = request_key(request)
+        if key is None:
+            return None
+
+        wait_until = time.monotonic() + min(settings.IDEMPOTENCY_WAIT, deadline.remaining(request))
+        while True:
+            if _acquire(key):
+                request.idempotency_key = key
+                return None
+            response = _stored_response(key)
+            if response is not None:
+                return response
+            if time.monotonic() >= wait_until:
+                break
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        response = _error("Запрос с этим ключом ещё выполняется.", 409)
+        response['Retry-After'] = str(max(1, round(settings.IDEMPOTENCY_WAIT)))
+        return response
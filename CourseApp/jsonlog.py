@@ -0,0 +1,198 @@
+"""
+Структурные логи в формате JSON Lines без блокировки потоков запросов.
+
+Поток запроса только кладёт запись в ограниченную очередь (AsyncQueueHandler, put_nowait).
+Фоновый поток QueueListener форматирует записи в JSON и пишет их в поток вывода пачками:
+одна запись write() на LOG_BATCH_SIZE строк или на всё, что накопилось, когда очередь опустела.
+Если вывод завис (переполненный pipe, медленный диск), очередь заполняется и новые записи
+отбрасываются с подсчётом; при возобновлении записи в лог попадает строка с числом потерянных.
+
+- SamplingFilter: доля сохраняемых записей ниже WARNING по префиксу имени логгера (LOG_SAMPLING).
+- Поля из LOG_REDACT_KEYS (пароли, коды, токены) заменяются на '***', поля из LOG_MASK_KEYS
+  (телефон) — маскируются, кроме последних цифр. Значения передаются через extra={...}.
+
+Подключение — settings.LOGGING (dictConfig). Поток-писатель создаётся лениво в каждом процессе,
+поэтому работает и после fork воркеров gunicorn с preload_app.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+# Атрибуты LogRecord, которые не являются пользовательскими полями extra
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+REDACTED = '***'
+
+
+def _matches(key, keys):
+    key = key.lower()
+    return key not in settings.LOG_SAFE_KEYS and any(part in key for part in keys)
+
+
+def redact(value, key=''):
+    """Копия значения с заменой чувствительных полей (в том числе во вложенных dict/list)."""
+    if key and _matches(key, settings.LOG_REDACT_KEYS):
+        return REDACTED
+    if key and _matches(key, settings.LOG_MASK_KEYS) and value:
+        text = str(value)
+        return '*' * max(len(text) - 4, 0) + text[-4:]
+    if isinstance(value, dict):
+        return {name: redact(item, str(name)) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class JSONLineFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and not name.startswith('_'):
+                entry[name] = redact(value, name)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей ниже WARNING; rates — {префикс имени логгера: доля}."""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # Длинные префиксы проверяются первыми
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class BatchingStreamHandler(logging.Handler):
+    """Обработчик на стороне фонового потока: копит строки и пишет их одним вызовом."""
+
+    def __init__(self, stream, source, batch_size):
+        super().__init__()
+        self.stream = stream
+        self.source = source
+        self.batch_size = batch_size
+        self.buffer = []
+        self.setFormatter(JSONLineFormatter())
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+        if len(self.buffer) >= self.batch_size or self.source.empty():
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        lines, self.buffer = self.buffer, []
+        try:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+        except Exception:
+            # Ошибку вывода некуда логировать: строки теряются, поток-писатель продолжает работу
+            pass
+
+
+class _Listener(QueueListener):
+    def __init__(self, log_queue, handler):
+        super().__init__(log_queue, handler, respect_handler_level=False)
+        self.handler = handler
+
+    def stop(self, timeout=1.0):
+        # В отличие от QueueListener.stop не ждём бесконечно зависший вывод при выходе из процесса
+        try:
+            self.queue.put_nowait(self._sentinel)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.handler.flush()
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Неблокирующий обработчик для settings.LOGGING:
+    stream — 'stdout', 'stderr' или путь к файлу; queue_size — предел очереди, после него записи теряются.
+    """
+
+    def __init__(self, stream='stdout', queue_size=10000, batch_size=256):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.stream_name = stream
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def _open_stream(self):
+        if self.stream_name in ('stdout', 'stderr'):
+            return getattr(sys, self.stream_name)
+        return open(self.stream_name, 'a', encoding='utf-8', buffering=1024 * 1024)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # После fork поток-писатель родителя в процессе не существует, а очередь может содержать его записи
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self.dropped = 0
+            handler = BatchingStreamHandler(self._open_stream(), self.queue, self.batch_size)
+            self._listener = _Listener(self.queue, handler)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+    def prepare(self, record):
+        # Форматирование в JSON — в фоновом потоке; здесь только то, что нельзя отложить
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(record.name, logging.WARNING, __file__, 0,
+                                       "Очередь логов была переполнена, записи потеряны", None, None)
+            notice.dropped = dropped
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
@@ -0,0 +1,472 @@
+"""
+Нагрузочное тестирование HTTP с открытой моделью нагрузки (manage.py loadtest).
+
+Приложение запускается локально под выбранным сервером (runserver, gunicorn — WSGI, uvicorn — ASGI)
+с заданным числом воркеров/потоков, либо нагружается уже запущенный сервер (--url).
+
+Запросы отправляются с фиксированной интенсивностью (равномерно или пуассоновским потоком)
+независимо от того, ответил ли сервер на предыдущие: задержка считается от запланированного
+момента отправки, а не от фактического. Так медленные ответы не «притормаживают» генератор
+и не прячут хвост распределения (coordinated omission). Запрос, который не успели отправить
+за --timeout от запланированного момента, считается ошибкой без отправки.
+
+Трафик — записанный (JSON Lines: {"method", "path", "body", "auth"}) или синтезированный из
+маршрутов CourseApp/urls.py по весам MIX с id из текущей базы: списки каталога с фильтрами
+и сортировкой, карточки, детальные страницы, похожие курсы, автодополнение, вход по паролю.
+Часть запросов (--auth-share) идёт с JWT, полученным при входе.
+
+Для каждой ступени интенсивности и каждого маршрута собирается гистограмма задержек по схеме
+HdrHistogram, доли ответов 4xx/5xx и ошибок соединения. Точка насыщения — первая ступень, где
+p99 выше SLO, доля ошибок выше порога или сервер обработал меньше SATURATION_THROUGHPUT
+от поданного потока.
+"""
+import http.client
+import importlib.util
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from CourseApp.models import Category, Courses, EducationCentres, Skills
+
+API_PREFIX = '/api/v1'
+# Точность гистограммы: 2^(SUB_BUCKET_BITS - 1) значений на каждую степень двойки (погрешность < 1%)
+SUB_BUCKET_BITS = 8
+PERCENTILES = (50, 90, 99, 99.9)
+# Ниже этой доли поданного потока сервер считается насыщенным
+SATURATION_THROUGHPUT = 0.9
+# С меньшим числом запросов маршрута p99 и доли не показательны — насыщение не определяется
+MIN_SAMPLES = 20
+SAMPLE_IDS = 1000
+MAX_TOKENS = 100
+
+# Синтезированная смесь: маршрут -> вес
+MIX = {
+    'courses-list': 25,
+    'courses-detail': 20,
+    'courses-cards': 15,
+    'education-centres-list': 8,
+    'education-centres-detail': 8,
+    'courses-similar': 6,
+    'autocomplete': 8,
+    'categories-list': 4,
+    'skills-list': 4,
+    'login': 2,
+}
+COURSE_ORDERINGS = ('name', '-name', 'price_month_effective', '-price_month_effective', '-rate', '-created_at')
+
+Request = namedtuple('Request', 'route method path body auth')
+
+
+class Histogram:
+    """
+    Гистограмма задержек в микросекундах: значения до 2^SUB_BUCKET_BITS хранятся точно, дальше
+    каждая степень двойки делится на 2^(SUB_BUCKET_BITS - 1) корзин, как в HdrHistogram.
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @staticmethod
+    def _bucket(value):
+        shift = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+        return shift, value >> shift
+
+    def record(self, value):
+        value = max(int(value), 0)
+        self.counts[self._bucket(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def buckets(self):
+        """[(наибольшее значение корзины, число)] по возрастанию."""
+        return sorted(
+            (min((top << shift) + (1 << shift) - 1, self.max), count) for (shift, top), count in self.counts.items()
+        )
+
+    def percentile(self, percent):
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(percent / 100 * self.total))
+        seen = 0
+        for value, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return value
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def write_hgrm(self, stream, unit=1000.0):
+        """Распределение в формате percentile-вывода HdrHistogram (значения в мс) для построения графиков."""
+        stream.write(f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}\n\n")
+        seen = 0
+        for value, count in self.buckets():
+            seen += count
+            fraction = seen / self.total
+            inverse = f"{1 / (1 - fraction):14.2f}" if fraction < 1 else f"{'inf':>14}"
+            stream.write(f"{value / unit:12.3f} {fraction:14.12f} {seen:10d} {inverse}\n")
+        stream.write(f"#[Mean    = {self.mean() / unit:12.3f}, Max = {self.max / unit:12.3f}]\n")
+        stream.write(f"#[Total count    = {self.total:12d}]\n")
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = defaultdict(int)
+        self.sent = 0
+        self.completed_in_time = 0  # успешные, завершённые до конца ступени (+ SLO на последние)
+        self.errors = 0  # 5xx, ошибки соединения, исключения клиента и просроченные до отправки
+        self.expired = 0
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for status, count in other.statuses.items():
+            self.statuses[status] += count
+        self.sent += other.sent
+        self.completed_in_time += other.completed_in_time
+        self.errors += other.errors
+        self.expired += other.expired
+
+    def error_rate(self):
+        return self.errors / self.sent if self.sent else 0.0
+
+    def summary(self, duration):
+        return {
+            'sent': self.sent,
+            'offered_rps': round(self.sent / duration, 2),
+            'achieved_rps': round(self.completed_in_time / duration, 2),
+            'error_rate': round(self.error_rate(), 5),
+            'expired': self.expired,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            'latency_ms': {
+                **{f'p{percent:g}': round(self.latency.percentile(percent) / 1000, 3) for percent in PERCENTILES},
+                'mean': round(self.latency.mean() / 1000, 3),
+                'max': round(self.latency.max / 1000, 3),
+            },
+        }
+
+
+def route_of(path):
+    try:
+        return resolve(urlsplit(path).path).url_name or 'unmatched'
+    except Resolver404:
+        return 'unmatched'
+
+
+def load_traffic(path):
+    """Записанный трафик: по JSON-объекту на строку."""
+    requests = []
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            body = item.get('body')
+            if body is not None and not isinstance(body, str):
+                body = json.dumps(body, ensure_ascii=False)
+            requests.append(Request(
+                route_of(item['path']), item.get('method', 'GET').upper(), item['path'], body, bool(item.get('auth')),
+            ))
+    return requests
+
+
+def save_traffic(requests, path):
+    with open(path, 'w', encoding='utf-8') as stream:
+        for request in requests:
+            item = {'method': request.method, 'path': request.path, 'auth': request.auth}
+            if request.body is not None:
+                item['body'] = json.loads(request.body)
+            stream.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def _sample(queryset, rnd):
+    ids = list(queryset.values_list('pk', flat=True)[:SAMPLE_IDS * 10])
+    return rnd.sample(ids, min(len(ids), SAMPLE_IDS))
+
+
+def synthesize(count, rnd, credentials=None, auth_share=0.0):
+    """Последовательность из count запросов по весам MIX; маршруты без данных в базе пропускаются."""
+    categories = _sample(Category.objects.all(), rnd)
+    centres = _sample(EducationCentres.objects.all(), rnd)
+    courses = _sample(Courses.objects.all(), rnd)
+    words = [
+        word for name in Skills.objects.values_list('name', flat=True)[:SAMPLE_IDS]
+        for word in name.split() if len(word) >= 3
+    ]
+
+    def get(path, **params):
+        params = {name: value for name, value in params.items() if value is not None}
+        return 'GET', f"{API_PREFIX}{path}" + (f"?{urlencode(params)}" if params else ''), None
+
+    def maybe(values, probability=0.5):
+        return rnd.choice(values) if values and rnd.random() < probability else None
+
+    builders = {
+        'courses-list': lambda: get(
+            '/courses/', category=maybe(categories), ordering=maybe(COURSE_ORDERINGS),
+            price_month_effective__lte=maybe([300000, 500000, 1000000], 0.3),
+        ),
+        'courses-detail': lambda: get(f'/courses/{rnd.choice(courses)}/'),
+        'courses-cards': lambda: get('/courses/cards/', category=maybe(categories), limit=rnd.choice([20, 50])),
+        'education-centres-list': lambda: get('/education-centres/', category=maybe(categories)),
+        'education-centres-detail': lambda: get(f'/education-centres/{rnd.choice(centres)}/'),
+        'courses-similar': lambda: get(f'/courses/{rnd.choice(courses)}/similar/'),
+        'autocomplete': lambda: get('/autocomplete/', q=rnd.choice(words)[:rnd.randint(2, 5)]),
+        'categories-list': lambda: get('/categories/'),
+        'skills-list': lambda: get('/skills/', category=maybe(categories)),
+        'login': lambda: ('POST', f'{API_PREFIX}/auth/login/', json.dumps(credentials)),
+    }
+    available = {
+        'courses-detail': courses, 'courses-similar': courses, 'education-centres-detail': centres,
+        'autocomplete': words, 'login': credentials,
+    }
+    routes = [route for route in MIX if available.get(route, True)]
+    weights = [MIX[route] for route in routes]
+
+    requests = []
+    for route in rnd.choices(routes, weights, k=count):
+        method, path, body = builders[route]()
+        auth = route != 'login' and credentials is not None and rnd.random() < auth_share
+        requests.append(Request(route, method, path, body, auth))
+    return requests
+
+
+class Client:
+    """HTTP-клиент генератора: keep-alive соединение на поток, JWT из ответов на вход."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+        self.tokens = []
+        self.tokens_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def _reset(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self.local.connection = None
+
+    def send(self, request):
+        """(статус, тело); статус None — ошибка соединения или таймаут."""
+        headers = {}
+        if request.body is not None:
+            headers['Content-Type'] = 'application/json'
+        if request.auth and self.tokens:
+            headers['Authorization'] = f"Bearer {random.choice(self.tokens)}"
+        body = request.body.encode() if request.body is not None else None
+
+        for attempt in range(2):
+            reused = getattr(self.local, 'connection', None) is not None
+            try:
+                connection = self._connection()
+                connection.request(request.method, self.prefix + request.path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self._reset()
+                break
+            except (OSError, http.client.HTTPException):
+                self._reset()
+                # Сервер мог закрыть простаивающее keep-alive соединение — повторяем один раз на новом
+                if not reused or attempt:
+                    return None, b''
+
+        if request.route == 'login' and response.status == 200:
+            self.add_token(json.loads(data)['access'])
+        return response.status, data
+
+    def add_token(self, token):
+        with self.tokens_lock:
+            if len(self.tokens) < MAX_TOKENS:
+                self.tokens.append(token)
+
+
+def run_step(client, traffic, position, rate, duration, warmup, arrival, concurrency, rnd, grace=0.0):
+    """
+    Одна ступень интенсивности. Запрос засчитывается в обработанные, если завершился успешно
+    не позже grace секунд после конца ступени. Возвращает ({маршрут: RouteStats}, гистограмма отставания
+    генератора от расписания, позиция в трафике для следующей ступени).
+    """
+    stats = defaultdict(RouteStats)
+    lock = threading.Lock()
+    dispatch_lag = Histogram()
+    start = time.perf_counter() + 0.05
+    measure_from = start + warmup
+    end = measure_from + duration
+
+    def execute(request, scheduled, measured):
+        if time.perf_counter() - scheduled > client.timeout:
+            status, finished = 'expired', time.perf_counter()
+        else:
+            try:
+                status, _ = client.send(request)
+            except Exception as error:
+                # Например, ответ входа без access или не-JSON: запрос не удался, соединение не переиспользуем
+                client._reset()
+                status = f'exception:{type(error).__name__}'
+            finished = time.perf_counter()
+        if not measured:
+            return
+        with lock:
+            route = stats[request.route]
+            route.sent += 1
+            route.statuses[status if status is not None else 'error'] += 1
+            if status == 'expired':
+                route.expired += 1
+                route.errors += 1
+                return
+            route.latency.record((finished - scheduled) * 1_000_000)
+            if not isinstance(status, int) or status >= 500:
+                route.errors += 1
+            elif finished <= end + grace:
+                route.completed_in_time += 1
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='loadtest') as executor:
+        scheduled = start
+        while scheduled < end:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if scheduled >= measure_from:
+                dispatch_lag.record((time.perf_counter() - scheduled) * 1_000_000)
+            futures.append(executor.submit(
+                execute, traffic[position % len(traffic)], scheduled, scheduled >= measure_from
+            ))
+            position += 1
+            scheduled += rnd.expovariate(rate) if arrival == 'poisson' else 1 / rate
+    # Ошибки запросов уже посчитаны в execute; исключение здесь — ошибка самого генератора
+    for future in futures:
+        future.result()
+    return dict(stats), dispatch_lag, position
+
+
+def total(stats):
+    result = RouteStats()
+    for route in stats.values():
+        result.merge(route)
+    return result
+
+
+def saturated(route, slo_ms, max_error_rate):
+    """Причина насыщения маршрута (или всей ступени) либо None."""
+    if route.sent < MIN_SAMPLES:
+        return None
+    if route.latency.percentile(99) > slo_ms * 1000:
+        return 'p99'
+    if route.error_rate() > max_error_rate:
+        return 'errors'
+    if route.completed_in_time < SATURATION_THROUGHPUT * (route.sent - route.errors):
+        return 'throughput'
+    return None
+
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Приложение под выбранным сервером в дочернем процессе, на время замера."""
+
+    SERVERS = ('runserver', 'gunicorn', 'uvicorn')
+
+    def __init__(self, server, host, port, workers, threads, log_path=None):
+        self.server, self.host, self.port = server, host, port
+        self.workers, self.threads = workers, threads
+        self.log_path = log_path
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def command(self):
+        if self.server == 'gunicorn':
+            return [sys.executable, '-m', 'gunicorn', 'CourseAPI.wsgi:application', '--bind', f'{self.host}:{self.port}',
+                    '--workers', str(self.workers), '--threads', str(self.threads)]
+        if self.server == 'uvicorn':
+            return [sys.executable, '-m', 'uvicorn', 'CourseAPI.asgi:application', '--host', self.host,
+                    '--port', str(self.port), '--workers', str(self.workers), '--no-access-log']
+        return [sys.executable, 'manage.py', 'runserver', f'{self.host}:{self.port}', '--noreload',
+                *(['--nothreading'] if self.threads == 1 else [])]
+
+    def check(self):
+        """Текст ошибки, если конфигурация не поддерживается, иначе None."""
+        if self.server in ('gunicorn', 'uvicorn') and importlib.util.find_spec(self.server) is None:
+            return f"{self.server} не установлен"
+        if self.server == 'runserver' and self.workers != 1:
+            return "runserver работает в одном процессе: --workers 1"
+        return None
+
+    def __enter__(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'PYTHONUNBUFFERED': '1'}
+        log = open(self.log_path or os.devnull, 'ab')
+        self.process = subprocess.Popen(
+            self.command(), cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        log.close()
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Сервер завершился с кодом {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=2)
+                connection.request('GET', f'{API_PREFIX}/categories/')
+                status = connection.getresponse().status
+                connection.close()
+                if status < 500:
+                    return
+            except (OSError, http.client.HTTPException):
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"Сервер не ответил за {timeout} с")
+
+    def __exit__(self, *exc_info):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
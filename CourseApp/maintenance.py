@@ -0,0 +1,235 @@
+"""
+Регламентные задачи: очистка просроченных кодов, статистика планировщика SQLite, вакуум, мусор в media.
+
+manage.py run_maintenance запускает задачи, у которых истёк интервал (MAINTENANCE_INTERVALS),
+с --loop работает как планировщик. Одновременный запуск исключён на двух уровнях:
+файловая блокировка MAINTENANCE_LOCK_FILE — один планировщик на узле, аренда строки
+MaintenanceJob (условный UPDATE) — каждая задача выполняется только на одном узле.
+Итоги прогона (длительность, число строк/файлов/страниц, ошибка) сохраняются в MaintenanceJob.
+"""
+import fcntl
+import os
+import time
+import traceback
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Q
+from django.utils import timezone
+
+from CourseApp import changes
+from CourseApp.models import PASSWORD_RESET_CODE_LIFETIME, IdempotencyKey, MaintenanceJob, PasswordResetCode, \
+    PhoneVerification, Task
+
+# name -> функция без аргументов, возвращающая число затронутых строк (файлов, страниц)
+JOBS = {}
+
+JobResult = namedtuple('JobResult', 'name rows duration error')
+
+
+def job(name):
+    def decorator(func):
+        JOBS[name] = func
+        return func
+    return decorator
+
+
+def batched_delete(queryset, batch_size=None):
+    """DELETE пачками по первичному ключу, чтобы не держать долгую блокировку записи."""
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(pk__in=ids).delete()[0]
+
+
+@job('purge_phone_verifications')
+def purge_phone_verifications():
+    # И подтверждённые (пользователь уже создан), и брошенные регистрации; в записи хранится пароль
+    cutoff = timezone.now() - timedelta(hours=settings.MAINTENANCE_PHONE_VERIFICATION_RETENTION_HOURS)
+    return batched_delete(PhoneVerification.objects.filter(created_at__lt=cutoff))
+
+
+@job('purge_password_reset_codes')
+def purge_password_reset_codes():
+    expired = timezone.now() - PASSWORD_RESET_CODE_LIFETIME
+    return batched_delete(PasswordResetCode.objects.filter(Q(is_used=True) | Q(created_at__lt=expired)))
+
+
+@job('purge_done_tasks')
+def purge_done_tasks():
+    cutoff = timezone.now() - timedelta(days=settings.MAINTENANCE_TASK_RETENTION_DAYS)
+    return batched_delete(Task.objects.filter(status=Task.DONE, updated_at__lt=cutoff))
+
+
+@job('purge_idempotency_keys')
+def purge_idempotency_keys():
+    return batched_delete(IdempotencyKey.objects.filter(expires_at__lt=timezone.now()))
+
+
+@job('compact_changes')
+def compact_changes():
+    return changes.compact(tombstone_days=settings.MAINTENANCE_TOMBSTONE_DAYS)
+
+
+def _sqlite_connections():
+    return [connections[alias] for alias in connections if connections[alias].vendor == 'sqlite']
+
+
+@job('optimize')
+def optimize():
+    """ANALYZE, если статистики ещё нет, затем PRAGMA optimize (SQLite); ANALYZE на PostgreSQL."""
+    processed = 0
+    for alias in connections:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if not cursor.fetchone()[0]:
+                    cursor.execute("ANALYZE")
+                cursor.execute("PRAGMA optimize")
+            elif connection.vendor == 'postgresql':
+                cursor.execute("ANALYZE")
+            else:
+                continue
+        processed += 1
+    return processed
+
+
+@job('incremental_vacuum')
+def incremental_vacuum():
+    """
+    Возвращает свободные страницы SQLite файловой системе порциями MAINTENANCE_VACUUM_PAGES.
+    Работает при auto_vacuum=INCREMENTAL; перевод в этот режим требует одного полного VACUUM,
+    он выполняется только при MAINTENANCE_ALLOW_FULL_VACUUM. Возвращает число освобождённых страниц.
+    """
+    freed = 0
+    for connection in _sqlite_connections():
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA auto_vacuum")
+            if cursor.fetchone()[0] != 2:
+                if not settings.MAINTENANCE_ALLOW_FULL_VACUUM:
+                    continue
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                cursor.execute("VACUUM")
+            cursor.execute("PRAGMA freelist_count")
+            before = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA incremental_vacuum({int(settings.MAINTENANCE_VACUUM_PAGES)})")
+            cursor.fetchall()
+            cursor.execute("PRAGMA freelist_count")
+            freed += before - cursor.fetchone()[0]
+    return freed
+
+
+def _file_fields():
+    for model in apps.get_models():
+        fields = [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+        if fields:
+            yield model, fields
+
+
+@job('orphaned_media')
+def orphaned_media():
+    """
+    Удаляет из каталогов upload_to файлы, на которые не ссылается ни одна запись ни в одной базе.
+    Файлы моложе MAINTENANCE_MEDIA_GRACE_HOURS не трогаются: их транзакция могла ещё не закоммититься.
+    """
+    referenced = set()
+    directories = set()
+    for model, fields in _file_fields():
+        for field in fields:
+            if isinstance(field.upload_to, str):
+                # Часть пути до подстановок strftime
+                directories.add(field.upload_to.split('%')[0].rstrip('/'))
+        names = [field.attname for field in fields]
+        for alias in connections:
+            for row in model._base_manager.using(alias).values_list(*names).iterator(chunk_size=5000):
+                referenced.update(name for name in row if name)
+
+    root = str(settings.MEDIA_ROOT)
+    cutoff = time.time() - settings.MAINTENANCE_MEDIA_GRACE_HOURS * 3600
+    removed = 0
+    for directory in sorted(directories):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name not in referenced and os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+    return removed
+
+
+def _claim(name, force):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    MaintenanceJob.objects.get_or_create(name=name)
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    due = Q(last_started_at__isnull=True) | Q(last_started_at__lte=now - timedelta(seconds=settings.MAINTENANCE_INTERVALS[name]))
+    claimed = MaintenanceJob.objects.filter(free if force else free & due, name=name).update(
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.MAINTENANCE_LEASE),
+        last_started_at=now,
+    )
+    return token if claimed else None
+
+
+def run_job(name, force=False):
+    """Выполняет задачу, если она пора и не выполняется на другом узле. None — пропущена."""
+    token = _claim(name, force)
+    if token is None:
+        return None
+
+    started = time.monotonic()
+    rows, error = None, ''
+    try:
+        rows = JOBS[name]()
+    except Exception:
+        error = traceback.format_exc()
+    duration = time.monotonic() - started
+    MaintenanceJob.objects.filter(name=name, locked_by=token).update(
+        locked_by=None, locked_until=None, last_finished_at=timezone.now(),
+        last_duration=duration, last_rows=rows, last_error=error,
+    )
+    return JobResult(name, rows, duration, error)
+
+
+class HostLock:
+    """Неблокирующая файловая блокировка: один планировщик на узле."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'w')
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def run_pending(names=None, force=False):
+    """Прогоняет задачи по очереди; возвращает результаты выполненных."""
+    results = []
+    for name in names or JOBS:
+        result = run_job(name, force=force)
+        if result is not None:
+            results.append(result)
+    return results
@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from CourseApp.autocomplete import AUTOCOMPLETE_MODELS, PrefixIndex, _index_terms
+from CourseApp.text import normalize_search_text
+
+WORDS = [
+    'python', 'django', 'backend', 'frontend', 'english', 'ielts', 'математика', 'физика', 'дизайн', 'основы',
+    'продвинутый', 'курс', 'mobile', 'android', 'ios', 'data', 'science', 'машинное', 'обучение', 'ʼzbek',
+    'тили', 'бухгалтерия', 'маркетинг', 'smm', 'sql', 'react', 'vue', 'golang', 'java', 'kotlin',
+]
+
+
+def _names(count, rnd):
+    kinds = list(AUTOCOMPLETE_MODELS)
+    return {
+        (rnd.choice(kinds), pk): ' '.join(rnd.choice(WORDS).capitalize() for _ in range(rnd.randint(1, 4)))
+        for pk in range(1, count + 1)
+    }
+
+
+def _queries(names, count, rnd):
+    # Префиксы реальных слов длиной от 1 символа: как при наборе по буквам
+    values = list(names.values())
+    queries = []
+    for _ in range(count):
+        word = rnd.choice(rnd.choice(values).split())
+        queries.append(word[:rnd.randint(1, len(word))])
+    return queries
+
+
+def _linear_search(names, query, limit):
+    """То, что индекс заменяет: проход по всем названиям с проверкой начала каждого слова."""
+    prefix = normalize_search_text(query)
+    results = []
+    for (kind, pk), name in names.items():
+        if any(term.startswith(prefix) for term in _index_terms(name)):
+            results.append({'type': kind, 'id': pk, 'name': name})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    help = ("Замер префиксного индекса /autocomplete/: поиск против линейного прохода "
+            "и поиск под конкурентными добавлениями/удалениями.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=50000, help="Записей в индексе.")
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--readers', type=int, default=4, help="Потоков поиска в конкурентном замере.")
+        parser.add_argument('--writers', type=int, default=2, help="Потоков add/remove в конкурентном замере.")
+        parser.add_argument('--duration', type=float, default=3.0, help="Длительность конкурентного замера, с.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        names = _names(options['names'], rnd)
+        queries = _queries(names, options['queries'], rnd)
+        limit = options['limit']
+
+        index = PrefixIndex()
+        started = time.perf_counter()
+        index.load(dict(names))
+        self.stdout.write(f"Индекс: {len(index)} записей, построение {(time.perf_counter() - started) * 1000:.0f} мс")
+
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, limit=limit)
+            latencies.append(time.perf_counter() - started)
+        self._report("индекс", latencies)
+
+        sample = queries[:max(1, len(queries) // 100)]
+        latencies = []
+        for query in sample:
+            started = time.perf_counter()
+            _linear_search(names, query, limit)
+            latencies.append(time.perf_counter() - started)
+        self._report("линейный проход", latencies)
+
+        self._concurrent(index, names, queries, options)
+
+    def _report(self, label, latencies):
+        total = sum(latencies)
+        self.stdout.write(
+            f"{label:<18} {len(latencies) / total:10.0f} запросов/с  "
+            f"p50 {_percentile(latencies, 50) * 1e6:8.1f} мкс  p99 {_percentile(latencies, 99) * 1e6:8.1f} мкс"
+        )
+
+    def _concurrent(self, index, names, queries, options):
+        stop = threading.Event()
+        counts = {'search': 0, 'write': 0}
+        errors = []
+        count_lock = threading.Lock()
+        keys = list(names)
+
+        def reader(seed):
+            rnd = random.Random(seed)
+            done = 0
+            try:
+                while not stop.is_set():
+                    query = rnd.choice(queries)
+                    prefix = normalize_search_text(query)
+                    for item in index.search(query, limit=options['limit']):
+                        if not any(term.startswith(prefix) for term in _index_terms(item['name'])):
+                            errors.append(f"{query!r}: {item}")
+                    done += 1
+            except Exception as error:
+                errors.append(repr(error))
+            with count_lock:
+                counts['search'] += done
+
+        def writer(seed):
+            rnd = random.Random(seed)
+            done = 0
+            try:
+                while not stop.is_set():
+                    kind, pk = rnd.choice(keys)
+                    if rnd.random() < 0.5:
+                        index.remove(kind, pk)
+                    else:
+                        index.add(kind, pk, names[(kind, pk)])
+                    done += 1
+            except Exception as error:
+                errors.append(repr(error))
+            with count_lock:
+                counts['write'] += done
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        duration = options['duration']
+        self.stdout.write(
+            f"Конкурентно ({options['readers']} поиск, {options['writers']} запись): "
+            f"{counts['search'] / duration:.0f} поисков/с, {counts['write'] / duration:.0f} изменений/с"
+        )
+        if errors:
+            self.stderr.write(f"Ошибок: {len(errors)}, первая: {errors[0]}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Ошибок нет"))
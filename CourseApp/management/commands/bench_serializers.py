@@ -0,0 +1,102 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from CourseApp.compiled import compile_serializer
+from CourseApp.models import Category, Courses, EducationCentres, Skills
+from CourseApp.serializers import BranchesSerializer, CategorySerializer, CoursesSerializer, \
+    EducationCentresSerializer, SkillSerializer
+
+SERIALIZERS = {
+    'courses': CoursesSerializer,
+    'education-centres': EducationCentresSerializer,
+    'branches': BranchesSerializer,
+    'skills': SkillSerializer,
+    'categories': CategorySerializer,
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _seed(count):
+    category = Category.objects.create(name='bench')
+    skills = [Skills.objects.create(name=f'bench {i}', category=category) for i in range(10)]
+    centre = EducationCentres.objects.create(
+        name='bench', category=category, rate=Decimal('4.50'), description='bench', graduates=1, experience=1,
+        employees=1, logo='education_centres/bench.png',
+    )
+    courses = Courses.objects.bulk_create([
+        Courses(name=f'Курс {i}', duration=i % 12, rate=Decimal(i % 500) / 100, price_month=100000 + i,
+                full_price=300000 + i, discount=i % 30, description='описание ' * 20, education_type='online',
+                image_one=f'courses/{i}.png', category=category, education_centre=centre)
+        for i in range(count)
+    ])
+    through = Courses.skills.through
+    through.objects.bulk_create([
+        through(courses_id=course.pk, skills_id=skills[(course.pk + k) % len(skills)].pk)
+        for course in courses for k in range(3)
+    ])
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость ModelSerializer и скомпилированного сериализатора (строк в секунду)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(SERIALIZERS), default='courses')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Создать N курсов на время замера (изменения откатываются).")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    _seed(options['seed'])
+                self._bench(SERIALIZERS[options['model']], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _measure(self, label, func, rows, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        rate = rows / best if best else float('inf')
+        self.stdout.write(f"{label:<28} {best * 1000:9.1f} мс  {rate:12.0f} строк/с")
+        return best
+
+    def _bench(self, serializer_class, repeat):
+        compiled = compile_serializer(serializer_class)
+        if compiled is None:
+            self.stderr.write(f"{serializer_class.__name__} не компилируется")
+            return
+        model = serializer_class.Meta.model
+        queryset = model.objects.order_by('pk')
+        rows = queryset.count()
+        if not rows:
+            self.stderr.write("Нет строк для замера, используйте --seed N")
+            return
+        context = {'request': Request(APIRequestFactory().get('/'))}
+        m2m = [field.name for field in model._meta.many_to_many]
+
+        self.stdout.write(f"{serializer_class.__name__}: {rows} строк, лучший из {repeat} прогонов")
+        before = self._measure(
+            "ModelSerializer", lambda: serializer_class(queryset.all(), many=True, context=context).data, rows, repeat
+        )
+        if m2m:
+            self._measure(
+                "ModelSerializer + prefetch",
+                lambda: serializer_class(queryset.prefetch_related(*m2m), many=True, context=context).data,
+                rows, repeat,
+            )
+        after = self._measure("скомпилированный", lambda: compiled.serialize(queryset.all(), context), rows, repeat)
+        self.stdout.write(f"Ускорение: x{before / after:.1f}")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import snapshot
+
+
+class Command(BaseCommand):
+    help = "Строит новое поколение колоночного снимка курсов для воркеров (CATALOG_SNAPSHOT_DIR)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Не завершаться: перестраивать снимок каждый раз, когда он помечен устаревшим."
+        )
+        parser.add_argument('--interval', type=float, default=1.0, help="Период проверки в режиме --watch, с.")
+
+    def handle(self, *args, **options):
+        if snapshot.np is None:
+            raise CommandError("Для снимка нужен пакет numpy.")
+
+        while True:
+            if not options['watch'] or snapshot._stale_marker_time(snapshot._snapshot_dir()) >= snapshot._built_at_on_disk():
+                started = time.monotonic()
+                generation = snapshot.rebuild_locked()
+                if generation is None:
+                    self.stdout.write("Снимок уже строит другой процесс.")
+                else:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Опубликовано поколение {generation} за {time.monotonic() - started:.2f} с"
+                    ))
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
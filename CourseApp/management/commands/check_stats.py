@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import stats
+
+
+class Command(BaseCommand):
+    help = "Сверяет агрегаты категорий и учебных центров с данными курсов и филиалов."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Пересобрать агрегаты при расхождениях.")
+
+    def handle(self, *args, **options):
+        if not stats.enabled():
+            raise CommandError("Агрегаты выключены (STATS_ENABLED)")
+        problems = stats.find_inconsistencies()
+        for model_name, pk, description in problems:
+            self.stdout.write(f"{model_name} #{pk}: {description}")
+
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("Агрегаты согласованы."))
+        elif options['fix']:
+            stats.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f"Исправлено расхождений: {len(problems)}"))
+        else:
+            raise CommandError(f"Найдено расхождений: {len(problems)}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from CourseApp import changes
+
+
+class Command(BaseCommand):
+    help = "Компактизирует ленту изменений: по каждому объекту остаётся только последняя запись."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int, default=None,
+            help="Удалять записи об удалении старше N дней (клиентам со старым курсором понадобится полная синхронизация)."
+        )
+
+    def handle(self, *args, **options):
+        deleted = changes.compact(tombstone_days=options['tombstone_days'])
+        self.stdout.write(self.style.SUCCESS(f"Удалено записей: {deleted}"))
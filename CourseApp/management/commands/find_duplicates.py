@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import duplicates, sharding
+from CourseApp.models import CourseDuplicate, Courses
+
+
+class Command(BaseCommand):
+    help = "Находит группы почти-дубликатов курсов по MinHash/LSH-индексу."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Сначала пересчитать индекс всех курсов.")
+        parser.add_argument('--threshold', type=float, default=None,
+                            help="Минимальная оценка схожести (по умолчанию DUPLICATES_THRESHOLD).")
+        parser.add_argument('--flag', action='store_true',
+                            help="Отметить в CourseDuplicate все курсы группы как дубликаты самого раннего.")
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        if not duplicates.enabled():
+            raise CommandError("Поиск дубликатов выключен (DUPLICATES_ENABLED) или не установлен numpy")
+
+        aliases = sharding.shards() if sharding.enabled() else ['default']
+        report = []
+        for alias in aliases:
+            if options['rebuild']:
+                indexed = duplicates.index(Courses.objects.using(alias).values_list('pk', flat=True), using=alias)
+                self.stderr.write(f"{alias}: проиндексировано курсов: {indexed}")
+
+            groups, scores = duplicates.clusters(using=alias, threshold=options['threshold'])
+            names = dict(Courses.objects.using(alias).filter(pk__in={pk for group in groups for pk in group})
+                         .values_list('pk', 'name'))
+            for group in groups:
+                original = group[0]
+                if options['flag']:
+                    CourseDuplicate.objects.using(alias).bulk_create([
+                        CourseDuplicate(course_id=pk, duplicate_of_id=original,
+                                        similarity=scores.get((original, pk), 0.0))
+                        for pk in group[1:]
+                    ], ignore_conflicts=True)
+                report.append({
+                    'database': alias,
+                    'courses': [{'id': pk, 'name': names.get(pk)} for pk in group],
+                    'pairs': [
+                        {'a': a, 'b': b, 'similarity': round(score, 4)}
+                        for (a, b), score in sorted(scores.items()) if a in group
+                    ],
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for number, cluster in enumerate(report, 1):
+            self.stdout.write(f"Группа {number} ({cluster['database']}):")
+            for course in cluster['courses']:
+                self.stdout.write(f"  {course['id']}: {course['name']}")
+        self.stdout.write(f"Групп: {len(report)}, курсов в них: {sum(len(c['courses']) for c in report)}, "
+                          f"порог {options['threshold'] or settings.DUPLICATES_THRESHOLD}")
@@ -0,0 +1,72 @@
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+BOOT_SCRIPT = """
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+import django
+django.setup()
+import importlib
+for name in {modules!r}:
+    importlib.import_module(name)
+"""
+
+
+class Command(BaseCommand):
+    help = "Профилирует импорт при старте воркера (python -X importtime) и выводит самые дорогие модули."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', action='append', dest='modules',
+            help="Модуль, импорт которого профилируется (по умолчанию ROOT_URLCONF и WSGI-приложение)."
+        )
+        parser.add_argument('--top', type=int, default=25, help="Сколько строк вывести.")
+        parser.add_argument(
+            '--by', choices=['package', 'module'], default='package',
+            help="Группировать собственное время импорта по пакету верхнего уровня или по модулю."
+        )
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF, settings.WSGI_APPLICATION.rsplit('.', 1)[0]]
+        script = BOOT_SCRIPT.format(settings_module=settings.SETTINGS_MODULE, modules=modules)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else "Импорт завершился с ошибкой")
+
+        self_time = defaultdict(int)
+        cumulative = defaultdict(int)
+        total = 0
+        # -X importtime печатает модуль после всех его зависимостей, поэтому идём с конца:
+        # так родитель встречается раньше детей, и стек отступов даёт пакет-импортёр.
+        stack = []
+        for line in reversed(result.stderr.splitlines()):
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            own_us, cumulative_us, depth, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+            key = name.split('.')[0] if options['by'] == 'package' else name
+            while stack and stack[-1][0] >= depth:
+                stack.pop()
+            self_time[key] += own_us
+            # Накопленное время учитываем только там, где пакет импортирован извне, без двойного счёта
+            if not stack or stack[-1][1] != key:
+                cumulative[key] += cumulative_us
+            if not stack:
+                total += cumulative_us
+            stack.append((depth, key))
+
+        rows = sorted(self_time.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+        self.stdout.write(f"{'self, ms':>10} {'cumul., ms':>11}  {options['by']}")
+        for name, own_us in rows:
+            self.stdout.write(f"{own_us / 1000:>10.1f} {cumulative[name] / 1000:>11.1f}  {name}")
+        self.stdout.write(f"Всего импорт: {total / 1000:.1f} ms ({', '.join(modules)})")
@@ -0,0 +1,173 @@
+import json
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import loadtest
+
+
+class Command(BaseCommand):
+    help = ("Открытая нагрузка с фиксированной интенсивностью на локально запущенное приложение: "
+            "гистограммы задержек, ошибки и точки насыщения по маршрутам.")
+
+    def add_arguments(self, parser):
+        target = parser.add_argument_group("сервер")
+        target.add_argument('--url', help="Нагружать уже запущенный сервер вместо запуска своего.")
+        target.add_argument('--server', choices=loadtest.LocalServer.SERVERS, default='runserver')
+        target.add_argument('--workers', type=int, default=1)
+        target.add_argument('--threads', type=int, default=1,
+                            help="Потоков на воркер (gunicorn gthread; для runserver 1 — без потоков).")
+        target.add_argument('--host', default='127.0.0.1')
+        target.add_argument('--port', type=int, default=0, help="0 — свободный порт.")
+        target.add_argument('--server-log', help="Файл для вывода сервера.")
+
+        load = parser.add_argument_group("нагрузка")
+        load.add_argument('--rates', default='50', help="Ступени интенсивности, запросов в секунду: 50,100,200.")
+        load.add_argument('--duration', type=float, default=30, help="Секунд замера на ступень.")
+        load.add_argument('--warmup', type=float, default=5, help="Секунд прогрева перед замером (не учитываются).")
+        load.add_argument('--arrival', choices=['constant', 'poisson'], default='poisson')
+        load.add_argument('--concurrency', type=int, default=256, help="Максимум одновременных запросов генератора.")
+        load.add_argument('--timeout', type=float, default=10)
+
+        traffic = parser.add_argument_group("трафик")
+        traffic.add_argument('--traffic', help="Записанный трафик (JSON Lines) вместо синтезированного.")
+        traffic.add_argument('--save-traffic', help="Сохранить синтезированный трафик для повторных прогонов.")
+        traffic.add_argument('--requests', type=int, default=20000, help="Длина синтезированной последовательности.")
+        traffic.add_argument('--seed', type=int, default=0)
+        traffic.add_argument('--username', help="Учётная запись для входа и запросов с JWT.")
+        traffic.add_argument('--password')
+        traffic.add_argument('--auth-share', type=float, default=0.3, help="Доля запросов каталога с JWT.")
+
+        report = parser.add_argument_group("отчёт")
+        report.add_argument('--slo-ms', type=float, default=500, help="Порог p99 для точки насыщения.")
+        report.add_argument('--max-error-rate', type=float, default=0.01)
+        report.add_argument('--json', action='store_true')
+        report.add_argument('--hgrm-dir', help="Каталог для гистограмм в формате HdrHistogram (.hgrm).")
+
+    def handle(self, *args, **options):
+        try:
+            rates = [float(rate) for rate in options['rates'].split(',')]
+        except ValueError:
+            raise CommandError("--rates: числа через запятую")
+        if any(rate <= 0 for rate in rates):
+            raise CommandError("--rates: интенсивность должна быть положительной")
+        if bool(options['username']) != bool(options['password']):
+            raise CommandError("--username и --password указываются вместе")
+        credentials = {'username': options['username'], 'password': options['password']} \
+            if options['username'] else None
+
+        rnd = random.Random(options['seed'])
+        if options['traffic']:
+            traffic = loadtest.load_traffic(options['traffic'])
+        else:
+            traffic = loadtest.synthesize(options['requests'], rnd, credentials, options['auth_share'])
+            if options['save_traffic']:
+                loadtest.save_traffic(traffic, options['save_traffic'])
+        if not traffic:
+            raise CommandError("Трафик пуст: нет записанных запросов или данных в базе")
+        if settings.DEBUG:
+            self.stderr.write("Внимание: DEBUG=True, сервер хранит SQL-запросы в памяти — задержки завышены")
+
+        if options['url']:
+            return self._run(options['url'], traffic, rates, credentials, rnd, options)
+
+        server = loadtest.LocalServer(
+            options['server'], options['host'], options['port'] or loadtest.free_port(options['host']),
+            options['workers'], options['threads'], options['server_log'],
+        )
+        problem = server.check()
+        if problem:
+            raise CommandError(problem)
+        try:
+            with server:
+                self.stderr.write(f"{options['server']} ({options['workers']}×{options['threads']}) на {server.url}")
+                return self._run(server.url, traffic, rates, credentials, rnd, options)
+        except RuntimeError as error:
+            raise CommandError(str(error))
+
+    def _run(self, url, traffic, rates, credentials, rnd, options):
+        client = loadtest.Client(url, options['timeout'])
+        if credentials:
+            status, data = client.send(loadtest.Request('login', 'POST', f'{loadtest.API_PREFIX}/auth/login/',
+                                                        json.dumps(credentials), False))
+            if status != 200:
+                raise CommandError(f"Вход не удался: {status} {data[:200]!r}")
+
+        steps = []
+        position = 0
+        for rate in rates:
+            stats, dispatch_lag, position = loadtest.run_step(
+                client, traffic, position, rate, options['duration'], options['warmup'], options['arrival'],
+                options['concurrency'], rnd, grace=options['slo_ms'] / 1000,
+            )
+            steps.append((rate, stats, dispatch_lag))
+            overall = loadtest.total(stats)
+            self.stderr.write(
+                f"{rate:g} rps: обработано {overall.completed_in_time / options['duration']:.1f} rps, "
+                f"p99 {overall.latency.percentile(99) / 1000:.1f} мс, ошибок {overall.error_rate():.2%}"
+            )
+            if dispatch_lag.percentile(99) > 10_000:
+                self.stderr.write("Внимание: генератор отстаёт от расписания (p99 > 10 мс) — результаты занижают нагрузку")
+
+        report = self._report(steps, options)
+        if options['hgrm_dir']:
+            self._write_hgrm(steps, Path(options['hgrm_dir']))
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self._print(report)
+
+    def _report(self, steps, options):
+        duration = options['duration']
+        thresholds = (options['slo_ms'], options['max_error_rate'])
+        report = {'steps': [], 'saturation': {}}
+        for rate, stats, dispatch_lag in steps:
+            overall = loadtest.total(stats)
+            report['steps'].append({
+                'rate': rate,
+                'overall': {**overall.summary(duration), 'saturated': loadtest.saturated(overall, *thresholds)},
+                'routes': {
+                    route: {**route_stats.summary(duration), 'saturated': loadtest.saturated(route_stats, *thresholds)}
+                    for route, route_stats in sorted(stats.items())
+                },
+                'dispatch_lag_p99_ms': round(dispatch_lag.percentile(99) / 1000, 3),
+            })
+
+        # Точка насыщения — первая ступень, где маршрут (или весь поток) перестал укладываться в пороги
+        for step in report['steps']:
+            candidates = {'overall': step['overall'], **step['routes']}
+            for route, summary in candidates.items():
+                if summary['saturated'] and route not in report['saturation']:
+                    report['saturation'][route] = {'rate': step['rate'], 'reason': summary['saturated']}
+        return report
+
+    def _print(self, report):
+        header = f"{'маршрут':<26} {'rps':>8} {'обраб.':>8} " + \
+            ' '.join(f"{f'p{percent:g}':>8}" for percent in loadtest.PERCENTILES) + f" {'max':>8} {'ошибки':>7}"
+        for step in report['steps']:
+            self.stdout.write(f"\nСтупень {step['rate']:g} rps (задержки в мс)")
+            self.stdout.write(header)
+            for route, summary in [('ВСЕГО', step['overall']), *step['routes'].items()]:
+                latency = summary['latency_ms']
+                self.stdout.write(
+                    f"{route:<26} {summary['offered_rps']:>8.1f} {summary['achieved_rps']:>8.1f} "
+                    + ' '.join(f"{latency[f'p{percent:g}']:>8.1f}" for percent in loadtest.PERCENTILES)
+                    + f" {latency['max']:>8.1f} {summary['error_rate']:>7.2%}"
+                    + (f"  насыщение: {summary['saturated']}" if summary['saturated'] else '')
+                )
+
+        self.stdout.write("\nТочки насыщения:")
+        if not report['saturation']:
+            self.stdout.write("  не достигнуты на заданных ступенях")
+        for route, point in sorted(report['saturation'].items()):
+            label = 'ВСЕГО' if route == 'overall' else route
+            self.stdout.write(f"  {label}: {point['rate']:g} rps ({point['reason']})")
+
+    def _write_hgrm(self, steps, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        for rate, stats, _ in steps:
+            for route, route_stats in [('overall', loadtest.total(stats)), *stats.items()]:
+                with open(directory / f"{rate:g}rps-{route}.hgrm", 'w') as stream:
+                    route_stats.latency.write_hgrm(stream)
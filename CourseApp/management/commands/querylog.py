@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from CourseApp import querylog
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет GET-запросы к URL внутри процесса с журналом SQL и печатает самые дорогие запросы. "
+        "Пример: manage.py querylog /api/v1/courses/ '/api/v1/courses/?ordering=-rate' --repeat 20"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="Пути для прогона, например /api/v1/courses/")
+        parser.add_argument('--repeat', type=int, default=10, help="Сколько раз запросить каждый URL.")
+        parser.add_argument('--by', choices=('total', 'max', 'count'), default='total')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--slow-ms', type=float, help="Порог медленного запроса вместо QUERYLOG_SLOW_MS.")
+        parser.add_argument('--host', default='localhost', help="Заголовок Host (должен проходить ALLOWED_HOSTS).")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        overrides = {'QUERYLOG_ENABLED': True}
+        if options['slow_ms'] is not None:
+            overrides['QUERYLOG_SLOW_MS'] = options['slow_ms']
+
+        client = Client(SERVER_NAME=options['host'])
+        with override_settings(**overrides):
+            querylog.store.reset()
+            for url in options['urls']:
+                for _ in range(options['repeat']):
+                    response = client.get(url)
+                    if response.status_code >= 400:
+                        raise CommandError(f"{url}: HTTP {response.status_code}")
+
+        store = querylog.store
+        result = {
+            'top': store.top(limit=options['limit'], by=options['by']),
+            'endpoints': store.endpoints(limit=options['limit']),
+            'slow': store.slow_queries(limit=options['limit']),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write("Эндпоинты по времени в БД:")
+        for row in result['endpoints']:
+            self.stdout.write(f"  {row['total_ms']:>10.2f} мс  {row['queries']:>6} запр.  {row['endpoint']}")
+
+        self.stdout.write(f"\nЗапросы (по {options['by']}):")
+        for row in result['top']:
+            self.stdout.write(
+                f"  {row['total_ms']:>10.2f} мс  x{row['count']:<5} avg {row['avg_ms']:.3f}  max {row['max_ms']:.3f}"
+            )
+            self.stdout.write(f"      {row['fingerprint'][:300]}")
+            for endpoint, count in sorted(row['endpoints'].items(), key=lambda item: -item[1]):
+                self.stdout.write(f"      <- {endpoint} ({count})")
+
+        if result['slow']:
+            self.stdout.write("\nМедленные запросы:")
+            for record in result['slow']:
+                self.stdout.write(f"  {record['duration_ms']:.2f} мс  {record['endpoint']}  {record['view']}")
+                self.stdout.write(f"      {record['fingerprint'][:300]}")
+                for line in record['plan'] or []:
+                    self.stdout.write(f"      | {line}")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Распределение учебных центров по шардам: --init (первичное заполнение), "
+        "--move <id центра> --to <шард>, без параметров — план выравнивания (--apply выполняет его)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--init', action='store_true', help="Скопировать справочники и перенести данные из default.")
+        parser.add_argument('--move', type=int, metavar='CENTRE_ID', help="Перенести один учебный центр.")
+        parser.add_argument('--to', help="Шард назначения для --move.")
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help="Допустимый разрыв нагрузки шардов относительно средней.")
+        parser.add_argument('--apply', action='store_true', help="Выполнить план выравнивания.")
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError("Шардирование выключено (SHARD_COUNT=0).")
+
+        if options['init']:
+            centres = sharding.init_shards()
+            self.stdout.write(self.style.SUCCESS(f"Шарды заполнены, перенесено центров: {centres}"))
+            return
+
+        if options['move'] is not None:
+            if options['to'] not in sharding.shards():
+                raise CommandError(f"--to должен быть одним из: {', '.join(sharding.shards())}")
+            moved = sharding.move_centre(options['move'], options['to'])
+            self.stdout.write(self.style.SUCCESS(f"Центр {options['move']} в {options['to']}, курсов: {moved}"))
+            return
+
+        for alias, centres in sharding.centre_loads().items():
+            self.stdout.write(f"{alias}: {sum(centres.values())} (центров: {len(centres)})")
+        plan = sharding.plan_rebalance(tolerance=options['tolerance'])
+        if not plan:
+            self.stdout.write(self.style.SUCCESS("Шарды сбалансированы."))
+            return
+        for centre_id, source, target, load in plan:
+            self.stdout.write(f"  центр {centre_id}: {source} -> {target} ({load})")
+            if options['apply']:
+                sharding.move_centre(centre_id, target)
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS(f"Перенесено центров: {len(plan)}"))
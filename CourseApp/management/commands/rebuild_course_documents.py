@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import documents
+
+
+class Command(BaseCommand):
+    help = "Пересобирает JSON-карточки курсов (CourseDocument) для /courses/cards/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help="Только курсы без карточки.")
+        parser.add_argument('--batch-size', type=int, default=documents.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not documents.enabled():
+            raise CommandError("Карточки курсов выключены (COURSE_CARDS_ENABLED)")
+        started = time.monotonic()
+        if options['missing']:
+            written = documents.rebuild(documents.find_missing(), batch_size=options['batch_size'])
+        else:
+            written = documents.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Карточек: {written} за {time.monotonic() - started:.1f} с"))
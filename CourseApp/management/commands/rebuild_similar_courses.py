@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import similarity
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает таблицу похожих курсов (CourseSimilarity)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not similarity.enabled():
+            raise CommandError("Похожие курсы выключены (SIMILAR_COURSES_ENABLED)")
+        started = time.monotonic()
+        count = similarity.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Сохранено {count} пар похожих курсов за {time.monotonic() - started:.1f} с"
+        ))
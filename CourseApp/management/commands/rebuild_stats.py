@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import stats
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает агрегаты категорий и учебных центров (CategoryStats, EducationCentreStats)."
+
+    def handle(self, *args, **options):
+        if not stats.enabled():
+            raise CommandError("Агрегаты выключены (STATS_ENABLED)")
+        started = time.monotonic()
+        categories, centres = stats.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Категорий: {categories}, учебных центров: {centres} за {time.monotonic() - started:.1f} с"
+        ))
@@ -0,0 +1,68 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from CourseApp import maintenance
+from CourseApp.models import MaintenanceJob
+
+
+class Command(BaseCommand):
+    help = "Регламентные задачи: очистка просроченных записей, ANALYZE/PRAGMA optimize, вакуум, мусор в media."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', action='append', dest='jobs', choices=sorted(maintenance.JOBS),
+                            help="Запустить только эту задачу (можно повторять).")
+        parser.add_argument('--force', action='store_true', help="Не ждать интервала задачи.")
+        parser.add_argument('--loop', action='store_true', help="Работать планировщиком до SIGTERM.")
+        parser.add_argument('--poll-interval', type=float, default=settings.MAINTENANCE_POLL_INTERVAL)
+        parser.add_argument('--list', action='store_true', help="Показать состояние задач и выйти.")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self._list()
+            return
+
+        lock = maintenance.HostLock(settings.MAINTENANCE_LOCK_FILE)
+        if not lock.acquire():
+            raise CommandError(f"Планировщик уже запущен на этом узле ({settings.MAINTENANCE_LOCK_FILE})")
+        try:
+            if not options['loop']:
+                self._report(maintenance.run_pending(options['jobs'], force=options['force']))
+                return
+
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+            try:
+                while not stop.is_set():
+                    self._report(maintenance.run_pending(options['jobs']))
+                    stop.wait(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+        finally:
+            lock.release()
+
+    def _report(self, results):
+        for result in results:
+            if result.error:
+                self.stderr.write(f"{result.name}: ошибка за {result.duration:.2f} с\n{result.error}")
+            else:
+                self.stdout.write(f"{result.name}: {result.rows} за {result.duration:.2f} с")
+
+    def _list(self):
+        states = {state.name: state for state in MaintenanceJob.objects.all()}
+        for name in maintenance.JOBS:
+            state = states.get(name)
+            interval = settings.MAINTENANCE_INTERVALS[name]
+            if state is None or state.last_started_at is None:
+                self.stdout.write(f"{name}: интервал {interval} с, ещё не запускалась")
+                continue
+            line = f"{name}: интервал {interval} с, последний запуск {state.last_started_at:%Y-%m-%d %H:%M:%S}"
+            if state.locked_by:
+                line += f", выполняется до {state.locked_until:%H:%M:%S}"
+            elif state.last_error:
+                line += f", ошибка за {state.last_duration:.2f} с"
+            elif state.last_finished_at:
+                line += f", {state.last_rows} за {state.last_duration:.2f} с"
+            self.stdout.write(line)
@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from CourseApp import tasks
+
+
+def _worker_loop(batch_size, poll_interval, stop):
+    while not stop.is_set():
+        succeeded, failed = tasks.run_once(batch_size)
+        if not succeeded and not failed:
+            stop.wait(poll_interval)
+
+
+def _child(batch_size, poll_interval, stop):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        _worker_loop(batch_size, poll_interval, stop)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Запускает воркеры очереди фоновых задач (отправка SMS и т.п.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Число процессов-воркеров.")
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=settings.TASK_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help="Обработать готовые задачи и выйти.")
+        parser.add_argument('--requeue-dead', action='store_true', help="Вернуть dead-задачи в очередь и выйти.")
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f"Возвращено в очередь: {tasks.requeue_dead()}")
+            return
+
+        if options['once']:
+            total_ok = total_failed = 0
+            while True:
+                succeeded, failed = tasks.run_once(options['batch_size'])
+                if not succeeded and not failed:
+                    break
+                total_ok += succeeded
+                total_failed += failed
+            self.stdout.write(f"Выполнено: {total_ok}, с ошибкой: {total_failed}")
+            return
+
+        stop = multiprocessing.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        # Соединение с БД не должно переходить в дочерние процессы
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_child, args=(options['batch_size'], options['poll_interval'], stop))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Запущено воркеров: {len(workers)}")
+        try:
+            while any(worker.is_alive() for worker in workers):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+        for worker in workers:
+            worker.join()
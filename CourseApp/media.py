@@ -0,0 +1,156 @@
+"""
+Раздача загруженных файлов (MEDIA_ROOT): логотипы центров, картинки курсов, фото пользователей.
+
+- Условные запросы: ETag (mtime + размер) и Last-Modified, ответ 304 без тела.
+- Range: один диапазон bytes=..., ответ 206; If-Range учитывается, несколько диапазонов — весь файл.
+- MEDIA_ACCEL = 'nginx': ответ без тела с X-Accel-Redirect на internal-location MEDIA_ACCEL_PREFIX,
+  байты (и Range) отдаёт nginx. Пример конфигурации:
+
+      location /protected-media/ {
+          internal;
+          alias /srv/app/media/;
+      }
+
+  MEDIA_ACCEL = 'sendfile': то же через X-Sendfile (Apache mod_xsendfile, lighttpd).
+- Без прокси — FileResponse: gunicorn передаёт файл через os.sendfile (wsgi.file_wrapper),
+  для диапазона — с текущей позиции файла и ровно Content-Length байт.
+- Имена с хэшем содержимого (MEDIA_IMMUTABLE_PATTERN) кэшируются навсегда (immutable),
+  остальные — на MEDIA_MAX_AGE с последующей проверкой по ETag.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """Файл, читаемый только в пределах диапазона; fileno() оставлен для os.sendfile."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _cache_control(path):
+    if re.search(settings.MEDIA_IMMUTABLE_PATTERN, os.path.basename(path)):
+        return 'public, max-age=31536000, immutable'
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None — отдать весь файл, 'unsatisfiable' — ответ 416."""
+    match = RANGE_RE.match(header.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        # bytes=-N — последние N байт
+        length = int(match[2])
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(match[1])
+    end = int(match[2]) if match[2] else size - 1
+    if start >= size:
+        return 'unsatisfiable'
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = _etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+
+        if settings.MEDIA_ACCEL == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        elif settings.MEDIA_ACCEL == 'sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+        else:
+            response = _file_response(request, full_path, stat, etag, content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = _cache_control(full_path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _file_response(request, full_path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(_FileRange(file, start, length), status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
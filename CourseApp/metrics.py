@@ -0,0 +1,165 @@
+"""
+Метрики в формате Prometheus: GET /metrics.
+
+Запросы подписываются именем маршрута из CourseApp/urls.py (login, register, courses-list, ...),
+нераспознанные пути сводятся в '<unmatched>', чтобы не раздувать число рядов.
+
+Под gunicorn с несколькими воркерами задайте PROMETHEUS_MULTIPROC_DIR (пустой каталог):
+prometheus_client будет писать значения в mmap-файлы воркеров, а /metrics — суммировать
+их через MultiProcessCollector; gunicorn.conf.py чистит каталог при старте и помечает
+завершившиеся воркеры.
+"""
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+UNMATCHED = '<unmatched>'
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+HASH_BUCKETS = (.01, .025, .05, .1, .25, .5, 1, 2.5)
+
+if prometheus_client is not None:
+    REQUESTS = Counter('http_requests_total', "HTTP-запросы", ['route', 'method', 'status'])
+    LATENCY = Histogram('http_request_duration_seconds', "Время обработки запроса", ['route', 'method'],
+                        buckets=LATENCY_BUCKETS)
+    REQUEST_SIZE = Histogram('http_request_size_bytes', "Размер тела запроса", ['route'], buckets=SIZE_BUCKETS)
+    RESPONSE_SIZE = Histogram('http_response_size_bytes', "Размер тела ответа (после сжатия)", ['route'],
+                              buckets=SIZE_BUCKETS)
+    IN_FLIGHT = Gauge('http_requests_in_flight', "Запросы в обработке", multiprocess_mode='livesum')
+    DB_QUERIES = Histogram('db_queries_per_request', "SQL-запросов на HTTP-запрос", ['route'],
+                           buckets=QUERY_COUNT_BUCKETS)
+    DB_TIME = Counter('db_query_seconds_total', "Суммарное время SQL-запросов", ['route', 'alias'])
+    CACHE_LOOKUPS = Counter('cache_lookups_total', "Обращения к кэшу (hit / miss)", ['cache', 'result'])
+    REQUESTS_SHED = Counter('http_requests_shed_total', "Запросы, отклонённые по сроку или перегрузке",
+                            ['route', 'reason'])
+    PASSWORD_HASH = Histogram('password_hash_duration_seconds', "Время хеширования и проверки паролей",
+                              ['algorithm', 'operation'], buckets=HASH_BUCKETS)
+
+
+def record_shed(route, reason):
+    """Учитывает запрос, отклонённый до выполнения view (CourseApp/deadline.py)."""
+    if prometheus_client is not None:
+        REQUESTS_SHED.labels(route, reason).inc()
+
+
+def record_cache(name, hit):
+    """Учитывает обращение к кэшу name; вызывается там, где код сам читает кэш."""
+    if prometheus_client is not None:
+        CACHE_LOOKUPS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher с замером времени; algorithm тот же, поэтому старые хеши проверяются как раньше."""
+
+    def encode(self, password, salt, iterations=None):
+        started = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            if prometheus_client is not None:
+                PASSWORD_HASH.labels(self.algorithm, 'encode').observe(time.perf_counter() - started)
+
+    def verify(self, password, encoded):
+        started = time.perf_counter()
+        try:
+            return super().verify(password, encoded)
+        finally:
+            if prometheus_client is not None:
+                PASSWORD_HASH.labels(self.algorithm, 'verify').observe(time.perf_counter() - started)
+
+
+class _QueryCounter:
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNMATCHED
+    return match.url_name
+
+
+def _body_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """Стоит первым в MIDDLEWARE, чтобы учитывать время всех остальных middleware и размер сжатого ответа."""
+
+    def __init__(self, get_response):
+        if prometheus_client is None or not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counters = [_QueryCounter(alias) for alias in connections]
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                for counter in counters:
+                    stack.enter_context(connections[counter.alias].execute_wrapper(counter))
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+
+        route = route_name(request)
+        LATENCY.labels(route, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        REQUEST_SIZE.labels(route).observe(int(request.META.get('CONTENT_LENGTH') or 0))
+        size = _body_size(response)
+        if size is not None:
+            RESPONSE_SIZE.labels(route).observe(size)
+        DB_QUERIES.labels(route).observe(sum(counter.count for counter in counters))
+        for counter in counters:
+            if counter.count:
+                DB_TIME.labels(route, counter.alias).inc(counter.duration)
+        return response
+
+
+def metrics_view(request):
+    if prometheus_client is None or not settings.METRICS_ENABLED:
+        return HttpResponseNotFound()
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        # Без токена метрики отдаются только при отладке: иначе /metrics был бы открыт всем
+        return HttpResponseForbidden()
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-19 04:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0006_category_skills_educationcentres_courses_branches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='CourseApp.courses')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='CourseApp.courses')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', '-score'], name='CourseApp_c_course__89c692_idx')],
+                'unique_together': {('course', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.18 on 2026-10-19 04:57
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_effective_prices(apps, schema_editor):
+    Courses = apps.get_model('CourseApp', 'Courses')
+    Courses.objects.update(
+        price_month_effective=F('price_month') * (100 - F('discount')) / 100,
+        full_price_effective=F('full_price') * (100 - F('discount')) / 100,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0007_coursesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courses',
+            name='full_price_effective',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='courses',
+            name='price_month_effective',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='courses',
+            index=models.Index(fields=['category', 'price_month_effective'], name='CourseApp_c_categor_bdd608_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.18 on 2026-10-19 04:57
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    # Агрегаты для уже существующих данных: те же сгруппированные запросы, что stats.rebuild_all
+    alias = schema_editor.connection.alias
+    Category = apps.get_model('CourseApp', 'Category')
+    EducationCentres = apps.get_model('CourseApp', 'EducationCentres')
+    Branches = apps.get_model('CourseApp', 'Branches')
+    Courses = apps.get_model('CourseApp', 'Courses')
+    CategoryStats = apps.get_model('CourseApp', 'CategoryStats')
+    EducationCentreStats = apps.get_model('CourseApp', 'EducationCentreStats')
+
+    categories = {
+        pk: CategoryStats(category_id=pk) for pk in Category.objects.using(alias).values_list('pk', flat=True)
+    }
+    for row in Courses.objects.using(alias).values('category_id').annotate(
+            courses_count=Count('pk'), price_min=Min('price_month_effective'),
+            price_max=Max('price_month_effective'), rate_avg=Avg('rate')).order_by():
+        stats = categories[row['category_id']]
+        stats.courses_count = row['courses_count']
+        stats.price_min = row['price_min']
+        stats.price_max = row['price_max']
+        stats.rate_avg = None if row['rate_avg'] is None else Decimal(row['rate_avg']).quantize(Decimal('0.01'))
+    for category_id, count in EducationCentres.objects.using(alias).values_list('category_id') \
+            .annotate(count=Count('pk')).order_by():
+        categories[category_id].education_centres_count = count
+    CategoryStats.objects.using(alias).bulk_create(categories.values(), batch_size=1000)
+
+    centres = {
+        pk: EducationCentreStats(education_centre_id=pk)
+        for pk in EducationCentres.objects.using(alias).values_list('pk', flat=True)
+    }
+    for row in Courses.objects.using(alias).values('education_centre_id').annotate(
+            courses_count=Count('pk'), price_min=Min('price_month_effective'),
+            price_max=Max('price_month_effective')).order_by():
+        stats = centres[row['education_centre_id']]
+        stats.courses_count = row['courses_count']
+        stats.price_min = row['price_min']
+        stats.price_max = row['price_max']
+    for centre_id, count in Branches.objects.using(alias).values_list('education_centre_id') \
+            .annotate(count=Count('pk')).order_by():
+        centres[centre_id].branches_count = count
+    EducationCentreStats.objects.using(alias).bulk_create(centres.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0008_courses_effective_prices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='CourseApp.category')),
+                ('courses_count', models.IntegerField(default=0)),
+                ('education_centres_count', models.IntegerField(default=0)),
+                ('price_min', models.IntegerField(blank=True, null=True)),
+                ('price_max', models.IntegerField(blank=True, null=True)),
+                ('rate_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EducationCentreStats',
+            fields=[
+                ('education_centre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='CourseApp.educationcentres')),
+                ('courses_count', models.IntegerField(default=0)),
+                ('branches_count', models.IntegerField(default=0)),
+                ('price_min', models.IntegerField(blank=True, null=True)),
+                ('price_max', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
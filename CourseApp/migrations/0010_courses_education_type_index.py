@@ -0,0 +1,17 @@
+# Generated by Django 4.2.18 on 2026-10-19 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0009_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courses',
+            index=models.Index(fields=['education_type'], name='CourseApp_c_educati_058cb2_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.18 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+def log_existing_objects(apps, schema_editor):
+    # Всё, что уже есть в каталоге, попадает в ленту как upsert, чтобы полная синхронизация с since=0 была полной
+    ChangeLog = apps.get_model('CourseApp', 'ChangeLog')
+    for name, model_name in [('category', 'Category'), ('skill', 'Skills'), ('education_centre', 'EducationCentres'),
+                             ('branch', 'Branches'), ('course', 'Courses')]:
+        model = apps.get_model('CourseApp', model_name)
+        ChangeLog.objects.bulk_create(
+            (ChangeLog(model=name, object_id=pk, op='upsert') for pk in model.objects.values_list('pk', flat=True)),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0011_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purged_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id'], name='CourseApp_c_model_b6577a_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_objects, migrations.RunPython.noop),
+    ]
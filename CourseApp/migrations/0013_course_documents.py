@@ -0,0 +1,70 @@
+# Generated by Django 4.2.18 on 2026-10-19 05:09
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _url(file):
+    return file.url if file else None
+
+
+def _card_json(course):
+    # Карточка в формате documents.build_card на момент этой миграции
+    centre = course.education_centre
+    card = {
+        'id': course.pk,
+        'name': course.name,
+        'image': _url(course.image_one),
+        'duration': course.duration,
+        'rate': course.rate,
+        'price_month': course.price_month,
+        'full_price': course.full_price,
+        'discount': course.discount,
+        'price_month_effective': course.price_month_effective,
+        'full_price_effective': course.full_price_effective,
+        'education_type': course.education_type,
+        'category': {'id': course.category_id, 'name': course.category.name},
+        'education_centre': {'id': centre.pk, 'name': centre.name, 'logo': _url(centre.logo), 'rate': centre.rate},
+        'skills': [skill.name for skill in sorted(course.skills.all(), key=lambda skill: skill.pk)],
+    }
+    return json.dumps(card, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_documents(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Courses = apps.get_model('CourseApp', 'Courses')
+    CourseDocument = apps.get_model('CourseApp', 'CourseDocument')
+    courses = Courses.objects.using(alias).select_related('category', 'education_centre').prefetch_related('skills')
+    CourseDocument.objects.using(alias).bulk_create(
+        (CourseDocument(course_id=course.pk, category_id=course.category_id,
+                        education_centre_id=course.education_centre_id, body=_card_json(course))
+         for course in courses.iterator(chunk_size=500)),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0012_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='CourseApp.courses')),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='CourseApp.category')),
+                ('education_centre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='CourseApp.educationcentres')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'course'], name='CourseApp_c_categor_63814c_idx'), models.Index(fields=['education_centre', 'course'], name='CourseApp_c_educati_a2480d_idx')],
+            },
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.18 on 2026-10-19 05:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0015_maintenancejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseMinHash',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='minhash', serialize=False, to='CourseApp.courses')),
+                ('signature', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.SmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='CourseApp.courses')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='CourseApp_c_band_ca01af_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseDuplicate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_flags', to='CourseApp.courses')),
+                ('duplicate_of', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='CourseApp.courses')),
+            ],
+            options={
+                'unique_together': {('course', 'duplicate_of')},
+            },
+        ),
+    ]
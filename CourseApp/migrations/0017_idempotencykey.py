@@ -0,0 +1,25 @@
+# Generated by Django 4.2.18 on 2026-10-19 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0016_course_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('status_code', models.SmallIntegerField(blank=True, null=True)),
+                ('headers', models.JSONField(default=dict)),
+                ('content', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.18 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+
+def fill_name_sort(apps, schema_editor):
+    from CourseApp.text import sort_key
+
+    alias = schema_editor.connection.alias
+    for model_name in ('Category', 'Skills', 'EducationCentres', 'Courses'):
+        model = apps.get_model('CourseApp', model_name)
+        objs = list(model.objects.using(alias).only('pk', 'name'))
+        for obj in objs:
+            obj.name_sort = sort_key(obj.name)
+        model.objects.using(alias).bulk_update(objs, ['name_sort'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0017_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='name_sort',
+            field=models.CharField(default='', editable=False, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='courses',
+            name='name_sort',
+            field=models.CharField(default='', editable=False, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='educationcentres',
+            name='name_sort',
+            field=models.CharField(default='', editable=False, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='skills',
+            name='name_sort',
+            field=models.CharField(default='', editable=False, max_length=512),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name_sort', 'id'], name='category_name_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courses',
+            index=models.Index(fields=['name_sort', 'id'], name='courses_name_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='educationcentres',
+            index=models.Index(fields=['name_sort', 'id'], name='educationcentres_name_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skills',
+            index=models.Index(fields=['name_sort', 'id'], name='skills_name_sort_idx'),
+        ),
+        migrations.RunPython(fill_name_sort, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.18 on 2026-10-19 06:20
+
+from django.db import migrations
+
+
+def refresh_name_sort(apps, schema_editor):
+    # Ключ получил уровень пунктуации (C < C# < C++): пересчитываем только изменившиеся
+    from CourseApp.text import sort_key
+
+    alias = schema_editor.connection.alias
+    for model_name in ('Category', 'Skills', 'EducationCentres', 'Courses'):
+        model = apps.get_model('CourseApp', model_name)
+        changed = []
+        for obj in model.objects.using(alias).only('pk', 'name', 'name_sort').iterator(chunk_size=2000):
+            key = sort_key(obj.name)
+            if obj.name_sort != key:
+                obj.name_sort = key
+                changed.append(obj)
+        model.objects.using(alias).bulk_update(changed, ['name_sort'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CourseApp', '0018_name_sort'),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_name_sort, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,10 @@ from django.utils.timezone import now, timedelta
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, ExpressionWrapper, F, Value
+
+from CourseApp import sharding
+from CourseApp.text import SORT_KEY_LENGTH, sort_key
 
 
 # Create your models here.
@@ -28,6 +31,10 @@ class PhoneVerification(models.Model):
         return f"{self.phone_number} - {self.verification_code}"
 
 
+# Срок действия кода сброса пароля
+PASSWORD_RESET_CODE_LIFETIME = timedelta(minutes=10)
+
+
 class PasswordResetCode(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="password_reset_codes")
     code = models.CharField(max_length=6)
@@ -35,18 +42,80 @@ class PasswordResetCode(models.Model):
     is_used = models.BooleanField(default=False)
 
     def is_expired(self):
-        # Код действует 10 минут
-        return now() > self.created_at + timedelta(minutes=10)
-
-
-class Category(models.Model):
+        return now() > self.created_at + PASSWORD_RESET_CODE_LIFETIME
+
+
+class NameSortQuerySet(models.QuerySet):
+    """Поддерживает name_sort при массовых операциях, минуя save()."""
+
+    def update(self, **kwargs):
+        name = kwargs.get('name')
+        if name is None or isinstance(name, str):
+            if name is not None:
+                kwargs.setdefault('name_sort', sort_key(name))
+            return super().update(**kwargs)
+        # Выражение (Concat, F...) — ключ считается по итоговым значениям
+        pks = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        objs = list(self.model._base_manager.using(self.db).filter(pk__in=pks).only('pk', 'name'))
+        self.model._base_manager.using(self.db).bulk_update(
+            [obj for obj in objs if obj.update_name_sort()], ['name_sort'], batch_size=500
+        )
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.update_name_sort()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if 'name' in fields:
+            for obj in objs:
+                obj.update_name_sort()
+            if 'name_sort' not in fields:
+                fields.append('name_sort')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class NameSortModel(models.Model):
+    """
+    Хранимый ключ сортировки name (CourseApp/text.py: sort_key). Сортировка ?ordering=name идёт
+    по индексу (name_sort, id), и страницы можно выбирать по курсору (name_sort, id) без OFFSET.
+    """
+    name_sort = models.CharField(max_length=SORT_KEY_LENGTH, default='', editable=False)
+
+    objects = NameSortQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        indexes = [models.Index(fields=['name_sort', 'id'], name='%(class)s_name_sort_idx')]
+
+    def update_name_sort(self):
+        """Пересчитывает name_sort; True, если значение изменилось."""
+        key = sort_key(self.name)
+        changed = key != self.name_sort
+        self.name_sort = key
+        return changed
+
+    def save(self, *args, **kwargs):
+        self.update_name_sort()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'name_sort'}
+        super().save(*args, **kwargs)
+
+
+class Category(NameSortModel):
     name = models.CharField(max_length=255)
 
     def __str__(self):
         return self.name
 
 
-class Skills(models.Model):
+class Skills(NameSortModel):
     name = models.CharField(max_length=255)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='skills')
 
@@ -54,7 +123,7 @@ class Skills(models.Model):
         return self.name
 
 
-class EducationCentres(models.Model):
+class EducationCentres(NameSortModel):
     name = models.CharField(max_length=255)
     skills = models.ManyToManyField(Skills, blank=True, related_name='education_centres')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='education_centres')
@@ -104,8 +173,68 @@ class Branches(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # С шардированием филиал пишется в базу шарда своего учебного центра
+        sharding.prepare_save(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+# Поля цены, от которых зависят хранимые цены со скидкой
+PRICE_FIELDS = {'price_month', 'full_price', 'discount'}
+EFFECTIVE_PRICE_FIELDS = {'price_month': 'price_month_effective', 'full_price': 'full_price_effective'}
+
+
+def effective_price(price, discount):
+    """Цена с учётом скидки в процентах, округление вниз до целого."""
+    return price * (100 - discount) // 100
 
-class Courses(models.Model):
+
+def _as_expression(value):
+    return value if hasattr(value, 'resolve_expression') else Value(value)
+
+
+def effective_price_expression(price, discount):
+    """
+    То же, что effective_price, но как SQL-выражение для UPDATE.
+    price/discount — новое значение из update() или F() на текущее значение столбца.
+    """
+    return ExpressionWrapper(
+        _as_expression(price) * (Value(100) - _as_expression(discount)) / Value(100),
+        output_field=models.IntegerField()
+    )
+
+
+class CoursesQuerySet(NameSortQuerySet):
+    """Поддерживает хранимые цены со скидкой при массовых операциях, минуя save()."""
+
+    def update(self, **kwargs):
+        if PRICE_FIELDS & kwargs.keys():
+            discount = kwargs.get('discount', F('discount'))
+            for price_field, effective_field in EFFECTIVE_PRICE_FIELDS.items():
+                # В SET правая часть видит старые значения столбцов, поэтому подставляем новые
+                kwargs.setdefault(
+                    effective_field,
+                    effective_price_expression(kwargs.get(price_field, F(price_field)), discount)
+                )
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.update_effective_prices()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if PRICE_FIELDS & set(fields):
+            for obj in objs:
+                obj.update_effective_prices()
+            fields += [field for field in EFFECTIVE_PRICE_FIELDS.values() if field not in fields]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class Courses(NameSortModel):
     name = models.CharField(max_length=255)
     duration = models.IntegerField()  # Уточните, в каких единицах (дни, часы, недели)
     rate = models.DecimalField(max_digits=5, decimal_places=2)
@@ -114,6 +243,10 @@ class Courses(models.Model):
     full_price = models.IntegerField()
     discount = models.IntegerField(default=0)  # процент скидки?
 
+    # Цены со скидкой хранятся и индексируются, чтобы фильтр и сортировка по ним шли по индексу
+    price_month_effective = models.IntegerField(default=0, db_index=True, editable=False)
+    full_price_effective = models.IntegerField(default=0, db_index=True, editable=False)
+
     description = models.TextField()
 
     image_one = models.ImageField(upload_to='courses/', null=True, blank=True)
@@ -134,5 +267,235 @@ class Courses(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CoursesQuerySet.as_manager()
+
+    class Meta(NameSortModel.Meta):
+        indexes = NameSortModel.Meta.indexes + [
+            models.Index(fields=['category', 'price_month_effective']),
+            models.Index(fields=['education_type']),
+        ]
+
     def __str__(self):
         return self.name
+
+    def update_effective_prices(self):
+        self.price_month_effective = effective_price(self.price_month, self.discount)
+        self.full_price_effective = effective_price(self.full_price, self.discount)
+
+    def save(self, *args, **kwargs):
+        self.update_effective_prices()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and PRICE_FIELDS & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(EFFECTIVE_PRICE_FIELDS.values())
+        # С шардированием курс пишется в базу шарда своего учебного центра
+        sharding.prepare_save(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+class CourseDocument(models.Model):
+    """
+    Готовая JSON-карточка курса (курс + категория + учебный центр + навыки) для списка без JOIN.
+    Поддерживается сигналами, см. CourseApp/documents.py.
+    """
+    course = models.OneToOneField(Courses, on_delete=models.CASCADE, primary_key=True, related_name='document')
+    # Копии внешних ключей курса для фильтрации по индексу без JOIN
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    education_centre = models.ForeignKey(EducationCentres, on_delete=models.CASCADE, related_name='+')
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'course']),
+            models.Index(fields=['education_centre', 'course']),
+        ]
+
+
+class CourseSimilarity(models.Model):
+    """
+    Предрассчитанные top-K похожих курсов (см. CourseApp/similarity.py).
+    """
+    course = models.ForeignKey(Courses, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Courses, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('course', 'similar')
+        indexes = [models.Index(fields=['course', '-score'])]
+
+
+class CourseMinHash(models.Model):
+    """
+    MinHash-подпись текста курса (name + description) для поиска почти-дубликатов (CourseApp/duplicates.py).
+    """
+    course = models.OneToOneField(Courses, on_delete=models.CASCADE, primary_key=True, related_name='minhash')
+    signature = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class CourseLSHBucket(models.Model):
+    """
+    Корзина LSH: курсы с совпадающей полосой подписи — кандидаты в дубликаты.
+    """
+    course = models.ForeignKey(Courses, on_delete=models.CASCADE, related_name='+')
+    band = models.SmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'bucket'])]
+
+
+class CourseDuplicate(models.Model):
+    """
+    Курс, отмеченный как вероятный дубликат уже существующего.
+    """
+    course = models.ForeignKey(Courses, on_delete=models.CASCADE, related_name='duplicate_flags')
+    duplicate_of = models.ForeignKey(Courses, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('course', 'duplicate_of')
+
+
+class CategoryStats(models.Model):
+    """
+    Агрегаты по категории, поддерживаемые сигналами (см. CourseApp/stats.py).
+    Цены — по price_month_effective.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    courses_count = models.IntegerField(default=0)
+    education_centres_count = models.IntegerField(default=0)
+    price_min = models.IntegerField(null=True, blank=True)
+    price_max = models.IntegerField(null=True, blank=True)
+    rate_avg = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class EducationCentreStats(models.Model):
+    """
+    Агрегаты по учебному центру, поддерживаемые сигналами (см. CourseApp/stats.py).
+    """
+    education_centre = models.OneToOneField(
+        EducationCentres, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    courses_count = models.IntegerField(default=0)
+    branches_count = models.IntegerField(default=0)
+    price_min = models.IntegerField(null=True, blank=True)
+    price_max = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Task(models.Model):
+    """
+    Фоновая задача (см. CourseApp/tasks.py). Запись создаётся в той же транзакции,
+    что и бизнес-данные (outbox), а выполняется воркером manage.py run_tasks.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead'),  # исчерпаны попытки (dead letter)
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=now)
+    claimed_by = models.CharField(max_length=64, null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['claimed_by']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений каталога для инкрементальной синхронизации (GET /changes/?since=).
+    id служит курсором; удаления хранятся как tombstone-записи.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPERATIONS = [
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+    ]
+
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=8, choices=OPERATIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'object_id'])]
+
+
+class ChangeFeedState(models.Model):
+    """
+    Единственная строка: до какого курсора tombstone-записи уже удалены компактизацией.
+    Клиентам с более старым курсором нужна полная синхронизация.
+    """
+    purged_through = models.BigIntegerField(default=0)
+
+
+class ShardAssignment(models.Model):
+    """
+    Явное размещение учебного центра в шарде после переноса (manage.py rebalance_shards).
+    Центры без записи размещаются по хэшу id, см. CourseApp/sharding.py.
+    """
+    education_centre_id = models.BigIntegerField(primary_key=True)
+    shard = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class IdBlock(models.Model):
+    """
+    Блоки глобальных первичных ключей для шардированных моделей: блок N — id с N * SHARD_ID_BLOCK.
+    """
+    model = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class MaintenanceJob(models.Model):
+    """
+    Состояние регламентной задачи (CourseApp/maintenance.py): аренда для запуска ровно на одном узле
+    и итоги последнего прогона.
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    locked_by = models.CharField(max_length=64, null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_rows = models.BigIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+
+class IdempotencyKey(models.Model):
+    """
+    Запрос с заголовком Idempotency-Key (CourseApp/idempotency.py): пока ответа нет, запись — аренда
+    на выполнение view, после — сохранённый ответ для повторов до expires_at.
+    """
+    key = models.CharField(max_length=64, primary_key=True)  # sha256(клиент, метод, путь, ключ, тело)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    status_code = models.SmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    content = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
@@ -0,0 +1,34 @@
+"""
+?ordering=name по хранимому ключу сортировки вместо двоичного сравнения строк.
+
+SQLite сравнивает name посимвольно (BINARY): заглавные раньше строчных, ё после я, узбекские
+ғ, қ, ў, ҳ после всей кириллицы. Сортировать в Python пришлось бы всю выборку, поэтому ключ
+считается при записи (CourseApp/text.py: sort_key) и хранится в индексированном name_sort.
+Фильтр подменяет name на (name_sort, id): порядок полный, совпадает с индексом (name_sort, id),
+и по последней строке страницы можно продолжить выборку курсором.
+"""
+from rest_framework import filters
+
+SORT_KEY_FIELDS = {'name': 'name_sort'}
+
+
+class CollationOrderingFilter(filters.OrderingFilter):
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        result = []
+        tie_breaker = None
+        for field in ordering:
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            column = SORT_KEY_FIELDS.get(name)
+            if column in model_fields:
+                field = f"-{column}" if descending else column
+                tie_breaker = tie_breaker or ('-pk' if descending else 'pk')
+            result.append(field)
+        if tie_breaker and not {'pk', '-pk', 'id', '-id'} & set(result):
+            result.append(tie_breaker)
+        return result
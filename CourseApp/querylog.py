@@ -0,0 +1,197 @@
+"""
+Журнал SQL-запросов: отпечатки запросов, агрегаты по эндпоинтам и медленные запросы с планом.
+
+QueryLogMiddleware подключает connection.execute_wrapper на время запроса. Каждый SQL
+нормализуется в отпечаток (литералы и списки IN заменены на ?), по паре (эндпоинт, отпечаток)
+копятся count / total / max. Хранилище ограничено QUERYLOG_MAX_ENTRIES: при переполнении
+вытесняется давно не встречавшаяся пара. Для запросов дольше QUERYLOG_SLOW_MS сохраняется
+EXPLAIN (QUERY PLAN) и view, из которого пришёл запрос. Значения параметров (телефоны, коды,
+хэши паролей) не сохраняются: только текст с плейсхолдерами и отпечаток, план строится сразу.
+
+Данные живут в памяти процесса: GET /querylog/ (только staff) показывает текущий воркер,
+manage.py querylog прогоняет URL внутри своего процесса и печатает топ.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN \((?:\?,\s*)*\?\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"VALUES \((?:[^()]*)\)(?:,\s*\((?:[^()]*)\))+", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Нормализованный текст запроса: одинаковые по форме запросы дают одинаковый отпечаток."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryStore:
+    """Ограниченное хранилище агрегатов; общее для потоков процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.entries = OrderedDict()  # (endpoint, fingerprint) -> [count, total, max]
+            self.slow = deque(maxlen=settings.QUERYLOG_SLOW_KEEP)
+            self.started_at = time.time()
+
+    def add(self, endpoint, sql_fingerprint, duration):
+        key = (endpoint, sql_fingerprint)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                if len(self.entries) >= settings.QUERYLOG_MAX_ENTRIES:
+                    self.entries.popitem(last=False)
+                entry = self.entries[key] = [0, 0.0, 0.0]
+            else:
+                self.entries.move_to_end(key)
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+    def add_slow(self, record):
+        with self._lock:
+            self.slow.append(record)
+
+    def top(self, limit=20, by='total', endpoint=None):
+        """Топ отпечатков по total / max / count; endpoint ограничивает выборку одним эндпоинтом."""
+        with self._lock:
+            items = list(self.entries.items())
+
+        fingerprints = {}
+        for (entry_endpoint, sql_fingerprint), (count, total, maximum) in items:
+            if endpoint is not None and entry_endpoint != endpoint:
+                continue
+            row = fingerprints.setdefault(sql_fingerprint, {
+                'fingerprint': sql_fingerprint, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': {},
+            })
+            row['count'] += count
+            row['total_ms'] += total * 1000
+            row['max_ms'] = max(row['max_ms'], maximum * 1000)
+            row['endpoints'][entry_endpoint] = row['endpoints'].get(entry_endpoint, 0) + count
+
+        key = {'total': 'total_ms', 'max': 'max_ms', 'count': 'count'}[by]
+        rows = sorted(fingerprints.values(), key=lambda row: row[key], reverse=True)[:limit]
+        for row in rows:
+            row['avg_ms'] = round(row['total_ms'] / row['count'], 3)
+            row['total_ms'] = round(row['total_ms'], 3)
+            row['max_ms'] = round(row['max_ms'], 3)
+        return rows
+
+    def endpoints(self, limit=20):
+        """Эндпоинты по суммарному времени в БД."""
+        with self._lock:
+            items = list(self.entries.items())
+        totals = {}
+        for (endpoint, sql_fingerprint), (count, total, maximum) in items:
+            row = totals.setdefault(endpoint, {'endpoint': endpoint, 'queries': 0, 'total_ms': 0.0})
+            row['queries'] += count
+            row['total_ms'] += total * 1000
+        rows = sorted(totals.values(), key=lambda row: row['total_ms'], reverse=True)[:limit]
+        for row in rows:
+            row['total_ms'] = round(row['total_ms'], 3)
+        return rows
+
+    def slow_queries(self, limit=20):
+        with self._lock:
+            return list(self.slow)[-limit:][::-1]
+
+
+store = QueryStore()
+_local = threading.local()
+
+
+def _explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    # EXPLAIN идёт отдельным курсором, мимо журнала, чтобы не затереть результат исходного запроса
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f"EXPLAIN не выполнен: {error}"]
+    finally:
+        _local.explaining = False
+
+
+class QueryRecorder:
+    """execute_wrapper: замеряет запрос и складывает его в store."""
+
+    def __init__(self, alias, endpoint):
+        self.alias = alias
+        # endpoint — строка или функция без аргументов: имя view известно только после resolve()
+        self.endpoint = endpoint
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            endpoint, view = self.endpoint() if callable(self.endpoint) else (self.endpoint, None)
+            sql_fingerprint = fingerprint(sql)
+            store.add(endpoint, sql_fingerprint, duration)
+            if duration * 1000 >= settings.QUERYLOG_SLOW_MS:
+                plan = None
+                if settings.QUERYLOG_EXPLAIN and not many and sql.lstrip().upper().startswith('SELECT'):
+                    plan = _explain(self.alias, sql, params)
+                store.add_slow({
+                    'at': time.time(),
+                    'endpoint': endpoint,
+                    'view': view,
+                    'duration_ms': round(duration * 1000, 3),
+                    'fingerprint': sql_fingerprint,
+                    'sql': sql,
+                    'plan': plan,
+                })
+
+
+def record(endpoint):
+    """Контекстный менеджер: журналирует запросы ко всем БД из settings.DATABASES."""
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(QueryRecorder(alias, endpoint)))
+    return stack
+
+
+def _request_endpoint(request):
+    def endpoint():
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return request.path, None
+        return match.view_name or match.route, match._func_path
+    return endpoint
+
+
+class QueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERYLOG_ENABLED:
+            return self.get_response(request)
+        with record(_request_endpoint(request)):
+            return self.get_response(request)
@@ -1,11 +1,13 @@
 import re
 import random
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
 
+from CourseApp import sharding
 from CourseApp.models import CustomUser, PhoneVerification, PasswordResetCode, Category, Skills, EducationCentres, \
-    Branches, Courses
+    Branches, Courses, CategoryStats, EducationCentreStats
 
 User = get_user_model()
 
@@ -181,28 +183,63 @@ class LogoutSerializer(serializers.Serializer):
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['name_sort']
 
 
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skills
-        fields = '__all__'
+        exclude = ['name_sort']
 
 
 class EducationCentresSerializer(serializers.ModelSerializer):
     class Meta:
         model = EducationCentres
-        fields = '__all__'
+        exclude = ['name_sort']
+
+
+class ShardedCentreMixin:
+    """С шардированием курс/филиал нельзя перевести в центр из другого шарда (см. CourseApp/sharding.py)."""
+
+    def validate_education_centre(self, value):
+        if self.instance is not None and sharding.changes_shard(self.instance, value.pk):
+            raise serializers.ValidationError(sharding.CENTRE_CHANGE_ERROR)
+        return value
 
 
-class BranchesSerializer(serializers.ModelSerializer):
+class BranchesSerializer(ShardedCentreMixin, serializers.ModelSerializer):
     class Meta:
         model = Branches
         fields = '__all__'
 
 
-class CoursesSerializer(serializers.ModelSerializer):
+class CoursesSerializer(ShardedCentreMixin, serializers.ModelSerializer):
     class Meta:
         model = Courses
-        fields = '__all__'
+        exclude = ['name_sort']
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.CharField(max_length=2048)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=BatchItemSerializer(), min_length=1, max_length=settings.BATCH_MAX_REQUESTS
+    )
+
+
+class CategoryStatsSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='category.name')
+
+    class Meta:
+        model = CategoryStats
+        fields = ['category', 'name', 'courses_count', 'education_centres_count', 'price_min', 'price_max',
+                  'rate_avg', 'updated_at']
+
+
+class EducationCentreStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EducationCentreStats
+        fields = ['education_centre', 'courses_count', 'branches_count', 'price_min', 'price_max', 'updated_at']
@@ -0,0 +1,483 @@
+"""
+Горизонтальное разбиение курсов и филиалов по учебным центрам (включается SHARD_COUNT > 0).
+
+- Courses, Branches и всё, что живёт рядом с курсом (M2M навыков, CourseDocument, CourseSimilarity),
+  хранятся в базе шарда shard0..shardN-1. Шард центра — crc32(education_centre_id) % N,
+  если в ShardAssignment нет явного переноса (manage.py rebalance_shards).
+- Category, Skills, EducationCentres (и M2M навыков центра) пишутся в default и после коммита
+  копируются во все шарды: FK и JOIN внутри шарда работают как в одной базе.
+- Первичные ключи курсов и филиалов глобальные: выдаются блоками из IdBlock в default,
+  поэтому курс сохраняет id при переносе между шардами.
+- Запрос с фильтром education_centre идёт в один шард; список без него выполняется
+  во всех шардах параллельно и сливается с учётом сортировки (ShardedViewSetMixin).
+- Лента изменений и автокомплит собирают курсы и филиалы со всех шардов (fetch),
+  списки курсов и филиалов в админке показывают один шард с переключателем (ShardListFilter в admin.py).
+
+Производные данные, которые сканируют все курсы (снимок каталога, похожие курсы, карточки,
+агрегаты категорий), читают базу default: с шардированием они были бы пустыми, поэтому
+по умолчанию выключены, а явное включение вместе с SHARD_COUNT останавливает запуск (check_features).
+Смена учебного центра, которая перенесла бы курс или филиал в другой шард, запрещена:
+переносить центры целиком — manage.py rebalance_shards.
+"""
+import functools
+import heapq
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import connections, transaction
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+# Модели, строки которых живут в шарде своего учебного центра
+SHARDED_MODELS = {
+    'CourseApp.Courses', 'CourseApp.Courses_skills', 'CourseApp.Branches',
+    'CourseApp.CourseDocument', 'CourseApp.CourseSimilarity',
+    'CourseApp.CourseMinHash', 'CourseApp.CourseLSHBucket', 'CourseApp.CourseDuplicate',
+}
+# Справочники, копируемые во все шарды
+REFERENCE_MODELS = {
+    'CourseApp.Category', 'CourseApp.Skills', 'CourseApp.EducationCentres', 'CourseApp.EducationCentres_skills',
+}
+
+
+def enabled():
+    return bool(settings.SHARD_DATABASES)
+
+
+def shards():
+    return list(settings.SHARD_DATABASES)
+
+
+# Возможности, которые читают курсы только из default, и их настройки
+DEFAULT_ONLY_FEATURES = {
+    'CATALOG_SNAPSHOT_ENABLED': "снимок каталога",
+    'STATS_ENABLED': "агрегаты категорий и центров",
+    'SIMILAR_COURSES_ENABLED': "похожие курсы",
+    'COURSE_CARDS_ENABLED': "карточки курсов",
+}
+CENTRE_CHANGE_ERROR = "С шардированием курс или филиал нельзя перевести в центр из другого шарда."
+
+
+def check_features():
+    """Вызывается при старте: с шардированием не запускаемся, если включены возможности, читающие только default."""
+    if not enabled():
+        return
+    conflicting = [f"{name} ({label})" for name, label in DEFAULT_ONLY_FEATURES.items() if getattr(settings, name)]
+    if conflicting:
+        raise ImproperlyConfigured(
+            "SHARD_COUNT > 0 несовместимо с " + ', '.join(conflicting) + ": они строятся по базе default"
+        )
+
+
+def hash_shard(education_centre_id):
+    aliases = shards()
+    return aliases[zlib.crc32(str(education_centre_id).encode()) % len(aliases)]
+
+
+_assignments = {}
+_assignments_loaded_at = 0.0
+_assignments_lock = threading.Lock()
+
+
+def _load_assignments():
+    global _assignments, _assignments_loaded_at
+    from CourseApp.models import ShardAssignment
+
+    now = time.monotonic()
+    if now - _assignments_loaded_at > settings.SHARD_ASSIGNMENT_TTL:
+        with _assignments_lock:
+            _assignments = dict(
+                ShardAssignment.objects.using('default').values_list('education_centre_id', 'shard')
+            )
+            _assignments_loaded_at = now
+    return _assignments
+
+
+def reset_assignments_cache():
+    global _assignments_loaded_at
+    _assignments_loaded_at = 0.0
+
+
+def shard_for_centre(education_centre_id):
+    return _load_assignments().get(education_centre_id) or hash_shard(education_centre_id)
+
+
+# Выдача глобальных id блоками: один INSERT в default на SHARD_ID_BLOCK объектов процесса
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+def allocate_id(model):
+    from CourseApp.models import IdBlock
+
+    label = model._meta.label
+    with _id_lock:
+        block = _id_blocks.get(label)
+        if not block:
+            number = IdBlock.objects.using('default').create(model=label).pk
+            size = settings.SHARD_ID_BLOCK
+            block = _id_blocks[label] = list(range(number * size, (number + 1) * size))[::-1]
+        return block.pop()
+
+
+def _centre_of(instance):
+    if instance._meta.label == 'CourseApp.EducationCentres':
+        return instance.pk
+    return getattr(instance, 'education_centre_id', None)
+
+
+class ShardRouter:
+    """
+    Выбор базы по подсказке instance: у курса/филиала — по его education_centre_id,
+    у учебного центра (centre.courses.all()) — по id центра, у прочих — база, из которой объект загружен.
+    Без подсказки шардированные модели уходят в default: такие выборки нужно явно направлять через using().
+    """
+
+    def _shard_db(self, instance):
+        education_centre_id = _centre_of(instance)
+        if education_centre_id is not None:
+            return shard_for_centre(education_centre_id)
+        if instance._state.db in settings.SHARD_DATABASES:
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label in SHARDED_MODELS:
+            return self._shard_db(instance) if instance is not None else None
+        # Справочник, связанный с объектом из шарда (course.skills.all()), читается из того же шарда:
+        # там есть и копия справочника, и строки M2M
+        if model._meta.label in REFERENCE_MODELS and instance is not None \
+                and instance._state.db in settings.SHARD_DATABASES:
+            return instance._state.db
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label in SHARDED_MODELS:
+            return self._shard_db(instance) if instance is not None else None
+        # Справочники пишутся только в default и копируются в шарды сигналами
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Справочники есть в каждой базе
+        if obj1._meta.label in REFERENCE_MODELS or obj2._meta.label in REFERENCE_MODELS:
+            return True
+        return None
+
+
+def changes_shard(instance, education_centre_id):
+    """Перенесёт ли смена центра уже сохранённый курс/филиал в другой шард."""
+    return enabled() and instance.pk is not None and instance._state.db in settings.SHARD_DATABASES \
+        and shard_for_centre(education_centre_id) != instance._state.db
+
+
+def prepare_save(instance, save_kwargs):
+    """
+    Для save() курса/филиала: выдаёт глобальный id новому объекту и направляет запись в шард центра.
+    Сохранение в шард центра объекта, загруженного из другого шарда, вставило бы копию и оставило
+    старую строку — такую смену центра отклоняем.
+    """
+    if not enabled():
+        return
+    if instance.pk is None:
+        instance.pk = allocate_id(type(instance))
+        save_kwargs.setdefault('force_insert', True)
+    elif changes_shard(instance, instance.education_centre_id):
+        raise DjangoValidationError({'education_centre': CENTRE_CHANGE_ERROR})
+    save_kwargs['using'] = shard_for_centre(instance.education_centre_id)
+
+
+def _replicated_fields(model):
+    return [field.name for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def replicate(model, pks):
+    """Копирует строки справочника из default во все шарды (вставка или обновление, без сигналов)."""
+    objects = list(model.objects.using('default').filter(pk__in=pks))
+    fields = _replicated_fields(model)
+    for alias in shards():
+        if objects:
+            model.objects.using(alias).bulk_create(
+                objects, update_conflicts=True, unique_fields=['pk'], update_fields=fields
+            )
+
+
+def replicate_m2m(through, source_field, source_id):
+    """Переписывает во всех шардах строки M2M справочника для одного объекта."""
+    rows = list(through.objects.using('default').filter(**{source_field: source_id}))
+    for alias in shards():
+        with transaction.atomic(using=alias):
+            through.objects.using(alias).filter(**{source_field: source_id}).delete()
+            through.objects.using(alias).bulk_create(rows)
+
+
+def replicate_delete(model, pk):
+    # Каскад внутри шарда удаляет курсы и филиалы удалённого справочника
+    for alias in shards():
+        model.objects.using(alias).filter(pk=pk).delete()
+
+
+def schedule(func, *args):
+    transaction.on_commit(lambda: func(*args), using='default')
+
+
+def _run_on_shard(func, alias):
+    try:
+        return func(alias)
+    finally:
+        connections[alias].close()
+
+
+def fan_out(func):
+    """func(alias) во всех шардах параллельно; результаты в порядке settings.SHARD_DATABASES."""
+    aliases = shards()
+    with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+        return list(executor.map(functools.partial(_run_on_shard, func), aliases))
+
+
+def fetch(queryset):
+    """
+    Строки выборки: шардированной модели — из всех шардов (без подсказки router отправил бы
+    запрос в default, где курсов нет), остальных — как есть.
+    """
+    if not enabled() or queryset.model._meta.label not in SHARDED_MODELS:
+        return queryset.iterator(chunk_size=10000)
+    return [row for rows in fan_out(lambda alias: list(queryset.using(alias))) for row in rows]
+
+
+def _compare(a, b):
+    # Как в SQLite: NULL меньше любого значения
+    if a is None or b is None:
+        return (a is not None) - (b is not None)
+    return (a > b) - (a < b)
+
+
+def merge_sorted(results, model, ordering):
+    """Сливает уже отсортированные выборки шардов по ordering (список полей, '-' — по убыванию)."""
+    keys = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        attname = 'pk' if name == 'pk' else model._meta.get_field(name).attname
+        keys.append((attname, descending))
+
+    def compare(a, b):
+        for attname, descending in keys:
+            result = _compare(getattr(a, attname), getattr(b, attname))
+            if result:
+                return -result if descending else result
+        return 0
+
+    return list(heapq.merge(*results, key=functools.cmp_to_key(compare)))
+
+
+def locate(model, pk):
+    """Шард, в котором лежит объект с данным pk, или None."""
+    found = fan_out(lambda alias: model.objects.using(alias).filter(pk=pk).exists())
+    for alias, exists in zip(shards(), found):
+        if exists:
+            return alias
+    return None
+
+
+def _upsert(model, alias, objects):
+    fields = _replicated_fields(model)
+    for start in range(0, len(objects), 1000):
+        model.objects.using(alias).bulk_create(
+            objects[start:start + 1000], update_conflicts=True, unique_fields=['pk'], update_fields=fields
+        )
+
+
+def copy_centre(education_centre_id, source, target):
+    """Копирует курсы, их навыки, карточки и MinHash-индекс, филиалы центра из source в target (повторный вызов безопасен)."""
+    from CourseApp.models import Branches, CourseDocument, CourseLSHBucket, CourseMinHash, Courses
+
+    through = Courses.skills.through
+    courses = list(Courses.objects.using(source).filter(education_centre_id=education_centre_id))
+    course_ids = [course.pk for course in courses]
+    with transaction.atomic(using=target):
+        _upsert(Courses, target, courses)
+        through.objects.using(target).filter(courses_id__in=course_ids).delete()
+        through.objects.using(target).bulk_create(
+            list(through.objects.using(source).filter(courses_id__in=course_ids)), batch_size=1000
+        )
+        _upsert(CourseDocument, target, list(CourseDocument.objects.using(source).filter(course_id__in=course_ids)))
+        _upsert(CourseMinHash, target, list(CourseMinHash.objects.using(source).filter(course_id__in=course_ids)))
+        CourseLSHBucket.objects.using(target).filter(course_id__in=course_ids).delete()
+        CourseLSHBucket.objects.using(target).bulk_create(
+            [CourseLSHBucket(course_id=row.course_id, band=row.band, bucket=row.bucket)
+             for row in CourseLSHBucket.objects.using(source).filter(course_id__in=course_ids)],
+            batch_size=1000,
+        )
+        _upsert(Branches, target, list(Branches.objects.using(source).filter(education_centre_id=education_centre_id)))
+    return len(courses)
+
+
+def purge_centre(education_centre_id, alias):
+    """Удаляет строки центра из базы alias без сигналов: данные не удаляются, а переехали."""
+    from CourseApp.models import Branches, CourseDocument, CourseDuplicate, CourseLSHBucket, CourseMinHash, \
+        Courses, CourseSimilarity
+
+    with transaction.atomic(using=alias):
+        course_ids = Courses.objects.using(alias).filter(education_centre_id=education_centre_id).values('pk')
+        # Похожие курсы и отметки дубликатов считаются внутри шарда и пересобираются после переноса
+        CourseSimilarity.objects.using(alias).filter(course_id__in=course_ids)._raw_delete(alias)
+        CourseSimilarity.objects.using(alias).filter(similar_id__in=course_ids)._raw_delete(alias)
+        CourseDuplicate.objects.using(alias).filter(course_id__in=course_ids)._raw_delete(alias)
+        CourseDuplicate.objects.using(alias).filter(duplicate_of_id__in=course_ids)._raw_delete(alias)
+        CourseLSHBucket.objects.using(alias).filter(course_id__in=course_ids)._raw_delete(alias)
+        CourseMinHash.objects.using(alias).filter(course_id__in=course_ids)._raw_delete(alias)
+        CourseDocument.objects.using(alias).filter(course_id__in=course_ids)._raw_delete(alias)
+        Courses.skills.through.objects.using(alias).filter(courses_id__in=course_ids)._raw_delete(alias)
+        Courses.objects.using(alias).filter(education_centre_id=education_centre_id)._raw_delete(alias)
+        Branches.objects.using(alias).filter(education_centre_id=education_centre_id)._raw_delete(alias)
+
+
+def move_centre(education_centre_id, target):
+    """
+    Переносит центр в шард target: копия, переключение ShardAssignment, ожидание, пока процессы
+    обновят таблицу переносов, повторная копия записей, успевших попасть в старый шард, удаление из него.
+    """
+    from CourseApp.models import ShardAssignment
+
+    source = shard_for_centre(education_centre_id)
+    if source == target:
+        return 0
+    copy_centre(education_centre_id, source, target)
+    ShardAssignment.objects.using('default').update_or_create(
+        education_centre_id=education_centre_id, defaults={'shard': target}
+    )
+    reset_assignments_cache()
+    time.sleep(settings.SHARD_ASSIGNMENT_TTL)
+    moved = copy_centre(education_centre_id, source, target)
+    purge_centre(education_centre_id, source)
+    return moved
+
+
+def centre_loads():
+    """{шард: {id центра: число курсов и филиалов}}."""
+    from CourseApp.models import Branches, Courses
+
+    def loads(alias):
+        result = {}
+        for model in (Courses, Branches):
+            for centre_id, count in model.objects.using(alias).values_list('education_centre_id') \
+                    .annotate(count=Count('pk')).order_by():
+                result[centre_id] = result.get(centre_id, 0) + count
+        return result
+
+    return dict(zip(shards(), fan_out(loads)))
+
+
+def plan_rebalance(tolerance=0.1):
+    """
+    Жадный план переносов [(центр, из, в, нагрузка)]: с самого загруженного шарда на самый
+    свободный переносится крупнейший центр, который уменьшает разрыв, пока разрыв больше tolerance от среднего.
+    """
+    loads = centre_loads()
+    totals = {alias: sum(centres.values()) for alias, centres in loads.items()}
+    average = sum(totals.values()) / len(totals)
+    plan = []
+    while True:
+        heaviest = max(totals, key=totals.get)
+        lightest = min(totals, key=totals.get)
+        gap = totals[heaviest] - totals[lightest]
+        if gap <= tolerance * average:
+            break
+        candidates = [(load, centre_id) for centre_id, load in loads[heaviest].items() if load < gap]
+        if not candidates:
+            break
+        load, centre_id = max(candidates)
+        plan.append((centre_id, heaviest, lightest, load))
+        loads[lightest][centre_id] = loads[heaviest].pop(centre_id)
+        totals[heaviest] -= load
+        totals[lightest] += load
+    return plan
+
+
+def init_shards():
+    """
+    Первичное заполнение шардов: копирует справочники, сдвигает выдачу id за существующие
+    и переносит курсы и филиалы из default в шарды их центров. Возвращает число перенесённых центров.
+    """
+    from CourseApp.models import Branches, Category, Courses, EducationCentres, IdBlock, Skills
+
+    for model in (Category, Skills, EducationCentres):
+        objects = list(model.objects.using('default').all())
+        for alias in shards():
+            _upsert(model, alias, objects)
+    through = EducationCentres.skills.through
+    rows = list(through.objects.using('default').all())
+    for alias in shards():
+        with transaction.atomic(using=alias):
+            through.objects.using(alias).all().delete()
+            through.objects.using(alias).bulk_create(rows, batch_size=1000)
+
+    max_id = max(
+        model.objects.using(alias).aggregate(max_id=Max('pk'))['max_id'] or 0
+        for model in (Courses, Branches) for alias in ['default'] + shards()
+    )
+    first_block = max_id // settings.SHARD_ID_BLOCK + 1
+    if (IdBlock.objects.using('default').aggregate(max_id=Max('pk'))['max_id'] or 0) < first_block:
+        IdBlock.objects.using('default').create(pk=first_block, model='reserved')
+
+    centre_ids = set(Courses.objects.using('default').values_list('education_centre_id', flat=True)) \
+        | set(Branches.objects.using('default').values_list('education_centre_id', flat=True))
+    for education_centre_id in sorted(centre_ids):
+        copy_centre(education_centre_id, 'default', shard_for_centre(education_centre_id))
+        purge_centre(education_centre_id, 'default')
+    return len(centre_ids)
+
+
+class ShardedViewSetMixin:
+    """
+    Для ViewSet курсов и филиалов: ?education_centre= направляет запрос в один шард,
+    детальные запросы находят шард объекта, список без фильтра собирается со всех шардов.
+    """
+
+    def _requested_shard(self):
+        alias = getattr(self, '_shard_alias', None)
+        if alias is None and 'education_centre' in self.request.query_params:
+            try:
+                alias = shard_for_centre(int(self.request.query_params['education_centre']))
+            except ValueError:
+                raise ValidationError({'education_centre': 'Должно быть целым числом.'})
+        return alias
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if enabled():
+            alias = self._requested_shard()
+            if alias is not None:
+                queryset = queryset.using(alias)
+        return queryset
+
+    def get_object(self):
+        if enabled() and self._requested_shard() is None:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            self._shard_alias = locate(self.queryset.model, self.kwargs[lookup_url_kwarg]) or shards()[0]
+        return super().get_object()
+
+    def list(self, request, *args, **kwargs):
+        if not enabled() or self._requested_shard() is not None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = list(queryset.query.order_by) or ['pk']
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('pk')
+        queryset = queryset.order_by(*ordering)
+        results = fan_out(lambda alias: list(queryset.using(alias)))
+        objects = merge_sorted(results, queryset.model, ordering)
+
+        page = self.paginate_queryset(objects)
+        serializer = self.get_serializer(objects if page is None else page, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
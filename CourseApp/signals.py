@@ -0,0 +1,248 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from CourseApp import autocomplete, catalog_cache, changes, documents, duplicates, sharding, similarity, snapshot, \
+    stats
+from CourseApp.models import Branches, Category, ChangeLog, Courses, EducationCentres, Skills
+
+
+@receiver(post_save, sender=Skills)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Courses)
+@receiver(post_save, sender=EducationCentres)
+def update_autocomplete_index(sender, instance, **kwargs):
+    autocomplete.index_saved(instance)
+
+
+@receiver(post_delete, sender=Skills)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Courses)
+@receiver(post_delete, sender=EducationCentres)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    autocomplete.index_deleted(instance)
+
+
+@receiver(post_save, sender=Courses)
+def update_similar_courses(sender, instance, raw=False, **kwargs):
+    if not raw:
+        similarity.schedule_update([instance.pk])
+
+
+@receiver(m2m_changed, sender=Courses.skills.through)
+def update_similar_courses_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            similarity.schedule_update([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # skill.courses.add(...): изменились навыки у переданных курсов
+        similarity.schedule_update(pk_set)
+    elif action == 'pre_clear':
+        # После skill.courses.clear() связей уже не найти — ставим задачу заранее, в той же транзакции
+        similarity.schedule_update(Courses.objects.filter(skills=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Skills)
+def update_similar_courses_skill_delete(sender, instance, **kwargs):
+    # Строки M2M удалятся каскадом без m2m_changed
+    similarity.schedule_update(Courses.objects.filter(skills=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Courses)
+def remove_similar_courses(sender, instance, **kwargs):
+    similarity.schedule_delete(instance.pk)
+
+
+# Поля-ключи агрегатов: при переносе записи в другую категорию/центр пересчитываем и старый ключ
+STATS_KEYS = {
+    Courses: {'category_id': 'category', 'education_centre_id': 'education_centre'},
+    Branches: {'education_centre_id': 'education_centre'},
+    EducationCentres: {'category_id': 'category'},
+}
+
+
+@receiver(pre_save, sender=Courses)
+@receiver(pre_save, sender=Branches)
+@receiver(pre_save, sender=EducationCentres)
+def remember_stats_keys(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    fields = list(STATS_KEYS[sender])
+    instance._previous_stats_keys = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(post_save, sender=Courses)
+@receiver(post_save, sender=Branches)
+@receiver(post_save, sender=EducationCentres)
+@receiver(post_delete, sender=Courses)
+@receiver(post_delete, sender=Branches)
+@receiver(post_delete, sender=EducationCentres)
+def update_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_stats_keys', {})
+    for field, kind in STATS_KEYS[sender].items():
+        stats.schedule_refresh(kind, getattr(instance, field))
+        if previous.get(field) not in (None, getattr(instance, field)):
+            stats.schedule_refresh(kind, previous[field])
+    if sender is EducationCentres:
+        stats.schedule_refresh('education_centre', instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def create_category_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.schedule_refresh('category', instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Skills)
+@receiver(post_save, sender=EducationCentres)
+@receiver(post_save, sender=Branches)
+@receiver(post_save, sender=Courses)
+def log_upsert(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Skills)
+@receiver(post_delete, sender=EducationCentres)
+@receiver(post_delete, sender=Branches)
+@receiver(post_delete, sender=Courses)
+def log_delete(sender, instance, **kwargs):
+    changes.record(sender, [instance.pk], op=ChangeLog.DELETE)
+
+
+@receiver(m2m_changed, sender=Courses.skills.through)
+@receiver(m2m_changed, sender=EducationCentres.skills.through)
+def log_skills_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            changes.record(type(instance), [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # skill.courses.add(...) / skill.education_centres.remove(...): меняются навыки у переданных объектов
+        changes.record(model, pk_set)
+    elif action == 'pre_clear':
+        # После skill.courses.clear() связей уже не найти — записываем затронутые объекты заранее
+        changes.record(model, model.objects.filter(skills=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Skills)
+def log_skill_delete(sender, instance, **kwargs):
+    # Строки M2M удалятся каскадом без m2m_changed, а курсы и центры потеряют навык
+    for model in (Courses, EducationCentres):
+        changes.record(model, model.objects.filter(skills=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Courses)
+@receiver(post_delete, sender=Courses)
+def invalidate_catalog_snapshot(sender, raw=False, **kwargs):
+    if not raw:
+        snapshot.schedule_stale()
+
+
+@receiver(post_save, sender=Courses)
+@receiver(post_delete, sender=Courses)
+def invalidate_courses_cache(sender, raw=False, **kwargs):
+    if not raw:
+        catalog_cache.schedule_invalidate('courses')
+
+
+@receiver(post_save, sender=EducationCentres)
+@receiver(post_delete, sender=EducationCentres)
+def invalidate_education_centres_cache(sender, raw=False, **kwargs):
+    if not raw:
+        catalog_cache.schedule_invalidate('education-centres')
+
+
+@receiver(m2m_changed, sender=Courses.skills.through)
+@receiver(m2m_changed, sender=EducationCentres.skills.through)
+@receiver(post_delete, sender=Skills)
+def invalidate_skills_in_catalog_cache(sender, action=None, **kwargs):
+    # Удаление навыка каскадно убирает строки M2M без сигнала m2m_changed
+    if action is None or action.startswith('post_'):
+        catalog_cache.schedule_invalidate('courses', 'education-centres')
+
+
+@receiver(post_save, sender=Courses)
+def rebuild_course_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        documents.schedule_rebuild([instance.pk])
+
+
+@receiver(post_save, sender=Courses)
+def index_course_minhash(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'name', 'description'} & set(update_fields)):
+        return
+    duplicates.schedule_index([instance.pk], using=instance._state.db)
+
+
+@receiver(m2m_changed, sender=Courses.skills.through)
+def rebuild_course_documents_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            documents.schedule_rebuild([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        documents.enqueue_rebuild(pk_set)
+    elif action == 'pre_clear':
+        # После clear() связей уже не найти — запоминаем курсы навыка заранее
+        documents.schedule_rebuild_for({'skills': instance.pk})
+
+
+CARD_FIELDS = {
+    Category: (documents.CATEGORY_CARD_FIELDS, 'category_id'),
+    EducationCentres: (documents.EDUCATION_CENTRE_CARD_FIELDS, 'education_centre_id'),
+    Skills: (documents.SKILL_CARD_FIELDS, 'skills'),
+}
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=EducationCentres)
+@receiver(pre_save, sender=Skills)
+def remember_card_fields_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._card_fields_changed = documents.card_fields_changed(instance, CARD_FIELDS[sender][0])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=EducationCentres)
+@receiver(post_save, sender=Skills)
+def rebuild_related_course_documents(sender, instance, raw=False, **kwargs):
+    # Переименование категории, центра или навыка меняет карточки всех их курсов
+    if not raw and getattr(instance, '_card_fields_changed', False):
+        documents.schedule_rebuild_for({CARD_FIELDS[sender][1]: instance.pk})
+
+
+@receiver(pre_delete, sender=Skills)
+def rebuild_course_documents_skill_delete(sender, instance, **kwargs):
+    # Строки M2M удалятся каскадом без m2m_changed
+    documents.schedule_rebuild_for({'skills': instance.pk})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Skills)
+@receiver(post_save, sender=EducationCentres)
+def replicate_reference_data(sender, instance, using, **kwargs):
+    if sharding.enabled() and using == 'default':
+        sharding.schedule(sharding.replicate, sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Skills)
+@receiver(post_delete, sender=EducationCentres)
+def replicate_reference_delete(sender, instance, using, **kwargs):
+    if sharding.enabled() and using == 'default':
+        sharding.schedule(sharding.replicate_delete, sender, instance.pk)
+
+
+@receiver(m2m_changed, sender=EducationCentres.skills.through)
+def replicate_education_centre_skills(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if not sharding.enabled() or using != 'default' or not action.startswith('post_'):
+        return
+    if not reverse:
+        sharding.schedule(sharding.replicate_m2m, sender, 'educationcentres_id', instance.pk)
+    elif pk_set is None:
+        sharding.schedule(sharding.replicate_m2m, sender, 'skills_id', instance.pk)
+    else:
+        for education_centre_id in pk_set:
+            sharding.schedule(sharding.replicate_m2m, sender, 'educationcentres_id', education_centre_id)
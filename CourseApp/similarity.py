@@ -0,0 +1,225 @@
+"""
+Похожие курсы: взвешенная схожесть по навыкам, категории, ценовому диапазону и формату обучения.
+
+Матрица «курс × навык» сильно разреженная, поэтому вместо плотных векторов используется
+инвертированный индекс навык -> курсы: пересечения навыков для строки курса считаются
+обходом только ненулевых элементов (то же, что строка произведения A·Aᵀ для разреженной A).
+Полный пересчёт (rebuild_all) работает в памяти, инкрементальный (update_course) —
+через выборки по индексированным FK, не трогая остальной каталог.
+
+Сигналы не пересчитывают соседей в запросе, а ставят задачи в очередь (CourseApp/tasks.py,
+manage.py run_tasks) в той же транзакции, что и изменение курса; пачка задач пересчитывает
+каждый курс один раз.
+
+Миграция 0007 только создаёт таблицу: после неё выполните manage.py rebuild_similar_courses.
+До этого /courses/{id}/similar/ у существующих курсов пуст.
+"""
+from bisect import bisect_right
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from CourseApp import tasks
+from CourseApp.models import CourseSimilarity, Courses
+
+SkillsThrough = Courses.skills.through
+
+FEATURE_FIELDS = ('pk', 'category_id', 'price_month', 'education_type')
+
+
+def enabled():
+    return settings.SIMILAR_COURSES_ENABLED
+
+
+def price_band(price):
+    return bisect_right(settings.SIMILAR_COURSES_PRICE_BANDS, price)
+
+
+class CourseFeatures:
+    __slots__ = ('pk', 'category_id', 'price_band', 'education_type', 'skills')
+
+    def __init__(self, pk, category_id, price_month, education_type, skills=()):
+        self.pk = pk
+        self.category_id = category_id
+        self.price_band = price_band(price_month)
+        self.education_type = education_type
+        self.skills = frozenset(skills)
+
+
+def score(a, b, overlap=None):
+    """Взвешенная схожесть двух курсов в диапазоне [0, 1]."""
+    weights = settings.SIMILAR_COURSES_WEIGHTS
+    if overlap is None:
+        overlap = len(a.skills & b.skills)
+    union = len(a.skills) + len(b.skills) - overlap
+    result = weights['skills'] * (overlap / union if union else 0.0)
+    result += weights['category'] * (a.category_id == b.category_id)
+    result += weights['price_band'] * (a.price_band == b.price_band)
+    result += weights['education_type'] * (a.education_type == b.education_type)
+    return result
+
+
+def _ranked(course, candidates, overlaps):
+    scored = [
+        (score(course, other, overlaps.get(other.pk, 0)), other.pk)
+        for other in candidates if other.pk != course.pk
+    ]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored
+
+
+def rebuild_all(batch_size=1000):
+    """Полный пересчёт таблицы CourseSimilarity. Возвращает количество записей."""
+    top_k = settings.SIMILAR_COURSES_TOP_K
+    skills = defaultdict(set)
+    for course_id, skill_id in SkillsThrough.objects.values_list('courses_id', 'skills_id').iterator():
+        skills[course_id].add(skill_id)
+
+    courses = {
+        row[0]: CourseFeatures(*row, skills=skills.get(row[0], ()))
+        for row in Courses.objects.order_by('pk').values_list(*FEATURE_FIELDS).iterator()
+    }
+    postings = defaultdict(list)
+    by_category = defaultdict(list)
+    for course in courses.values():
+        for skill_id in course.skills:
+            postings[skill_id].append(course.pk)
+        by_category[course.category_id].append(course.pk)
+
+    rows = []
+    for course in courses.values():
+        overlaps = Counter()
+        for skill_id in course.skills:
+            overlaps.update(postings[skill_id])
+        candidate_ids = set(overlaps)
+        # Курсы без общих навыков добираем из своей категории
+        candidate_ids.update(by_category[course.category_id][:top_k + 1])
+        candidates = [courses[pk] for pk in candidate_ids]
+        rows.extend(
+            CourseSimilarity(course_id=course.pk, similar_id=similar_id, score=value)
+            for value, similar_id in _ranked(course, candidates, overlaps)[:top_k]
+        )
+
+    with transaction.atomic():
+        CourseSimilarity.objects.all().delete()
+        CourseSimilarity.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _load_features(course_ids):
+    skills = defaultdict(set)
+    for course_id, skill_id in SkillsThrough.objects.filter(courses_id__in=course_ids) \
+            .values_list('courses_id', 'skills_id'):
+        skills[course_id].add(skill_id)
+    return {
+        row[0]: CourseFeatures(*row, skills=skills.get(row[0], ()))
+        for row in Courses.objects.filter(pk__in=course_ids).values_list(*FEATURE_FIELDS)
+    }
+
+
+def _score_candidates(course):
+    """Оценки всех кандидатов для одного курса через выборки из БД (строка разреженного произведения)."""
+    top_k = settings.SIMILAR_COURSES_TOP_K
+    overlaps = dict(
+        SkillsThrough.objects.filter(skills_id__in=course.skills)
+        .exclude(courses_id=course.pk)
+        .values('courses_id').annotate(n=Count('id')).values_list('courses_id', 'n')
+    )
+    candidate_ids = set(overlaps)
+    candidate_ids.update(
+        Courses.objects.filter(category_id=course.category_id).order_by('pk').values_list('pk', flat=True)[:top_k + 1]
+    )
+    candidate_ids.discard(course.pk)
+    candidates = _load_features(candidate_ids).values()
+    return _ranked(course, candidates, overlaps)
+
+
+def _neighbours(course):
+    return _score_candidates(course)[:settings.SIMILAR_COURSES_TOP_K]
+
+
+def _store(course_id, neighbours):
+    CourseSimilarity.objects.filter(course_id=course_id).delete()
+    CourseSimilarity.objects.bulk_create(
+        CourseSimilarity(course_id=course_id, similar_id=similar_id, score=value)
+        for value, similar_id in neighbours
+    )
+
+
+def update_course(course_id):
+    """
+    Инкрементальное обновление после изменения одного курса: пересчитываются его соседи,
+    а в списках затронутых курсов он добавляется, вытесняя худшего, или список пересчитывается.
+    """
+    course = _load_features([course_id]).get(course_id)
+    top_k = settings.SIMILAR_COURSES_TOP_K
+    with transaction.atomic():
+        if course is None:
+            affected = set(
+                CourseSimilarity.objects.filter(similar_id=course_id).values_list('course_id', flat=True)
+            )
+            CourseSimilarity.objects.filter(course_id=course_id).delete()
+            new_scores = {}
+        else:
+            scored = _score_candidates(course)
+            _store(course_id, scored[:top_k])
+            new_scores = {similar_id: value for value, similar_id in scored}
+            # Курсы, где этот курс уже был в списке, плюс все его кандидаты (схожесть симметрична)
+            affected = set(
+                CourseSimilarity.objects.filter(similar_id=course_id).values_list('course_id', flat=True)
+            ) | set(new_scores)
+
+        current = defaultdict(dict)
+        for owner_id, similar_id, value in CourseSimilarity.objects.filter(course_id__in=affected) \
+                .values_list('course_id', 'similar_id', 'score'):
+            current[owner_id][similar_id] = value
+
+        for owner_id in affected:
+            entries = current[owner_id]
+            old_value = entries.get(course_id)
+            new_value = new_scores.get(owner_id)
+            if old_value is not None and (new_value is None or new_value < old_value):
+                # Курс опустился в чужом списке: на его место мог подняться кто-то другой
+                owner = _load_features([owner_id]).get(owner_id)
+                if owner is not None:
+                    _store(owner_id, _neighbours(owner))
+            elif new_value is not None:
+                entries[course_id] = new_value
+                ranked = sorted(entries.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+                if course_id in dict(ranked):
+                    _store(owner_id, [(value, similar_id) for similar_id, value in ranked])
+
+
+@tasks.task('update_similar_courses', batch=True)
+def run_updates(payloads):
+    for course_id in sorted({course_id for payload in payloads for course_id in payload['course_ids']}):
+        update_course(course_id)
+
+
+@tasks.task('refresh_similar_courses', batch=True)
+def run_refreshes(payloads):
+    """Полный пересчёт списков соседей у переданных курсов (после удаления одного из соседей)."""
+    owner_ids = {course_id for payload in payloads for course_id in payload['course_ids']}
+    for owner in _load_features(owner_ids).values():
+        with transaction.atomic():
+            _store(owner.pk, _neighbours(owner))
+
+
+def schedule_update(course_ids):
+    """Одна задача на набор курсов (сигнал одного курса или пачка массового UPDATE в админке)."""
+    if not enabled():
+        return
+    course_ids = list(course_ids)
+    if course_ids:
+        tasks.enqueue('update_similar_courses', course_ids=course_ids)
+
+
+def schedule_delete(course_id):
+    """Вызывается до удаления курса: после CASCADE ссылки на него уже не найти."""
+    if not enabled():
+        return
+    affected = list(CourseSimilarity.objects.filter(similar_id=course_id).values_list('course_id', flat=True))
+    if affected:
+        tasks.enqueue('refresh_similar_courses', course_ids=affected)
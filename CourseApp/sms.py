@@ -0,0 +1,29 @@
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class FakeSMSProvider:
+    """
+    Локальный SMS-провайдер для разработки и тестов: ничего не отправляет, а складывает
+    сообщения в FakeSMSProvider.outbox и, если задан SMS_FAKE_OUTBOX_FILE, дописывает их в файл (JSON Lines).
+    В памяти держатся только последние SMS_FAKE_OUTBOX_SIZE сообщений: воркер живёт долго.
+    """
+    outbox = deque(maxlen=settings.SMS_FAKE_OUTBOX_SIZE)
+    _lock = threading.Lock()
+
+    def send_many(self, messages):
+        """messages — список словарей {"phone_number": ..., "text": ...}."""
+        with self._lock:
+            self.outbox.extend(messages)
+            if settings.SMS_FAKE_OUTBOX_FILE:
+                with open(settings.SMS_FAKE_OUTBOX_FILE, 'a', encoding='utf-8') as f:
+                    for message in messages:
+                        f.write(json.dumps(message, ensure_ascii=False) + '\n')
+
+
+def get_sms_provider():
+    return import_string(settings.SMS_PROVIDER)()
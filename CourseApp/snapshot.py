@@ -0,0 +1,328 @@
+"""
+Колоночный снимок курсов для фильтрации и сортировки без обращения к БД.
+
+Снимок — набор .npy-файлов (по одному на столбец) в каталоге поколения
+CATALOG_SNAPSHOT_DIR/gen-<N>/. Воркеры открывают их через np.load(mmap_mode='r'),
+поэтому все процессы делят одни и те же страницы памяти. Новое поколение пишется
+рядом и публикуется атомарной заменой файла CURRENT; читатели подхватывают его
+при следующей проверке.
+
+Фильтры, сортировка и пагинация выполняются векторными масками NumPy, из БД затем
+выбирается только страница по первичным ключам. Всё, что снимок не умеет
+(поиск, неизвестные параметры), а также устаревший снимок — уходит в ORM.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from CourseApp.models import Courses
+
+EDUCATION_TYPE_CODES = {value: code for code, (value, label) in enumerate(Courses.EDUCATION_TYPES)}
+
+# столбец -> (поле модели, dtype)
+COLUMNS = {
+    'id': ('pk', 'int64'),
+    'category': ('category_id', 'int64'),
+    'education_centre': ('education_centre_id', 'int64'),
+    'price_month': ('price_month', 'int64'),
+    'full_price': ('full_price', 'int64'),
+    'discount': ('discount', 'int64'),
+    'price_month_effective': ('price_month_effective', 'int64'),
+    'full_price_effective': ('full_price_effective', 'int64'),
+    'duration': ('duration', 'int64'),
+    'rate': ('rate', 'float64'),
+    'education_type': ('education_type', 'int8'),
+    'created_at': ('created_at', 'int64'),
+    'updated_at': ('updated_at', 'int64'),
+}
+
+# Параметры фильтрации CoursesViewSet.filterset_fields, которые умеет снимок: параметр -> (столбец, операция)
+FILTERS = {
+    'category': ('category', 'exact'),
+    'education_centre': ('education_centre', 'exact'),
+    'price_month': ('price_month', 'exact'),
+    'education_type': ('education_type', 'exact'),
+    'price_month_effective': ('price_month_effective', 'exact'),
+    'price_month_effective__gte': ('price_month_effective', 'gte'),
+    'price_month_effective__lte': ('price_month_effective', 'lte'),
+    'full_price_effective': ('full_price_effective', 'exact'),
+    'full_price_effective__gte': ('full_price_effective', 'gte'),
+    'full_price_effective__lte': ('full_price_effective', 'lte'),
+}
+
+# Поля ?ordering=, для которых есть столбец; name сортируется по заранее посчитанному рангу
+ORDERING_COLUMNS = {name: name for name in COLUMNS if name != 'education_type'}
+ORDERING_COLUMNS['name'] = 'name_rank'
+ORDERING_COLUMNS['education_type'] = 'education_type_rank'
+
+# Параметры, не влияющие на выборку
+IGNORED_PARAMS = {'format', 'page', 'page_size', 'limit', 'offset'}
+
+
+def _snapshot_dir():
+    return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def _epoch_us(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def build():
+    """Строит новое поколение снимка и публикует его. Возвращает имя поколения."""
+    started = time.time()
+    root = _snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+
+    fields = [field for field, dtype in COLUMNS.values()]
+    values = {name: [] for name in COLUMNS}
+    names = []
+    for row in Courses.objects.order_by('pk').values_list(*fields, 'name_sort').iterator(chunk_size=10000):
+        for (name, (field, dtype)), value in zip(COLUMNS.items(), row):
+            if name == 'education_type':
+                value = EDUCATION_TYPE_CODES.get(value, -1)
+            elif name in ('created_at', 'updated_at'):
+                value = _epoch_us(value)
+            elif name == 'rate':
+                value = float(value)
+            values[name].append(value)
+        names.append(row[-1])
+
+    arrays = {name: np.array(values[name], dtype=COLUMNS[name][1]) for name in COLUMNS}
+    # Ранги повторяют порядок ?ordering=name в БД: по ключу name_sort (CourseApp/ordering.py)
+    arrays['name_rank'] = _rank(names)
+    arrays['education_type_rank'] = _rank(
+        [Courses.EDUCATION_TYPES[code][0] if code >= 0 else '' for code in arrays['education_type']]
+    )
+
+    generation = f"gen-{int(started * 1000)}-{os.getpid()}"
+    tmp_dir = root / f".{generation}.tmp"
+    tmp_dir.mkdir()
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", array)
+    (tmp_dir / 'meta.json').write_text(json.dumps({'built_at': started, 'rows': len(names)}))
+    os.rename(tmp_dir, root / generation)
+
+    current_tmp = root / f".CURRENT.{os.getpid()}"
+    current_tmp.write_text(generation)
+    os.replace(current_tmp, root / 'CURRENT')
+    _remove_old_generations(root, keep=generation)
+    return generation
+
+
+def _rank(values):
+    # Плотный ранг: равные строки получают равный ранг, чтобы работала сортировка по второму полю
+    rank_of = {value: rank for rank, value in enumerate(sorted(set(values)))}
+    return np.array([rank_of[value] for value in values], dtype='int64')
+
+
+def _remove_old_generations(root, keep):
+    # Уже отображённые в память файлы остаются доступны воркерам и после удаления
+    generations = sorted(p for p in root.glob('gen-*') if p.name != keep)
+    for path in generations[:-1]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class Snapshot:
+    def __init__(self, path):
+        meta = json.loads((path / 'meta.json').read_text())
+        self.generation = path.name
+        self.built_at = meta['built_at']
+        self.columns = {p.stem: np.load(p, mmap_mode='r') for p in path.glob('*.npy')}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def query(self, params):
+        """id курсов для параметров запроса или None, если запрос снимку не по силам."""
+        mask = np.ones(len(self), dtype=bool)
+        ordering = None
+        for param in params:
+            value = params.get(param)
+            if param in IGNORED_PARAMS or value == '':
+                continue
+            if param == 'ordering':
+                ordering = value
+                continue
+            if param not in FILTERS:
+                return None
+            column, operation = FILTERS[param]
+            if column == 'education_type':
+                if value not in EDUCATION_TYPE_CODES:
+                    return None
+                value = EDUCATION_TYPE_CODES[value]
+            else:
+                try:
+                    value = int(value)
+                except ValueError:
+                    # Ошибку валидации вернёт django-filter
+                    return None
+            data = self.columns[column]
+            if operation == 'exact':
+                mask &= data == value
+            elif operation == 'gte':
+                mask &= data >= value
+            else:
+                mask &= data <= value
+
+        index = np.flatnonzero(mask)
+        if ordering:
+            keys = []
+            id_descending = None
+            for field in ordering.split(','):
+                field = field.strip()
+                descending = field.startswith('-')
+                column = ORDERING_COLUMNS.get(field.lstrip('-'))
+                if column is None:
+                    return None
+                data = self.columns[column][index]
+                keys.append(-data if descending else data)
+                if column == 'name_rank' and id_descending is None:
+                    # Как CollationOrderingFilter: id в том же направлении, что и name
+                    id_descending = descending
+            if id_descending:
+                keys.append(-self.columns['id'][index])
+            # lexsort сортирует по последнему ключу в первую очередь и устойчиво: при равенстве — по id
+            index = index[np.lexsort(keys[::-1])]
+        return self.columns['id'][index]
+
+
+_current = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _read_current_name(root):
+    try:
+        return (root / 'CURRENT').read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _stale_marker_time(root):
+    try:
+        return os.stat(root / 'STALE').st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def get_snapshot():
+    """Актуальный снимок процесса или None (снимок выключен, не построен или устарел)."""
+    global _current, _checked_at
+    if np is None or not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+
+    root = _snapshot_dir()
+    now = time.monotonic()
+    if now - _checked_at > settings.CATALOG_SNAPSHOT_CHECK_INTERVAL:
+        with _lock:
+            _checked_at = now
+            name = _read_current_name(root)
+            if name and (_current is None or _current.generation != name):
+                try:
+                    _current = Snapshot(root / name)
+                except FileNotFoundError:
+                    _current = None
+
+    snapshot = _current
+    if snapshot is None or _stale_marker_time(root) >= snapshot.built_at:
+        return None
+    return snapshot
+
+
+def query_course_ids(params):
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    return snapshot.query(params)
+
+
+def mark_stale():
+    """Помечает снимок устаревшим (до публикации нового поколения запросы идут в ORM)."""
+    if np is None or not settings.CATALOG_SNAPSHOT_ENABLED:
+        return
+    root = _snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    (root / 'STALE').touch()
+    if settings.CATALOG_SNAPSHOT_AUTO_REBUILD:
+        _request_rebuild()
+
+
+# Одна фоновая перестройка на процесс: изменения во время неё только ставят флаг повтора
+_rebuild_lock = threading.Lock()
+_rebuild_running = False
+_rebuild_pending = False
+
+
+def _request_rebuild():
+    global _rebuild_running, _rebuild_pending
+    with _rebuild_lock:
+        if _rebuild_running:
+            _rebuild_pending = True
+            return
+        _rebuild_running = True
+    threading.Thread(target=_rebuild_in_background, daemon=True).start()
+
+
+def rebuild_locked():
+    """Перестраивает снимок, если его уже не перестраивает другой процесс. Возвращает имя поколения или None."""
+    root = _snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / 'build.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        return build()
+
+
+def _rebuild_in_background():
+    global _rebuild_running, _rebuild_pending
+    try:
+        while True:
+            # Небольшая пауза схлопывает серию изменений в одну перестройку
+            time.sleep(settings.CATALOG_SNAPSHOT_REBUILD_DELAY)
+            with _rebuild_lock:
+                _rebuild_pending = False
+            # Если снимок сейчас строит другой процесс, он мог начать до нашего изменения — ждём и проверяем снова
+            for _ in range(settings.CATALOG_SNAPSHOT_REBUILD_ATTEMPTS):
+                if _stale_marker_time(_snapshot_dir()) < _built_at_on_disk():
+                    break
+                if rebuild_locked() is None:
+                    time.sleep(settings.CATALOG_SNAPSHOT_REBUILD_DELAY)
+            with _rebuild_lock:
+                if not _rebuild_pending:
+                    _rebuild_running = False
+                    return
+    except BaseException:
+        with _rebuild_lock:
+            _rebuild_running = False
+        raise
+    finally:
+        connection.close()
+
+
+def _built_at_on_disk():
+    root = _snapshot_dir()
+    name = _read_current_name(root)
+    if not name:
+        return 0.0
+    try:
+        return json.loads((root / name / 'meta.json').read_text())['built_at']
+    except FileNotFoundError:
+        return 0.0
+
+
+def schedule_stale():
+    transaction.on_commit(mark_stale)
@@ -0,0 +1,170 @@
+"""
+Агрегаты для страниц категорий и учебных центров (CategoryStats, EducationCentreStats).
+
+Сигналы не пересчитывают всё, а помечают затронутые категории/центры; после коммита
+транзакции каждый помеченный ключ пересчитывается один раз выборкой по индексированному FK.
+Полная перестройка — rebuild_all() (manage.py rebuild_stats),
+проверка согласованности — find_inconsistencies() (manage.py check_stats).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+
+from CourseApp.models import Branches, Category, CategoryStats, Courses, EducationCentres, EducationCentreStats
+
+RATE_QUANT = Decimal('0.01')
+
+
+def enabled():
+    return settings.STATS_ENABLED
+
+
+def _round_rate(value):
+    return None if value is None else Decimal(value).quantize(RATE_QUANT)
+
+
+def compute_category(category_id):
+    values = Courses.objects.filter(category_id=category_id).aggregate(
+        courses_count=Count('pk'),
+        price_min=Min('price_month_effective'),
+        price_max=Max('price_month_effective'),
+        rate_avg=Avg('rate'),
+    )
+    values['rate_avg'] = _round_rate(values['rate_avg'])
+    values['education_centres_count'] = EducationCentres.objects.filter(category_id=category_id).count()
+    return values
+
+
+def compute_education_centre(education_centre_id):
+    values = Courses.objects.filter(education_centre_id=education_centre_id).aggregate(
+        courses_count=Count('pk'),
+        price_min=Min('price_month_effective'),
+        price_max=Max('price_month_effective'),
+    )
+    values['branches_count'] = Branches.objects.filter(education_centre_id=education_centre_id).count()
+    return values
+
+
+def refresh_category(category_id):
+    if not Category.objects.filter(pk=category_id).exists():
+        CategoryStats.objects.filter(pk=category_id).delete()
+        return None
+    stats, _ = CategoryStats.objects.update_or_create(
+        category_id=category_id, defaults=compute_category(category_id)
+    )
+    return stats
+
+
+def refresh_education_centre(education_centre_id):
+    if not EducationCentres.objects.filter(pk=education_centre_id).exists():
+        EducationCentreStats.objects.filter(pk=education_centre_id).delete()
+        return None
+    stats, _ = EducationCentreStats.objects.update_or_create(
+        education_centre_id=education_centre_id, defaults=compute_education_centre(education_centre_id)
+    )
+    return stats
+
+
+REFRESHERS = {
+    'category': refresh_category,
+    'education_centre': refresh_education_centre,
+}
+
+
+def _flush_pending():
+    connection = transaction.get_connection()
+    pending, connection.stats_pending = getattr(connection, 'stats_pending', set()), set()
+    for kind, pk in sorted(pending):
+        REFRESHERS[kind](pk)
+
+
+def schedule_refresh(kind, pk):
+    """
+    Помечает агрегат для пересчёта после коммита; повторные пометки в одной транзакции схлопываются:
+    callback ставится на каждую пометку (его может отменить откат точки сохранения), но всё
+    накопленное пересчитывает первый же из них, остальные находят пустое множество.
+    Пометки из откаченной части пересчитываются вместе с остальными — пересчёт идемпотентен.
+    """
+    if pk is None or not enabled():
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        REFRESHERS[kind](pk)
+        return
+
+    if not hasattr(connection, 'stats_pending'):
+        connection.stats_pending = set()
+    connection.stats_pending.add((kind, pk))
+    transaction.on_commit(_flush_pending)
+
+
+def _expected_category_stats():
+    expected = {pk: {
+        'courses_count': 0, 'education_centres_count': 0, 'price_min': None, 'price_max': None, 'rate_avg': None,
+    } for pk in Category.objects.values_list('pk', flat=True)}
+    for row in Courses.objects.values('category_id').annotate(
+            courses_count=Count('pk'), price_min=Min('price_month_effective'),
+            price_max=Max('price_month_effective'), rate_avg=Avg('rate')).order_by():
+        expected[row.pop('category_id')].update(row, rate_avg=_round_rate(row['rate_avg']))
+    for category_id, count in EducationCentres.objects.values_list('category_id') \
+            .annotate(count=Count('pk')).order_by():
+        expected[category_id]['education_centres_count'] = count
+    return expected
+
+
+def _expected_education_centre_stats():
+    expected = {pk: {
+        'courses_count': 0, 'branches_count': 0, 'price_min': None, 'price_max': None,
+    } for pk in EducationCentres.objects.values_list('pk', flat=True)}
+    for row in Courses.objects.values('education_centre_id').annotate(
+            courses_count=Count('pk'), price_min=Min('price_month_effective'),
+            price_max=Max('price_month_effective')).order_by():
+        expected[row.pop('education_centre_id')].update(row)
+    for centre_id, count in Branches.objects.values_list('education_centre_id') \
+            .annotate(count=Count('pk')).order_by():
+        expected[centre_id]['branches_count'] = count
+    return expected
+
+
+def rebuild_all():
+    """Полностью пересобирает обе таблицы агрегатов сгруппированными запросами."""
+    categories = _expected_category_stats()
+    centres = _expected_education_centre_stats()
+    with transaction.atomic():
+        CategoryStats.objects.all().delete()
+        CategoryStats.objects.bulk_create(
+            CategoryStats(category_id=pk, **values) for pk, values in categories.items()
+        )
+        EducationCentreStats.objects.all().delete()
+        EducationCentreStats.objects.bulk_create(
+            EducationCentreStats(education_centre_id=pk, **values) for pk, values in centres.items()
+        )
+    return len(categories), len(centres)
+
+
+def _diff(model, expected, fields):
+    stored = {row.pop('pk'): row for row in model.objects.values('pk', *fields)}
+    problems = []
+    for pk, values in expected.items():
+        if pk not in stored:
+            problems.append((model.__name__, pk, 'отсутствует'))
+        elif stored[pk] != values:
+            changed = ', '.join(
+                f"{field}: {stored[pk][field]} != {values[field]}"
+                for field in fields if stored[pk][field] != values[field]
+            )
+            problems.append((model.__name__, pk, changed))
+    problems.extend((model.__name__, pk, 'лишняя запись') for pk in stored.keys() - expected.keys())
+    return problems
+
+
+def find_inconsistencies():
+    """Сравнивает сохранённые агрегаты с пересчитанными. Возвращает [(модель, pk, описание)]."""
+    category_fields = ['courses_count', 'education_centres_count', 'price_min', 'price_max', 'rate_avg']
+    centre_fields = ['courses_count', 'branches_count', 'price_min', 'price_max']
+    return (
+        _diff(CategoryStats, _expected_category_stats(), category_fields)
+        + _diff(EducationCentreStats, _expected_education_centre_stats(), centre_fields)
+    )
@@ -0,0 +1,135 @@
+"""
+Фоновые задачи на базе таблицы Task.
+
+Запрос только ставит задачу: enqueue() пишет строку в ту же транзакцию, что и бизнес-данные,
+поэтому задача появляется ровно тогда, когда закоммичены данные (transactional outbox).
+Воркеры (manage.py run_tasks) забирают задачи пачками, выполняют, при ошибке
+откладывают с экспоненциальной задержкой, а после TASK_MAX_ATTEMPTS помечают как dead.
+"""
+import random
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from CourseApp.models import Task
+from CourseApp.sms import get_sms_provider
+
+# name -> (функция, принимает ли пачку payload'ов)
+TASKS = {}
+
+
+def task(name, batch=False):
+    """Регистрирует обработчик. При batch=True он получает список payload'ов задач одной пачки."""
+    def decorator(func):
+        TASKS[name] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, **payload):
+    if name not in TASKS:
+        raise ValueError(f"Неизвестная задача: {name}")
+    return Task.objects.create(name=name, payload=payload, max_attempts=settings.TASK_MAX_ATTEMPTS)
+
+
+def claim(batch_size=None):
+    """
+    Забирает пачку готовых задач. Строки помечаются уникальным токеном одним UPDATE с условием
+    на статус, поэтому два воркера никогда не получат одну задачу (работает и на SQLite без SELECT FOR UPDATE).
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ready = Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    ids = list(
+        Task.objects.filter(ready).order_by('run_at').values_list('pk', flat=True)[:batch_size or settings.TASK_BATCH_SIZE]
+    )
+    if not ids:
+        return []
+    Task.objects.filter(ready, pk__in=ids).update(
+        status=Task.RUNNING,
+        claimed_by=token,
+        locked_until=now + timedelta(seconds=settings.TASK_LEASE),
+        attempts=F('attempts') + 1,
+    )
+    return list(Task.objects.filter(claimed_by=token, status=Task.RUNNING))
+
+
+def backoff(attempt):
+    delay = min(settings.TASK_BACKOFF_BASE * 2 ** (attempt - 1), settings.TASK_BACKOFF_MAX)
+    # Разброс, чтобы повторы после сбоя провайдера не приходили одной волной
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(tasks, error=None):
+    now = timezone.now()
+    if error is None:
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+            status=Task.DONE, claimed_by=None, locked_until=None, last_error=''
+        )
+        return
+
+    for t in tasks:
+        t.claimed_by = None
+        t.locked_until = None
+        t.last_error = error
+        if t.attempts >= t.max_attempts:
+            t.status = Task.DEAD
+        else:
+            t.status = Task.PENDING
+            t.run_at = now + timedelta(seconds=backoff(t.attempts))
+    Task.objects.bulk_update(tasks, ['status', 'run_at', 'claimed_by', 'locked_until', 'last_error', 'updated_at'])
+
+
+def run_batch(tasks):
+    """Выполняет пачку задач. Возвращает (успешных, неуспешных)."""
+    groups = defaultdict(list)
+    for t in tasks:
+        groups[t.name].append(t)
+
+    succeeded = failed = 0
+    for name, group in groups.items():
+        if name not in TASKS:
+            _finish(group, error=f"Неизвестная задача: {name}")
+            failed += len(group)
+            continue
+        func, batch = TASKS[name]
+        calls = [group] if batch else [[t] for t in group]
+        for call in calls:
+            try:
+                if batch:
+                    func([t.payload for t in call])
+                else:
+                    func(**call[0].payload)
+            except Exception:
+                _finish(call, error=traceback.format_exc(limit=5))
+                failed += len(call)
+            else:
+                _finish(call)
+                succeeded += len(call)
+    return succeeded, failed
+
+
+def run_once(batch_size=None):
+    tasks = claim(batch_size)
+    if not tasks:
+        return 0, 0
+    return run_batch(tasks)
+
+
+def requeue_dead():
+    return Task.objects.filter(status=Task.DEAD).update(status=Task.PENDING, attempts=0, run_at=timezone.now())
+
+
+@task('send_sms')
+def send_sms(phone_number, text):
+    # По одной задаче на SMS: при ошибке повторяется только она, уже доставленные не отправляются снова
+    get_sms_provider().send_many([{'phone_number': phone_number, 'text': text}])
+
+
+def enqueue_sms(phone_number, text):
+    return enqueue('send_sms', phone_number=phone_number, text=text)
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.db import connection, connections
+from django.db.models.signals import pre_save
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from CourseApp import changes, deadline, idempotency, querylog, sharding, snapshot
+from CourseApp.autocomplete import PrefixIndex
+from CourseApp.compiled import compile_serializer
+from CourseApp.models import Branches, Category, ChangeLog, CourseDocument, Courses, CustomUser, EducationCentres, \
+    IdempotencyKey, Skills
+from CourseApp.serializers import BranchesSerializer, CategorySerializer, CategoryStatsSerializer, \
+    CoursesSerializer, EducationCentresSerializer, SkillSerializer
+from CourseApp.text import sort_key
+
+LIST_SERIALIZERS = [CategorySerializer, SkillSerializer, EducationCentresSerializer, BranchesSerializer,
+                    CoursesSerializer]
+
+TEXT_ALPHABET = 'abcXYZ 019_-/\'"\\<>&абвЖЩʼ😀\n\t'
+
+
+class CompiledSerializerEquivalenceTest(TestCase):
+    """Скомпилированный сериализатор даёт тот же JSON, что и ModelSerializer, на случайных данных."""
+
+    EXAMPLES = 25
+
+    def _text(self, rnd, max_length=40):
+        return ''.join(rnd.choice(TEXT_ALPHABET) for _ in range(rnd.randint(0, max_length)))
+
+    def _image(self, rnd):
+        return rnd.choice([None, '', f'courses/{self._text(rnd, 12).strip() or "x"}.{rnd.randint(0, 9)}.png'])
+
+    def _datetime(self, rnd):
+        return timezone.now() - timedelta(seconds=rnd.randint(0, 10 ** 9), microseconds=rnd.randint(0, 999999))
+
+    def _populate(self, rnd):
+        categories = [Category.objects.create(name=self._text(rnd)) for _ in range(rnd.randint(1, 3))]
+        skills = [Skills.objects.create(name=self._text(rnd), category=rnd.choice(categories))
+                  for _ in range(rnd.randint(0, 6))]
+        centres = []
+        for _ in range(rnd.randint(1, 3)):
+            centre = EducationCentres.objects.create(
+                name=self._text(rnd), category=rnd.choice(categories), logo=self._image(rnd),
+                header_image=self._image(rnd), rate=Decimal(rnd.randint(0, 99999)) / 100,
+                rate_count=rnd.randint(-5, 10 ** 6), description=self._text(rnd, 200),
+                graduates=rnd.randint(0, 10 ** 6), experience=rnd.randint(0, 50), employees=rnd.randint(0, 500),
+            )
+            centre.skills.set(rnd.sample(skills, rnd.randint(0, len(skills))))
+            centres.append(centre)
+        for _ in range(rnd.randint(0, 4)):
+            Branches.objects.create(
+                name=self._text(rnd), address=self._text(rnd), education_centre=rnd.choice(centres),
+                longitude=rnd.uniform(-180, 180), latitude=rnd.choice([0.0, -0.0, 1e-7, rnd.uniform(-90, 90)]),
+            )
+        for _ in range(rnd.randint(0, 8)):
+            course = Courses.objects.create(
+                name=self._text(rnd), duration=rnd.randint(0, 1000), rate=Decimal(rnd.randint(0, 99999)) / 100,
+                price_month=rnd.randint(0, 10 ** 9), full_price=rnd.randint(0, 10 ** 10),
+                discount=rnd.randint(0, 100), description=self._text(rnd, 200), image_one=self._image(rnd),
+                image_two=self._image(rnd), education_type=rnd.choice(['online', 'offline', 'hybrid']),
+                category=rnd.choice(categories), education_centre=rnd.choice(centres),
+            )
+            # Навыки добавляются по одному в случайном порядке
+            for skill in rnd.sample(skills, rnd.randint(0, len(skills))):
+                course.skills.add(skill)
+        # Случайные даты создания и изменения (auto_now не даёт задать их через create)
+        for model in (EducationCentres, Branches, Courses):
+            for pk in model.objects.values_list('pk', flat=True):
+                model.objects.filter(pk=pk).update(created_at=self._datetime(rnd), updated_at=self._datetime(rnd))
+
+    def _assert_equivalent(self, context):
+        renderer = JSONRenderer()
+        for serializer_class in LIST_SERIALIZERS:
+            compiled = compile_serializer(serializer_class)
+            self.assertIsNotNone(compiled, serializer_class.__name__)
+            queryset = serializer_class.Meta.model.objects.order_by('pk')
+            expected = renderer.render(serializer_class(queryset, many=True, context=context).data)
+            self.assertEqual(renderer.render(compiled.serialize(queryset, context)), expected,
+                             serializer_class.__name__)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'example.com'])
+    def test_random_data(self):
+        factory = APIRequestFactory()
+        for seed in range(self.EXAMPLES):
+            with self.subTest(seed=seed):
+                rnd = random.Random(seed)
+                self._populate(rnd)
+                host = rnd.choice(['testserver', 'example.com:8080'])
+                request = Request(factory.get('/api/v1/courses/', HTTP_HOST=host, secure=rnd.random() < 0.5))
+                with timezone.override(rnd.choice(['UTC', 'Asia/Tashkent', 'America/St_Johns'])):
+                    self._assert_equivalent({'request': request})
+                self._assert_equivalent({})
+                for model in (Courses, Branches, EducationCentres, Skills, Category):
+                    model.objects.all().delete()
+
+    def test_not_compiled(self):
+        # source через точку — обычный путь
+        self.assertIsNone(compile_serializer(CategoryStatsSerializer))
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], CATALOG_CACHE_ENABLED=False, CATALOG_SNAPSHOT_ENABLED=False)
+    def test_list_endpoints(self):
+        self._populate(random.Random(1000))
+        for url in ('/api/v1/courses/?ordering=-price_month_effective', '/api/v1/education-centres/',
+                    '/api/v1/branches/', '/api/v1/skills/?ordering=name', '/api/v1/categories/'):
+            with self.subTest(url=url):
+                compiled = self.client.get(url)
+                with self.settings(COMPILED_SERIALIZERS_ENABLED=False):
+                    regular = self.client.get(url)
+                self.assertEqual(compiled.status_code, 200)
+                self.assertEqual(compiled.content, regular.content)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], REQUEST_DEADLINE_ENABLED=True)
+class DeadlineBudgetTest(TransactionTestCase):
+    """Срок запроса прерывает только чтение до начала записи."""
+
+    def test_budget_cuts_reads_only_before_first_write(self):
+        category = Category.objects.create(name='c')
+        budget = deadline._StatementBudget(time.monotonic() - 1)
+        try:
+            with connection.execute_wrapper(budget):
+                with self.assertRaises(deadline.DeadlineExceeded):
+                    list(Category.objects.all())
+                Category.objects.filter(pk=category.pk).update(name='d')
+                self.assertFalse(budget.armed)
+                self.assertEqual(Category.objects.get(pk=category.pk).name, 'd')
+        finally:
+            budget.uninstall()
+
+    def test_query_log_explain_keeps_budget_armed(self):
+        Category.objects.create(name='c')
+        budget = deadline._StatementBudget(time.monotonic() + 60)
+        try:
+            # Каждый запрос «медленный»: журнал строит для него EXPLAIN через те же обёртки
+            with self.settings(QUERYLOG_SLOW_MS=0), connection.execute_wrapper(budget), querylog.record('test'):
+                list(Category.objects.all())
+                with connection.cursor() as cursor:
+                    cursor.execute("WITH names AS (SELECT name FROM CourseApp_category) SELECT name FROM names")
+                self.assertTrue(budget.armed)
+                Category.objects.update(name='d')
+                self.assertFalse(budget.armed)
+        finally:
+            budget.uninstall()
+
+    def test_client_deadline_is_capped(self):
+        request = RequestFactory().get('/', HTTP_X_REQUEST_TIMEOUT='100000')
+        with self.settings(REQUEST_MAX_TIMEOUT=5):
+            _, request_deadline = deadline.request_timing(request)
+        self.assertLessEqual(request_deadline - time.monotonic(), 5)
+
+    def test_expired_deadline_does_not_cut_writes_after_create(self):
+        category = Category.objects.create(name='c')
+        centre = EducationCentres.objects.create(name='e', category=category, rate=Decimal('4.00'), description='d',
+                                                 graduates=1, experience=1, employees=1)
+
+        def slow_save(sender, **kwargs):
+            time.sleep(0.3)
+
+        pre_save.connect(slow_save, sender=Courses)
+        try:
+            response = self.client.post('/api/v1/courses/', {
+                'name': 'Курс', 'duration': 3, 'rate': '4.00', 'price_month': 100, 'full_price': 300,
+                'description': 'описание', 'education_type': 'online', 'category': category.pk,
+                'education_centre': centre.pk,
+            }, content_type='application/json', HTTP_X_REQUEST_TIMEOUT='0.2')
+        finally:
+            pre_save.disconnect(slow_save, sender=Courses)
+
+        self.assertEqual(response.status_code, 201)
+        course_id = response.json()['id']
+        self.assertTrue(ChangeLog.objects.filter(model='course', object_id=course_id).exists())
+        self.assertTrue(CourseDocument.objects.filter(course_id=course_id).exists())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ChangeFeedTest(TestCase):
+    """Лента /changes/: страницы по курсору и записи об изменении навыков со стороны навыка."""
+
+    def setUp(self):
+        category = Category.objects.create(name='c')
+        self.skill = Skills.objects.create(name='s', category=category)
+        self.centre = EducationCentres.objects.create(name='e', category=category, rate=Decimal('4.00'),
+                                                      description='d', graduates=1, experience=1, employees=1)
+        self.centre.skills.add(self.skill)
+        self.courses = []
+        for number in range(3):
+            course = Courses.objects.create(
+                name=f'Курс {number}', duration=3, rate=Decimal('4.00'), price_month=100, full_price=300,
+                description='d', education_type='online', category=category, education_centre=self.centre,
+            )
+            course.skills.add(self.skill)
+            self.courses.append(course)
+
+    def _feed(self, since, limit=500):
+        response = self.client.get('/api/v1/changes/', {'since': since, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _upserted(self, since, model):
+        return {change['id'] for change in self._feed(since)['changes']
+                if change['model'] == model and change['op'] == ChangeLog.UPSERT}
+
+    def test_cursor_pages(self):
+        cursor, seen = 0, []
+        while True:
+            page = self._feed(cursor, limit=2)
+            self.assertLessEqual(len(page['changes']), 2)
+            seen.extend(change['cursor'] for change in page['changes'])
+            self.assertGreater(page['cursor'], cursor)
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, sorted(set(seen)))
+        self.assertEqual(cursor, ChangeLog.objects.latest('pk').pk)
+        self.assertEqual(self._feed(cursor)['changes'], [])
+
+        deleted_id = self.courses[1].pk
+        self.courses[0].save()
+        self.courses[1].delete()
+        self.assertEqual(
+            [(change['model'], change['id'], change['op']) for change in self._feed(cursor)['changes']],
+            [('course', self.courses[0].pk, ChangeLog.UPSERT), ('course', deleted_id, ChangeLog.DELETE)],
+        )
+
+    def test_purged_cursor_is_gone(self):
+        self.courses[0].delete()
+        changes.compact(tombstone_days=0)
+        response = self.client.get('/api/v1/changes/', {'since': 1})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self._feed(0)['cursor'], ChangeLog.objects.latest('pk').pk)
+
+    def test_reverse_clear_logs_courses(self):
+        cursor = self._feed(0)['cursor']
+        self.skill.courses.clear()
+        self.assertEqual(self._upserted(cursor, 'course'), {course.pk for course in self.courses})
+
+    def test_skill_delete_logs_courses_and_centres(self):
+        cursor = self._feed(0)['cursor']
+        skill_id = self.skill.pk
+        self.skill.delete()
+        self.assertEqual(self._upserted(cursor, 'course'), {course.pk for course in self.courses})
+        self.assertEqual(self._upserted(cursor, 'education_centre'), {self.centre.pk})
+        self.assertIn({'cursor': ChangeLog.objects.get(model='skill', op=ChangeLog.DELETE).pk, 'model': 'skill',
+                       'id': skill_id, 'op': ChangeLog.DELETE}, self._feed(cursor)['changes'])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BatchTest(TestCase):
+    """Пакет /batch/: ответы подзапросов вставляются структурами."""
+
+    def test_cards_body_is_json(self):
+        category = Category.objects.create(name='c')
+        centre = EducationCentres.objects.create(name='e', category=category, rate=Decimal('4.00'), description='d',
+                                                 graduates=1, experience=1, employees=1)
+        # Карточка пересобирается после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Courses.objects.create(
+                name='Курс', duration=3, rate=Decimal('4.00'), price_month=100, full_price=300, description='d',
+                education_type='online', category=category, education_centre=centre,
+            )
+        response = self.client.post('/api/v1/batch/', {'requests': [
+            {'method': 'GET', 'path': '/api/v1/courses/cards/'},
+            {'method': 'GET', 'path': f'/api/v1/courses/{course.pk}/'},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        cards, detail = response.json()
+        self.assertEqual(cards['status'], 200)
+        self.assertEqual(cards['body'], self.client.get('/api/v1/courses/cards/').json())
+        self.assertEqual([card['name'] for card in cards['body']['results']], ['Курс'])
+        self.assertEqual(detail['body']['name'], 'Курс')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], IDEMPOTENCY_WAIT=0.1)
+class IdempotencyTest(TestCase):
+    """Повторы с Idempotency-Key: сохранённый ответ, другое тело, выполняющийся запрос, 5xx."""
+
+    def _post(self, name, key='key-1'):
+        return self.client.post('/api/v1/categories/', {'name': name}, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response(self):
+        first = self._post('c')
+        second = self._post('c')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, second.content), (201, first.content))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_same_key_with_other_body_runs_view(self):
+        self._post('c')
+        response = self._post('d')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(sorted(Category.objects.values_list('name', flat=True)), ['c', 'd'])
+
+    def test_request_in_progress_gets_409(self):
+        request = RequestFactory().post('/api/v1/categories/', {'name': 'c'}, content_type='application/json',
+                                        HTTP_IDEMPOTENCY_KEY='key-1')
+        request.resolver_match = resolve(request.path)
+        now = timezone.now()
+        # Аренда первого запроса, который ещё выполняется
+        IdempotencyKey.objects.create(key=idempotency.request_key(request), locked_until=now + timedelta(minutes=1),
+                                      expires_at=now + timedelta(hours=1))
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self._post('c')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Category.objects.exists())
+
+    def test_server_error_is_not_stored(self):
+        def fail(sender, **kwargs):
+            raise RuntimeError
+
+        pre_save.connect(fail, sender=Category)
+        self.client.raise_request_exception = False
+        try:
+            with self.assertLogs('django.request', 'ERROR'):
+                self.assertEqual(self._post('c').status_code, 500)
+        finally:
+            pre_save.disconnect(fail, sender=Category)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self._post('c').status_code, 201)
+        self.assertEqual(Category.objects.count(), 1)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CollationOrderingTest(TestCase):
+    """?ordering=name: алфавит с узбекскими буквами, регистр, пунктуация, id при равных ключах."""
+
+    NAMES = ['ез', 'Ёж', 'еж', 'ҳа', 'ха', 'ца', 'ға', 'га', 'қа', 'ка', 'ўа', 'уа', 'C++', 'c', 'C#', 'C', 'ка']
+
+    def test_sort_key(self):
+        self.assertEqual(sorted(['ез', 'ёж', 'еж'], key=sort_key), ['еж', 'ёж', 'ез'])
+        self.assertEqual(sort_key('ёж')[:4], sort_key('еж')[:4])
+        self.assertEqual(
+            sorted(['ҳа', 'ха', 'ца', 'ға', 'га', 'да', 'қа', 'ка', 'ла', 'ўа', 'уа', 'фа'], key=sort_key),
+            ['га', 'ға', 'да', 'ка', 'қа', 'ла', 'уа', 'ўа', 'фа', 'ха', 'ҳа', 'ца'],
+        )
+        self.assertEqual(sorted(['PYTHON', 'Python', 'python'], key=sort_key), ['python', 'Python', 'PYTHON'])
+        self.assertEqual(sorted(['C++', 'C#', 'C', 'c'], key=sort_key), ['c', 'C', 'C#', 'C++'])
+
+    def test_descending_name_ties_by_id(self):
+        categories = [Category.objects.create(name=name) for name in self.NAMES]
+        response = self.client.get('/api/v1/categories/', {'ordering': '-name'})
+        expected = sorted(categories, key=lambda category: (sort_key(category.name), category.pk), reverse=True)
+        self.assertEqual([item['id'] for item in response.json()], [category.pk for category in expected])
+
+    @skipIf(snapshot.np is None, "снимок каталога требует numpy")
+    def test_snapshot_matches_orm(self):
+        category = Category.objects.create(name='c')
+        centre = EducationCentres.objects.create(name='e', category=category, rate=Decimal('4.00'), description='d',
+                                                 graduates=1, experience=1, employees=1)
+        for name in self.NAMES:
+            Courses.objects.create(name=name, duration=3, rate=Decimal('4.00'), price_month=100, full_price=300,
+                                   description='d', education_type='online', category=category,
+                                   education_centre=centre)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with self.settings(CATALOG_SNAPSHOT_DIR=directory, CATALOG_SNAPSHOT_ENABLED=True):
+            built = snapshot.Snapshot(snapshot._snapshot_dir() / snapshot.build())
+        for ordering in ('name', '-name'):
+            with self.subTest(ordering=ordering):
+                orm = [item['id'] for item in self.client.get('/api/v1/courses/', {'ordering': ordering}).json()]
+                self.assertEqual([int(pk) for pk in built.query({'ordering': ordering})], orm)
+
+
+SHARD_ALIAS = 'shard_test'
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], SHARD_DATABASES=[SHARD_ALIAS],
+                   DATABASE_ROUTERS=['CourseApp.sharding.ShardRouter'], STATS_ENABLED=False,
+                   SIMILAR_COURSES_ENABLED=False, COURSE_CARDS_ENABLED=False)
+class ShardedReadsTest(TransactionTestCase):
+    """С шардированием лента, автокомплит и админка берут курсы из шарда, а не из default."""
+
+    # Шард добавляется в setUpClass: '__all__' раскрывается уже с ним
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings[SHARD_ALIAS] = dict(connections.settings['default'],
+                                                 TEST=dict(connections.settings['default']['TEST'], NAME=None))
+        connections[SHARD_ALIAS].creation.create_test_db(verbosity=0, serialize=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[SHARD_ALIAS].creation.destroy_test_db(connections[SHARD_ALIAS].settings_dict['NAME'], verbosity=0)
+        del connections[SHARD_ALIAS]
+        del connections.settings[SHARD_ALIAS]
+        sharding._id_blocks.clear()
+
+    def test_created_course_is_upserted(self):
+        category = Category.objects.create(name='c')
+        centre = EducationCentres.objects.create(name='e', category=category, rate=Decimal('4.00'), description='d',
+                                                 graduates=1, experience=1, employees=1)
+        response = self.client.post('/api/v1/courses/', {
+            'name': 'Курс', 'duration': 3, 'rate': '4.00', 'price_month': 100, 'full_price': 300,
+            'description': 'описание', 'education_type': 'online', 'category': category.pk,
+            'education_centre': centre.pk,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        course_id = response.json()['id']
+        self.assertFalse(Courses.objects.using('default').filter(pk=course_id).exists())
+
+        feed = self.client.get('/api/v1/changes/', {'since': 0}).json()
+        course = next(change for change in feed['changes'] if change['model'] == 'course')
+        self.assertEqual((course['id'], course['op'], course['data']['name']), (course_id, ChangeLog.UPSERT, 'Курс'))
+
+        index = PrefixIndex()
+        index.build()
+        self.assertEqual([item['id'] for item in index.search('кур')], [course_id])
+
+        self.client.force_login(CustomUser.objects.create_superuser('admin', password='admin'))
+        self.assertContains(self.client.get('/admin/CourseApp/courses/'), f'/admin/CourseApp/courses/{course_id}/change/')
+        self.assertContains(self.client.get(f'/admin/CourseApp/courses/{course_id}/change/'), 'Курс')
+
+
+class PrefixIndexTest(SimpleTestCase):
+    """Префиксный индекс /autocomplete/: поиск и согласованность под конкурентными изменениями."""
+
+    def test_search(self):
+        index = PrefixIndex()
+        index.load({('course', 1): 'Python Backend', ('course', 2): 'Основы Python', ('skill', 3): 'Python'})
+        self.assertEqual([item['id'] for item in index.search('pyt')], [2, 3, 1])
+        self.assertEqual([item['id'] for item in index.search('PYTHON b')], [1])
+        self.assertEqual([item['id'] for item in index.search('осн')], [2])
+        self.assertEqual([item['id'] for item in index.search('python', kinds={'skill'})], [3])
+        self.assertEqual(len(index.search('python', limit=2)), 2)
+        self.assertEqual(index.search('  '), [])
+
+        index.add('course', 1, 'Django Backend')
+        self.assertEqual([item['id'] for item in index.search('python')], [2, 3])
+        self.assertEqual(index.search('django'), [{'type': 'course', 'id': 1, 'name': 'Django Backend'}])
+        index.remove('skill', 3)
+        self.assertEqual([item['id'] for item in index.search('python')], [2])
+        self.assertEqual(len(index), 2)
+
+    def test_search_during_concurrent_writes(self):
+        # Ключи «django …» стоят перед «python …»: их удаление сдвигает список под проходом поиска
+        stable = {('course', pk): f'Python {pk}' for pk in range(200)}
+        churn = {('skill', pk): f'Django {pk}' for pk in range(200)}
+        index = PrefixIndex()
+        index.load({**stable, **churn})
+        stop = threading.Event()
+        errors = []
+
+        def write(seed):
+            rnd = random.Random(seed)
+            keys = list(churn)
+            while not stop.is_set():
+                kind, pk = rnd.choice(keys)
+                if rnd.random() < 0.5:
+                    index.remove(kind, pk)
+                else:
+                    index.add(kind, pk, churn[(kind, pk)])
+
+        def search():
+            try:
+                while not stop.is_set():
+                    found = len(index.search('python', limit=1000))
+                    if found != len(stable):
+                        errors.append(found)
+            except Exception as error:
+                errors.append(error)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        threads = [threading.Thread(target=write, args=(seed,)) for seed in range(2)]
+        threads += [threading.Thread(target=search) for _ in range(2)]
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(0.5)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(switch_interval)
+        self.assertEqual(errors, [])
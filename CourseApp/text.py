@@ -0,0 +1,99 @@
+import re
+import unicodedata
+
+# Кириллица (русская и узбекская) -> узбекская латиница без апострофов
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh',
+    'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+
+# Варианты апострофа в узбекской латинице: oʻ, gʻ, o', g`
+APOSTROPHES = "'`ʻʼ‘’"
+
+_translit_table = str.maketrans({**CYRILLIC_TO_LATIN, **{ch: '' for ch in APOSTROPHES}})
+_non_word = re.compile(r'[^\w]+')
+
+
+def transliterate(text):
+    """Переводит кириллицу в латиницу и убирает апострофы (текст должен быть в нижнем регистре)."""
+    return text.translate(_translit_table)
+
+
+def normalize_search_text(text):
+    """Нормализует строку для поиска: регистр, диакритика, транслитерация, пробелы."""
+    text = transliterate(text.casefold())
+    # NFKD раскладывает буквы с диакритикой, комбинируемые знаки отбрасываем
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+    return ' '.join(_non_word.sub(' ', text).split())
+
+
+# Порядок сортировки имён: пробел, цифры, латиница, кириллица. Русские буквы — по алфавиту,
+# узбекские ғ, қ, ў, ҳ — сразу после базовой буквы (как в корневой таблице ICU), ё равна е
+# и отличается только на втором уровне.
+COLLATION_ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyzабвгғдежзийкқлмнопрстуўфхҳцчшщъыьэюя'
+_primary_weight = {ch: i + 1 for i, ch in enumerate(COLLATION_ALPHABET)}
+_primary_weight['ё'] = _primary_weight['е']
+_PRIMARY_VARIANTS = {'ё'}
+# Буквы вне алфавита (греческие, армянские...) — после кириллицы, между собой по коду символа
+_OTHER_WEIGHT = 36 * 36 - 1
+SORT_KEY_LENGTH = 512
+
+
+def _base36(value, width):
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        digits.append('0123456789abcdefghijklmnopqrstuvwxyz'[digit])
+    return ''.join(reversed(digits))
+
+
+def sort_key(text):
+    """
+    Ключ сортировки строки: побайтовое сравнение ключей даёт алфавитный порядок без учёта
+    регистра, диакритики и пунктуации; при равенстве — строчные раньше заглавных, буквы без
+    диакритики раньше букв с ней. Ключ состоит из [0-9a-z], поэтому одинаково сравнивается при
+    любом правиле сравнения строк в БД (BINARY в SQLite, локаль базы PostgreSQL).
+
+    Уровни ключа разделены '00': веса букв (по два символа), затем по символу на букву — регистр
+    и диакритика, затем коды букв вне алфавита, затем (если есть) пунктуация: позиция и код
+    каждого знака, поэтому строки, различающиеся только знаками, тоже упорядочены: C < C# < C++.
+
+    Ключи хранятся в name_sort: изменение этой функции требует миграции, пересчитывающей их (см. 0019).
+    """
+    primary, secondary, other, punctuation = [], [], [], []
+    space = False
+    for ch in unicodedata.normalize('NFC', text):
+        lower = ch.lower()
+        if lower in _primary_weight:
+            base, variant = lower, lower in _PRIMARY_VARIANTS
+        elif lower in APOSTROPHES:
+            punctuation.append(_base36(len(primary), 2) + _base36(ord(ch), 4))
+            continue
+        else:
+            decomposed = [c for c in unicodedata.normalize('NFKD', lower) if not unicodedata.combining(c)]
+            base, variant = (decomposed[0] if decomposed else ''), True
+        if base == ' ' or (base not in _primary_weight and not base.isalnum()):
+            # Пробелы и пунктуация разделяют слова; знаки, кроме пробелов, учитываются на последнем уровне
+            space = bool(primary)
+            if not ch.isspace():
+                punctuation.append(_base36(len(primary), 2) + _base36(ord(ch), 4))
+            continue
+        if space:
+            primary.append(_base36(_primary_weight[' '], 2))
+            secondary.append('1')
+            space = False
+        if base in _primary_weight:
+            primary.append(_base36(_primary_weight[base], 2))
+        else:
+            primary.append(_base36(_OTHER_WEIGHT, 2))
+            other.append(_base36(ord(base), 4))
+            variant = False
+        secondary.append(str(1 + variant + 2 * (ch != lower)))
+    key = ''.join(primary) + '00' + ''.join(secondary) + '00' + ''.join(other)
+    if punctuation:
+        # У строк без знаков ключ не меняется: без уровня они идут раньше таких же строк со знаками
+        key += '00' + ''.join(punctuation)
+    return key[:SORT_KEY_LENGTH]
@@ -1,21 +1,9 @@
+from django.conf import settings
 from django.urls import path, re_path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 from rest_framework.routers import SimpleRouter
 
 from . import views
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Project API",
-        default_version="v1",
-        description="Example API",
-    ),
-    public=True,
-    permission_classes=([permissions.AllowAny,]),
-)
+from .batch import BatchView
 
 router = SimpleRouter()
 router.register("phone-verification", views.GetVerificationCode, basename="phone-verification")
@@ -27,10 +15,6 @@ router.register("courses", views.CoursesViewSet, basename="courses")
 
 
 urlpatterns = [
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name="schema-json"),
-    path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
-
-
     path("auth/register-phone/", views.UserRegister.as_view(), name="register"),
     path("auth/verify-code/", views.VerifyCode.as_view(), name="verify"),
     path("auth/login/", views.UserLogin.as_view(), name="login"),
@@ -41,5 +25,18 @@ urlpatterns = [
     path('user/forgot-password/verify/', views.VerifyResetCodeView.as_view(), name='forgot_password_verify'),
     path('user/forgot-password/confirm/', views.ResetPasswordView.as_view(), name='forgot_password_confirm'),
 
+    path("autocomplete/", views.AutocompleteView.as_view(), name="autocomplete"),
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("changes/", views.ChangesView.as_view(), name="changes"),
+    path("querylog/", views.QueryLogView.as_view(), name="querylog"),
+
     path("", include(router.urls)),
 ]
+
+if settings.API_DOCS_ENABLED:
+    from . import docs
+
+    urlpatterns = [
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', docs.schema_json, name="schema-json"),
+        path("swagger/", docs.schema_swagger_ui, name="schema-swagger-ui"),
+    ] + urlpatterns
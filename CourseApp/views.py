@@ -1,22 +1,34 @@
 import datetime
+import logging
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import check_password
+from django.db import transaction
+from django.http import HttpResponse
 from django.utils import timezone
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError, NotFound
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import autocomplete, catalog_cache, changes, documents, duplicates, querylog, similarity, snapshot, stats, \
+    tasks
+from .batch import IdentityMapMixin
+from .compiled import CompiledListMixin, compile_serializer
+from .sharding import ShardedViewSetMixin
+from .docs import openapi, swagger_auto_schema
+from .models import CourseDocument, CourseSimilarity
+from .ordering import CollationOrderingFilter
 from .serializers import *
 from django_filters.rest_framework import DjangoFilterBackend
 
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 def normalize_phone_number(phone_number):
     """Удаляет плюс из номера телефона, если он присутствует."""
@@ -42,7 +54,7 @@ class UserLogin(APIView):
         if serializer.is_valid():
             username = serializer.validated_data.get("username")
             password = serializer.validated_data.get("password")
-            print(username, password)
+            logger.info("Вход пользователя", extra={'username': username})
             # Ищем пользователя по username
             try:
                 user = CustomUser.objects.get(username=username)
@@ -91,7 +103,10 @@ class UserRegister(APIView):
                 )
             else:
                 serializer.validated_data["phone_number"] = phone_number  # Сохраняем номер без плюса
-                phone = serializer.save()
+                # SMS только ставится в очередь вместе с записью кода, отправляет её воркер run_tasks
+                with transaction.atomic():
+                    phone = serializer.save()
+                    tasks.enqueue_sms(phone.phone_number, f"Код подтверждения: {phone.verification_code}")
 
             return Response(
                 {
@@ -109,9 +124,8 @@ class GetVerificationCode(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def verify_phone(self, request):
-        print(request.data)
         phone_number = normalize_phone_number(request.data.get('phone_number'))
-        print(phone_number)
+        logger.info("Повторная отправка кода подтверждения", extra={'phone_number': phone_number})
 
         # Проверяем, что номер телефона указан
         if not phone_number:
@@ -131,10 +145,12 @@ class GetVerificationCode(viewsets.ModelViewSet):
             raise ValidationError("Номер телефона уже подтвержден.")
 
         # Если прошло больше 5 минут — генерируем новый код
-        if (phone_verification.created_at + datetime.timedelta(minutes=5)) < timezone.now():
-            phone_verification.verification_code = generate_verification_code()
-            phone_verification.created_at = timezone.now()
-            phone_verification.save()
+        with transaction.atomic():
+            if (phone_verification.created_at + datetime.timedelta(minutes=5)) < timezone.now():
+                phone_verification.verification_code = generate_verification_code()
+                phone_verification.created_at = timezone.now()
+                phone_verification.save()
+            tasks.enqueue_sms(phone_number, f"Код подтверждения: {phone_verification.verification_code}")
 
         return Response(
             {
@@ -294,17 +310,19 @@ class RequestPasswordResetView(APIView):
             phone_number = serializer.validated_data['phone_number']
             user = User.objects.get(username=phone_number)
 
-            # Удаляем старые коды для пользователя
-            PasswordResetCode.objects.filter(user=user, is_used=False).delete()
+            with transaction.atomic():
+                # Удаляем старые коды для пользователя
+                PasswordResetCode.objects.filter(user=user, is_used=False).delete()
 
-            # Генерируем новый код
-            reset_code = PasswordResetCode.objects.create(
-                user=user,
-                code=str(random.randint(100000, 999999))
-            )
+                # Генерируем новый код
+                reset_code = PasswordResetCode.objects.create(
+                    user=user,
+                    code=str(random.randint(100000, 999999))
+                )
 
-            # Имитация отправки кода (например, через SMS)
-            print(f"Отправленный код для {phone_number}: {reset_code.code}")
+                # Отправка SMS — в фоне, здесь только запись в очередь в той же транзакции
+                tasks.enqueue_sms(phone_number, f"Код для сброса пароля: {reset_code.code}")
+            logger.info("Запрошен сброс пароля", extra={'phone_number': phone_number})
 
             return Response({"message": "Код для сброса пароля отправлен."}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -386,41 +404,251 @@ class LogoutView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(IdentityMapMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CollationOrderingFilter]
     search_fields = ['name']
     filterset_fields = ['name']  # можем фильтровать конкретно по полям, например ?name=SomeCategory
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Агрегаты по всем категориям из таблицы CategoryStats."""
+        if not stats.enabled():
+            raise NotFound("Агрегаты выключены (STATS_ENABLED).")
+        queryset = CategoryStats.objects.select_related('category').order_by('category_id')
+        return Response(CategoryStatsSerializer(queryset, many=True).data, status=status.HTTP_200_OK)
 
-class SkillsViewSet(viewsets.ModelViewSet):
+
+class SkillsViewSet(IdentityMapMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Skills.objects.all()
     serializer_class = SkillSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CollationOrderingFilter]
     search_fields = ['name', 'category__name']
     filterset_fields = ['category', 'name']  # например, ?category=1
 
 
-class EducationCentresViewSet(viewsets.ModelViewSet):
+class EducationCentresViewSet(IdentityMapMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = EducationCentres.objects.all()
     serializer_class = EducationCentresSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CollationOrderingFilter]
     search_fields = ['name', 'description']
     filterset_fields = ['category', 'rate', 'experience']  # пример
 
+    def list(self, request, *args, **kwargs):
+        uncached = super().list
+        data = catalog_cache.get_or_compute(
+            'education-centres', request, lambda: uncached(request, *args, **kwargs).data
+        )
+        return catalog_cache.mark_cached(Response(data))
+
+    @action(detail=True, methods=['get'], url_path='stats', url_name='stats')
+    def centre_stats(self, request, pk=None):
+        """Агрегаты по учебному центру из таблицы EducationCentreStats."""
+        if not stats.enabled():
+            raise NotFound("Агрегаты выключены (STATS_ENABLED).")
+        centre = self.get_object()
+        try:
+            centre_stats = centre.stats
+        except EducationCentreStats.DoesNotExist:
+            centre_stats = stats.refresh_education_centre(centre.pk)
+        return Response(EducationCentreStatsSerializer(centre_stats).data, status=status.HTTP_200_OK)
+
 
-class BranchesViewSet(viewsets.ModelViewSet):
+class BranchesViewSet(IdentityMapMixin, ShardedViewSetMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Branches.objects.all()
     serializer_class = BranchesSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CollationOrderingFilter]
     search_fields = ['name', 'address']
     filterset_fields = ['education_centre']  # можно фильтровать по id центра
 
 
-class CoursesViewSet(viewsets.ModelViewSet):
+class CoursesViewSet(IdentityMapMixin, ShardedViewSetMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Courses.objects.all()
     serializer_class = CoursesSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CollationOrderingFilter]
     search_fields = ['name', 'description']
-    filterset_fields = ['category', 'price_month', 'education_type']
+    # Диапазоны по хранимым ценам со скидкой: ?price_month_effective__gte=...&price_month_effective__lte=...
+    # Сортировка ?ordering=price_month_effective доступна через OrderingFilter (поля сериализатора),
+    # ?ordering=name — по ключу name_sort (CourseApp/ordering.py).
+    filterset_fields = {
+        'category': ['exact'],
+        # С шардированием запрос с education_centre идёт в один шард
+        'education_centre': ['exact'],
+        'price_month': ['exact'],
+        'education_type': ['exact'],
+        'price_month_effective': ['exact', 'gte', 'lte'],
+        'full_price_effective': ['exact', 'gte', 'lte'],
+    }
+
+    def create(self, request, *args, **kwargs):
+        if not duplicates.enabled():
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        found = duplicates.find(
+            data['name'], data['description'], using=duplicates.database_for_centre(data['education_centre'].pk)
+        )
+        found_data = [{'id': pk, 'similarity': round(score, 4)} for pk, score in found]
+        if found and settings.DUPLICATES_MODE == 'reject':
+            return Response(
+                {'error': 'Похожий курс уже существует.', 'duplicates': found_data},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        self.perform_create(serializer)
+        response_data = serializer.data
+        if found:
+            duplicates.flag(serializer.instance, found)
+            response_data = {**response_data, 'duplicates': found_data}
+        headers = self.get_success_headers(serializer.data)
+        return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def list(self, request, *args, **kwargs):
+        data = catalog_cache.get_or_compute(
+            'courses', request, lambda: self._list_uncached(request, *args, **kwargs).data
+        )
+        return catalog_cache.mark_cached(Response(data))
+
+    def _list_uncached(self, request, *args, **kwargs):
+        # Фильтр, сортировка и пагинация по memory-mapped снимку; из БД — только страница по id
+        ids = snapshot.query_course_ids(request.query_params)
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(ids)
+        page_ids = [int(pk) for pk in (ids if page is None else page)]
+        compiled = compile_serializer(self.get_serializer_class()) if settings.COMPILED_SERIALIZERS_ENABLED else None
+        data = []
+        # Без пагинации «страница» — весь результат: id передаются пачками, иначе SQLite упрётся в лимит параметров
+        for start in range(0, len(page_ids), settings.CATALOG_SNAPSHOT_ID_BATCH):
+            batch = page_ids[start:start + settings.CATALOG_SNAPSHOT_ID_BATCH]
+            if compiled is not None:
+                items = compiled.serialize(Courses.objects.filter(pk__in=batch), self.get_serializer_context())
+                by_id = {item['id']: item for item in items}
+                data.extend(by_id[pk] for pk in batch if pk in by_id)
+            else:
+                objects = Courses.objects.in_bulk(batch)
+                data.extend(self.get_serializer([objects[pk] for pk in batch if pk in objects], many=True).data)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def cards(self, request):
+        """
+        Быстрый список карточек: /courses/cards/?category=1&education_centre=2&after=<id>&limit=50.
+        Одна выборка готовых JSON-строк CourseDocument по индексу; страницы — по курсору after (id курса).
+        """
+        if not documents.enabled():
+            raise NotFound("Карточки курсов выключены (COURSE_CARDS_ENABLED).")
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', settings.COURSE_CARDS_DEFAULT_LIMIT))
+            filters_ = {
+                field: int(request.query_params[field])
+                for field in ('category', 'education_centre') if request.query_params.get(field)
+            }
+        except ValueError:
+            raise ValidationError({'error': 'after, limit, category и education_centre должны быть целыми числами.'})
+        limit = max(1, min(limit, settings.COURSE_CARDS_MAX_LIMIT))
+
+        rows = list(
+            CourseDocument.objects.filter(course_id__gt=after, **filters_)
+            .order_by('course_id').values_list('course_id', 'body')[:limit]
+        )
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        # Тела уже сериализованы — склеиваем без разбора JSON
+        body = '{"next":%s,"results":[%s]}' % (
+            'null' if next_cursor is None else next_cursor, ','.join(row[1] for row in rows)
+        )
+        return HttpResponse(body, content_type='application/json')
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие курсы из предрассчитанной таблицы CourseSimilarity, по убыванию схожести."""
+        if not similarity.enabled():
+            raise NotFound("Похожие курсы выключены (SIMILAR_COURSES_ENABLED).")
+        course = self.get_object()
+        entries = CourseSimilarity.objects.filter(course=course).select_related('similar').order_by('-score')
+        data = []
+        for entry in entries:
+            item = CoursesSerializer(entry.similar, context=self.get_serializer_context()).data
+            item['similarity'] = round(entry.score, 4)
+            data.append(item)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AutocompleteView(APIView):
+    """
+    Поиск по мере ввода: /autocomplete/?q=pyt&limit=10&types=skill,course
+    """
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), settings.AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': 'Должно быть целым числом.'})
+
+        kinds = None
+        if request.query_params.get('types'):
+            kinds = set(request.query_params['types'].split(','))
+            unknown = kinds - set(autocomplete.AUTOCOMPLETE_MODELS)
+            if unknown:
+                raise ValidationError({'types': f"Неизвестные типы: {', '.join(sorted(unknown))}"})
+
+        results = autocomplete.get_index().search(query, limit=max(limit, 0), kinds=kinds)
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class ChangesView(APIView):
+    """
+    Инкрементальная синхронизация каталога: /changes/?since=<курсор>&limit=500.
+    Клиент сохраняет полученный cursor и передаёт его в следующем запросе.
+    """
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.CHANGES_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'error': 'since и limit должны быть целыми числами.'})
+        limit = max(1, min(limit, settings.CHANGES_MAX_LIMIT))
+
+        if 0 < since < changes.purged_through():
+            # Часть удалений до этого курсора уже вычищена: нужна полная синхронизация с since=0
+            return Response(
+                {"error": "Курсор устарел, выполните полную синхронизацию (since=0)."},
+                status=status.HTTP_410_GONE
+            )
+        return Response(changes.read(since, limit, context={'request': request}), status=status.HTTP_200_OK)
+
+
+class QueryLogView(APIView):
+    """
+    Самые дорогие SQL-запросы текущего воркера: /querylog/?by=total|max|count&limit=20&endpoint=courses-list.
+    DELETE очищает накопленную статистику.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        by = request.query_params.get('by', 'total')
+        if by not in ('total', 'max', 'count'):
+            raise ValidationError({'by': 'Допустимые значения: total, max, count.'})
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 500))
+        except ValueError:
+            raise ValidationError({'limit': 'Должно быть целым числом.'})
+
+        store = querylog.store
+        return Response({
+            'since': store.started_at,
+            'top': store.top(limit=limit, by=by, endpoint=request.query_params.get('endpoint')),
+            'endpoints': store.endpoints(limit=limit),
+            'slow': store.slow_queries(limit=limit),
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        querylog.store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,37 @@
+"""
+Прогрев процесса перед fork.
+
+При preload-режиме gunicorn (см. gunicorn.conf.py) приложение загружается в master-процессе,
+а воркеры получают его память через copy-on-write. Всё, что обычно лениво вычисляется
+на первом запросе каждого воркера, считаем здесь один раз.
+"""
+import gc
+
+from django.apps import apps
+from django.urls import get_resolver
+
+
+def warm_up():
+    """Заполняет кэши URL-резолвера, _meta моделей и полей сериализаторов, затем замораживает GC."""
+    resolver = get_resolver()
+    # reverse_dict заполняет резолвер рекурсивно, включая вложенные include()
+    resolver.reverse_dict
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+    from CourseApp.urls import router
+
+    for prefix, viewset, basename in router.registry:
+        view = viewset()
+        # api_settings DRF подгружает классы лениво при первом обращении
+        view.get_authenticators()
+        view.get_permissions()
+        serializer_class = getattr(viewset, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+
+    # Переносим всё накопленное в permanent generation: сборщик мусора воркера
+    # не будет трогать эти объекты и разделять страницы памяти с master-процессом.
+    gc.collect()
+    gc.freeze()
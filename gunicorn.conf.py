@@ -0,0 +1,41 @@
+"""
+Конфигурация gunicorn: preload-режим с прогревом приложения до fork.
+
+Запуск: gunicorn -c gunicorn.conf.py
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CourseAPI.settings')
+os.environ.setdefault('PRELOAD_WARMUP', '1')
+
+wsgi_app = 'CourseAPI.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+
+# Приложение импортируется один раз в master-процессе, воркеры делят память через copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Соединения с БД нельзя разделять между процессами
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска исказили бы счётчики
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)